@@ -0,0 +1,110 @@
+"""
+导入耗时基准
+在全新的子进程中多次导入，统计 CMS 工具带来的冷启动开销（取中位数）
+
+- cms_tools: 后端模块本身（requests、sqlite3 等依赖）
+- adapter: geo_chatbot_adapter.wordpress 注册工具（需要 GEO Chatbot 的 tools.base，
+  用 --host-path 指定其所在目录；找不到时跳过）
+- adapter_first_request: 注册后第一次发请求前导入 HTTP 客户端（requests 延迟到第一次请求时）
+
+用法:
+    python benchmarks/bench_import.py --runs 10 --host-path /path/to/geo_chatbot
+    python benchmarks/bench_import.py --importtime      # 列出耗时最多的模块
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SNIPPETS = {
+    "baseline": "pass",
+    "cms_tools": "import cms_tools",
+    "adapter": "import geo_chatbot_adapter.wordpress",
+    "adapter_first_request": "import geo_chatbot_adapter.wordpress; import requests",
+}
+
+_TIMER = (
+    "import time, sys\n"
+    "t = time.perf_counter()\n"
+    "{snippet}\n"
+    "sys.stdout.write(repr(time.perf_counter() - t))\n"
+)
+
+
+def _env(host_path: str = None) -> dict:
+    env = dict(os.environ)
+    paths = [ROOT] + ([host_path] if host_path else [])
+    env["PYTHONPATH"] = os.pathsep.join(paths + [env.get("PYTHONPATH", "")])
+    return env
+
+
+def _run_once(snippet: str, env: dict) -> float:
+    proc = subprocess.run(
+        [sys.executable, "-c", _TIMER.format(snippet=snippet)],
+        env=env, cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    return float(proc.stdout)
+
+
+def measure(runs: int = 10, host_path: str = None) -> dict:
+    env = _env(host_path)
+    report = {"python": sys.version.split()[0], "runs": runs, "results": {}}
+    for name, snippet in _SNIPPETS.items():
+        try:
+            samples = [_run_once(snippet, env) for _ in range(runs)]
+        except RuntimeError as e:
+            report["results"][name] = {"skipped": str(e)}
+            continue
+        report["results"][name] = {
+            "median_ms": round(statistics.median(samples) * 1000, 2),
+            "min_ms": round(min(samples) * 1000, 2),
+            "max_ms": round(max(samples) * 1000, 2)
+        }
+    return report
+
+
+def importtime(module: str = "cms_tools", top: int = 15, host_path: str = None) -> list:
+    """python -X importtime 输出中累计耗时最多的模块"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=_env(host_path), cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # import time: self [us] | cumulative | imported package
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "self_ms": int(self_us) / 1000,
+                     "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="CMS Tools 导入耗时基准")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--host-path", help="GEO Chatbot 根目录（包含 tools/base.py）")
+    parser.add_argument("--importtime", action="store_true", help="列出 cms_tools 导入最慢的模块")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    report = measure(args.runs, args.host_path)
+    if args.importtime:
+        report["importtime"] = importtime(host_path=args.host_path)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+stats 响应解析微基准
+生成合成的 top-posts 响应（天数 × 每天文章数），单独计时 get_article_metrics / list_articles_by_topic /
+get_site_stats / get_topic_trends 中遍历 summary.postviews 与 days[*].postviews 的代码：
+
+- json_decode:             解析响应 JSON
+- build_views_map:         cms_tools._build_views_map（list_articles_by_topic、导出）
+- find_post_views:         cms_tools._find_post_views，目标文章在榜单中（get_article_metrics）
+- find_post_views_missing: 目标文章不在榜单中（需要扫描全部数据）
+- site_top_posts:          get_site_stats 从 summary 取前 10 篇
+- sort_articles:           一页文章（100 篇）按浏览量排序（list_articles_by_topic order_by=views）
+- rank_views_map:          全部文章按浏览量排序
+- views_matrix:            cms_analytics.ViewsMatrix.from_top_posts（get_topic_trends，需要 NumPy）
+
+用法:
+    python benchmarks/bench_parsing.py                        # 默认规模（最大 365 天 × 1000 篇）
+    python benchmarks/bench_parsing.py --full                 # 增加 90 × 10000、365 × 10000（内存占用约数 GB）
+    python benchmarks/bench_parsing.py --sizes 30x1000,365x10000 --output before.json
+    python benchmarks/bench_parsing.py --compare before.json  # 中位数变慢超过阈值时退出码为 1
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import date, timedelta
+from typing import List, Dict, Any, Callable, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = [(7, 10), (30, 100), (30, 1000), (365, 1000)]
+FULL_SIZES = DEFAULT_SIZES + [(90, 10000), (365, 10000)]
+DEFAULT_THRESHOLD = 0.10
+
+# 每个操作至少计时这么久（秒），快的操作循环多次取平均
+_MIN_SAMPLE_SECONDS = 0.2
+
+
+def make_top_posts(days: int, posts: int, summary: bool = True, seed: int = 0) -> Dict[str, Any]:
+    """
+    合成 top-posts 响应：每天 posts 篇文章上榜（编号越小浏览量越高，带随机扰动）
+
+    Args:
+        summary: 是否附带 summary.postviews（summarize=1 时的响应）
+    """
+    rng = random.Random(seed)
+    end = date(2026, 1, 1)
+    totals: Dict[int, int] = {}
+    day_map = {}
+    for d in range(days):
+        postviews = []
+        for rank in range(posts):
+            pid = 1000 + rank
+            views = max(1, int(5000 / (rank + 1) ** 0.8 * rng.uniform(0.5, 1.5)))
+            totals[pid] = totals.get(pid, 0) + views
+            postviews.append({
+                "id": pid,
+                "href": f"https://example.wordpress.com/post-{pid}/",
+                "date": "2025-06-01 08:00:00",
+                "title": f"示例文章 {pid}",
+                "type": "post",
+                "views": views,
+            })
+        day_map[(end - timedelta(days=d)).isoformat()] = {
+            "postviews": postviews,
+            "total_views": sum(p["views"] for p in postviews),
+        }
+    data = {"date": end.isoformat(), "period": "day", "days": day_map}
+    if summary:
+        ranked = sorted(totals.items(), key=lambda item: -item[1])
+        data["summary"] = {
+            "postviews": [{"id": pid, "title": f"示例文章 {pid}", "href": "", "views": v} for pid, v in ranked],
+            "total_views": sum(totals.values()),
+        }
+    return data
+
+
+def _operations(payload: Dict[str, Any], raw: str, posts: int) -> Dict[str, Callable[[], Any]]:
+    import cms_tools
+
+    views_map = cms_tools._build_views_map(payload)
+    present = 1000 + posts // 2
+    missing = 10 ** 9
+    page = [{"id": pid, "metrics": {"views": v}} for pid, v in list(views_map.items())[:100]]
+
+    ops = {
+        "json_decode": lambda: json.loads(raw),
+        "build_views_map": lambda: cms_tools._build_views_map(payload),
+        "find_post_views": lambda: cms_tools._find_post_views(payload, present, True),
+        "find_post_views_missing": lambda: cms_tools._find_post_views(payload, missing, True),
+        "site_top_posts": lambda: [
+            {"id": p.get("id"), "title": p.get("title", ""), "views": p.get("views", 0), "url": p.get("href", "")}
+            for p in payload.get("summary", {}).get("postviews", [])[:10]
+        ],
+        "sort_articles": lambda: sorted(page, key=lambda x: x["metrics"]["views"], reverse=True),
+        "rank_views_map": lambda: sorted(views_map.items(), key=lambda item: item[1], reverse=True),
+    }
+    try:
+        from cms_analytics import ViewsMatrix
+        ops["views_matrix"] = lambda: ViewsMatrix.from_top_posts(payload)
+    except ImportError:
+        pass
+    return ops
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """每次调用的耗时（毫秒）：先确定循环次数，再重复 repeat 轮"""
+    started = time.perf_counter()
+    fn()
+    single = time.perf_counter() - started
+    number = max(1, int(_MIN_SAMPLE_SECONDS / single)) if single > 0 else 1000
+
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - started) / number * 1000)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "loops": number,
+    }
+
+
+def run(sizes: List[Tuple[int, int]], repeat: int = 5, summary: bool = True,
+        only: List[str] = None) -> Dict[str, Any]:
+    report = {
+        "python": sys.version.split()[0],
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"repeat": repeat, "summary": summary},
+        "results": [],
+    }
+    for days, posts in sizes:
+        payload = make_top_posts(days, posts, summary=summary)
+        raw = json.dumps(payload, ensure_ascii=False)
+        entry = {"days": days, "posts": posts, "entries": days * posts,
+                 "payload_mb": round(len(raw.encode("utf-8")) / 1024 / 1024, 2), "operations": {}}
+        for name, fn in _operations(payload, raw, posts).items():
+            if only and name not in only:
+                continue
+            entry["operations"][name] = _time(fn, repeat)
+        report["results"].append(entry)
+        print(f"{days} 天 × {posts} 篇: " + ", ".join(
+            f"{name}={r['median_ms']}ms" for name, r in entry["operations"].items()), file=sys.stderr)
+        del payload, raw
+        gc.collect()
+    return report
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """中位数变慢超过 threshold 的 (规模, 操作)"""
+    old = {(r["days"], r["posts"]): r["operations"] for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before_ops = old.get((result["days"], result["posts"]), {})
+        for name, after in result["operations"].items():
+            before = before_ops.get(name)
+            if before and before["median_ms"] and \
+                    (after["median_ms"] - before["median_ms"]) / before["median_ms"] > threshold:
+                regressions.append({
+                    "days": result["days"], "posts": result["posts"], "operation": name,
+                    "baseline_ms": before["median_ms"], "current_ms": after["median_ms"],
+                    "change": round((after["median_ms"] - before["median_ms"]) / before["median_ms"], 3),
+                })
+    return regressions
+
+
+def _sizes(text: str) -> List[Tuple[int, int]]:
+    """"7x10,365x1000" -> [(7, 10), (365, 1000)]"""
+    sizes = []
+    for item in text.split(","):
+        if item.strip():
+            days, posts = item.lower().split("x")
+            sizes.append((int(days), int(posts)))
+    return sizes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="stats 响应解析微基准")
+    parser.add_argument("--sizes", type=_sizes, help="天数x每天文章数，逗号分隔（如 7x10,365x10000）")
+    parser.add_argument("--full", action="store_true", help="包含 90x10000 与 365x10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-summary", action="store_true", help="响应不含 summary.postviews")
+    parser.add_argument("--only", default="", help="只测这些操作（逗号分隔）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)
+    only = [name.strip() for name in args.only.split(",") if name.strip()]
+    report = run(sizes, repeat=args.repeat, summary=not args.no_summary, only=only)
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["regressions"] = compare(json.load(f), report, args.threshold)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+工具吞吐与延迟基准
+对本地 API 替身（cms_stub_server）逐个驱动 CMS_TOOLS_FUNCTIONS 中的工具，
+按 站点规模 × 注入延迟 × 并发数 组合测量：
+
+- 吞吐量（次/秒）、延迟 p50 / p95 / p99
+- 每次工具调用发出的 HTTP 请求数（由替身统计）
+- 峰值 RSS（每个 站点规模 × 延迟 组合在独立子进程中运行，替身也在另一个子进程中，只计客户端）
+
+结果为 JSON；--compare 与之前的结果对比，p95 延迟或吞吐量变差超过阈值时列出并以退出码 1 结束。
+
+用法:
+    python benchmarks/bench_tools.py --sizes 100,10000 --latency-ms 0,50 --concurrency 1,8 --output base.json
+    python benchmarks/bench_tools.py --sizes 100,10000 --latency-ms 0,50 --concurrency 1,8 --compare base.json
+    python benchmarks/bench_tools.py --tools get_article_metrics,list_articles_by_topic --calls 200
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import resource
+import tempfile
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_SERVER = os.path.join(ROOT, "cms_stub_server.py")
+
+# 延迟（ms）与吞吐量比较时允许的相对变化
+DEFAULT_THRESHOLD = 0.10
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """线性插值百分位（values 已排序）"""
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def _peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ============================================================
+# 工具参数
+# ============================================================
+
+def _argument_factories(posts: int, workdir: str) -> Dict[str, Callable[[int, random.Random], dict]]:
+    """工具名 -> make(i, rng) 生成第 i 次调用的参数"""
+    from cms_stub_server import CATEGORY_NAMES
+    run_id = f"{os.getpid()}-{int(time.time())}"
+
+    def post_id(rng: random.Random) -> int:
+        return rng.randint(1, posts)
+
+    def media_file(i: int, rng: random.Random) -> dict:
+        # 每次内容不同，走真实上传路径而不是去重命中
+        path = os.path.join(workdir, f"bench-{run_id}-{i}.png")
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + os.urandom(2048))
+        return {"files": [path]}
+
+    return {
+        "create_article": lambda i, rng: {
+            "title": f"Benchmark {run_id} #{i}",
+            "content": f"<h2>Benchmark</h2><p>{i}</p>" * 20,
+            "categories": [rng.choice(CATEGORY_NAMES)],
+            "tags": ["API", "性能"],
+        },
+        "update_article": lambda i, rng: {"post_id": post_id(rng), "title": f"Updated {run_id} #{i}"},
+        "publish_article": lambda i, rng: {"post_id": post_id(rng)},
+        "unpublish_article": lambda i, rng: {"post_id": post_id(rng), "target_status": "draft"},
+        "get_article_metrics": lambda i, rng: {"post_id": post_id(rng), "days": 30},
+        "list_articles_by_topic": lambda i, rng: {"category": rng.choice(CATEGORY_NAMES), "number": 20},
+        "get_site_stats": lambda i, rng: {"days": 7},
+        "bulk_update_status": lambda i, rng: {
+            "target_status": "private", "status": "draft", "category": rng.choice(CATEGORY_NAMES),
+            "dry_run": True, "limit": 20,
+        },
+        "upload_media": media_file,
+        "get_topic_trends": lambda i, rng: {"days": 30},
+    }
+
+
+# ============================================================
+# 单个场景（子进程）
+# ============================================================
+
+def _start_stub(posts: int, latency_ms: float, jitter_ms: float, seed: int) -> Tuple[subprocess.Popen, str]:
+    proc = subprocess.Popen(
+        [sys.executable, "-u", STUB_SERVER, "--port", "0", "--posts", str(posts), "--seed", str(seed),
+         "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms)],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    line = proc.stdout.readline().strip()
+    if not line.startswith("export WP_API_BASE="):
+        proc.kill()
+        raise RuntimeError(f"替身启动失败: {proc.stderr.read().strip()[-500:]}")
+    return proc, line.split("=", 1)[1]
+
+
+def _stub_requests(api_base: str) -> int:
+    admin = api_base.split("/rest/", 1)[0] + "/__stub__/stats"
+    with urllib.request.urlopen(admin, timeout=10) as response:
+        return json.loads(response.read())["total"]
+
+
+def run_scenario(config: Dict[str, Any]) -> Dict[str, Any]:
+    """在当前进程中运行一个 站点规模 × 延迟 场景（由 --worker 调用）"""
+    stub, api_base = _start_stub(config["posts"], config["latency_ms"], config["jitter_ms"], config["seed"])
+    workdir = tempfile.mkdtemp(prefix="cms_bench_")
+    try:
+        os.environ["WP_API_BASE"] = api_base
+        os.environ.setdefault("WP_ACCESS_TOKEN", "bench-token")
+        # 本地索引、仓库等写到临时目录
+        os.environ["CMS_STATE_DIR"] = workdir
+        # upload_media 只接受媒体根目录内的文件
+        os.environ["CMS_MEDIA_ROOT"] = workdir
+        sys.path.insert(0, ROOT)
+        import cms_tools
+
+        factories = _argument_factories(config["posts"], workdir)
+        tools = config["tools"] or list(cms_tools.CMS_TOOLS_FUNCTIONS)
+        rng = random.Random(config["seed"])
+        # 调用序号在整个场景内唯一（标题、文件内容不重复，避免被幂等/去重命中）
+        sequence = itertools.count()
+        results = []
+        for tool in tools:
+            make = factories.get(tool)
+            if make is None:
+                results.append({"tool": tool, "skipped": "没有参数生成器"})
+                continue
+            for _ in range(config["warmup"]):
+                cms_tools.execute_cms_tool(tool, make(next(sequence), rng))
+            for concurrency in config["concurrency"]:
+                results.append(_measure(cms_tools.execute_cms_tool, tool, make, rng, sequence, concurrency,
+                                        config["calls"], api_base))
+        return {
+            "posts": config["posts"],
+            "latency_ms": config["latency_ms"],
+            "jitter_ms": config["jitter_ms"],
+            "peak_rss_mb": _peak_rss_mb(),
+            "results": results,
+        }
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+def _measure(execute, tool: str, make, rng: random.Random, sequence, concurrency: int, calls: int,
+             api_base: str) -> dict:
+    calls = max(calls, concurrency)
+    arguments = [make(next(sequence), rng) for _ in range(calls)]
+    latencies: List[float] = []
+    errors = 0
+
+    def one(args: dict) -> Tuple[float, bool]:
+        started = time.perf_counter()
+        result = execute(tool, args)
+        return time.perf_counter() - started, bool(result.get("success"))
+
+    before = _stub_requests(api_base)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for elapsed, ok in executor.map(one, arguments):
+            latencies.append(elapsed * 1000)
+            errors += not ok
+    wall = time.perf_counter() - started
+    http_calls = _stub_requests(api_base) - before
+
+    latencies.sort()
+    return {
+        "tool": tool,
+        "concurrency": concurrency,
+        "calls": calls,
+        "errors": errors,
+        "throughput_per_s": round(calls / wall, 2),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50), 2),
+            "p95": round(_percentile(latencies, 95), 2),
+            "p99": round(_percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "max": round(latencies[-1], 2),
+        },
+        "http_calls_per_call": round(http_calls / calls, 2),
+        # 到此为止的进程峰值（同一场景内单调递增）
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+# ============================================================
+# 汇总与对比
+# ============================================================
+
+def run(sizes: List[int], latencies: List[float], concurrency: List[int], calls: int, tools: List[str],
+        jitter_ms: float = 0, warmup: int = 1, seed: int = 0) -> Dict[str, Any]:
+    report = {
+        "python": sys.version.split()[0],
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"sizes": sizes, "latency_ms": latencies, "jitter_ms": jitter_ms, "concurrency": concurrency,
+                   "calls": calls, "tools": tools or "all", "warmup": warmup, "seed": seed},
+        "scenarios": [],
+    }
+    for posts in sizes:
+        for latency_ms in latencies:
+            config = {"posts": posts, "latency_ms": latency_ms, "jitter_ms": jitter_ms, "concurrency": concurrency,
+                      "calls": calls, "tools": tools, "warmup": warmup, "seed": seed}
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(config)],
+                cwd=ROOT, capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+                report["scenarios"].append({"posts": posts, "latency_ms": latency_ms, "error": error})
+                continue
+            scenario = json.loads(proc.stdout.strip().splitlines()[-1])
+            report["scenarios"].append(scenario)
+            print(f"posts={posts} latency={latency_ms}ms peak_rss={scenario['peak_rss_mb']}MB", file=sys.stderr)
+    return report
+
+
+def _index(report: Dict[str, Any]) -> Dict[tuple, dict]:
+    rows = {}
+    for scenario in report.get("scenarios", []):
+        for result in scenario.get("results", []):
+            if "latency_ms" in result:
+                rows[(scenario["posts"], scenario["latency_ms"], result["tool"], result["concurrency"])] = result
+    return rows
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """列出 p95 延迟上升或吞吐量下降超过 threshold 的组合"""
+    regressions = []
+    old_rows = _index(baseline)
+    for key, new in _index(current).items():
+        old = old_rows.get(key)
+        if old is None:
+            continue
+        posts, latency_ms, tool, concurrency = key
+        checks = (
+            ("p95_ms", old["latency_ms"]["p95"], new["latency_ms"]["p95"], 1),
+            ("throughput_per_s", old["throughput_per_s"], new["throughput_per_s"], -1),
+            ("http_calls_per_call", old["http_calls_per_call"], new["http_calls_per_call"], 1),
+        )
+        for metric, before, after, direction in checks:
+            if before and (after - before) / before * direction > threshold:
+                regressions.append({
+                    "posts": posts, "latency_ms": latency_ms, "tool": tool, "concurrency": concurrency,
+                    "metric": metric, "baseline": before, "current": after,
+                    "change": round((after - before) / before, 3),
+                })
+    return regressions
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def _float_list(text: str) -> List[float]:
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="CMS Tools 吞吐与延迟基准")
+    parser.add_argument("--sizes", type=_int_list, default=[100, 1000], help="站点文章数，逗号分隔（如 100,10000,100000）")
+    parser.add_argument("--latency-ms", type=_float_list, default=[0.0], help="替身注入的网络延迟，逗号分隔")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8], help="并发数，逗号分隔")
+    parser.add_argument("--calls", type=int, default=50, help="每个 工具 × 并发 组合的调用次数")
+    parser.add_argument("--tools", default="", help="只测这些工具（逗号分隔，默认全部）")
+    parser.add_argument("--warmup", type=int, default=1, help="每个工具正式计时前的预热调用次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定变差的相对阈值（默认 0.10）")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_scenario(json.loads(args.worker)), ensure_ascii=False))
+        return 0
+
+    tools = [t.strip() for t in args.tools.split(",") if t.strip()]
+    report = run(args.sizes, args.latency_ms, args.concurrency, args.calls, tools,
+                 jitter_ms=args.jitter_ms, warmup=args.warmup, seed=args.seed)
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["regressions"] = compare(json.load(f), report, args.threshold)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
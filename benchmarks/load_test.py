@@ -0,0 +1,350 @@
+"""
+并发 Agent 会话压测
+模拟多个 GEO Agent 会话同时调用工具，逐级增加并发会话数，找出单个工作进程能承受的并发上限。
+每个会话循环执行按权重抽取的调用流程：
+
+- publish: create_article → publish_article → get_article_metrics
+- browse:  list_articles_by_topic → 对列表中的前几篇 get_article_metrics
+
+每一级并发运行固定时长，报告吞吐量（工具调用/秒、流程/秒）、错误率、总体和分工具的延迟分位数；
+吞吐量不再随并发增长（增幅低于 --gain）或错误率超过 --max-error-rate 的位置即为饱和点。
+
+API 替身（cms_stub_server）在独立子进程中运行，工具调用在本进程中执行（即被测的工作进程）。
+
+用法:
+    python benchmarks/load_test.py                                          # 并发 1,2,4,...,64，每级 10 秒
+    python benchmarks/load_test.py --ramp 1,4,16,64,128 --stage-seconds 20 --latency-ms 80 --jitter-ms 40
+    python benchmarks/load_test.py --mix publish=1,browse=4 --think-ms 500 --output load.json
+    python benchmarks/load_test.py --via registry --host-path /path/to/geo_chatbot    # 经适配层 registry.execute
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import itertools
+import urllib.request
+from collections import Counter
+from typing import List, Dict, Any, Callable, Optional
+
+from bench_tools import ROOT, _start_stub, _stub_requests, _percentile, _peak_rss_mb
+
+DEFAULT_RAMP = [1, 2, 4, 8, 16, 32, 64]
+DEFAULT_MIX = {"publish": 1, "browse": 3}
+# 并发翻倍后吞吐量增幅低于该比例视为饱和
+DEFAULT_GAIN = 0.10
+DEFAULT_MAX_ERROR_RATE = 0.01
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+    return {
+        "p50": round(_percentile(latencies, 50), 2),
+        "p95": round(_percentile(latencies, 95), 2),
+        "p99": round(_percentile(latencies, 99), 2),
+        "mean": round(sum(latencies) / len(latencies), 2),
+        "max": round(latencies[-1], 2),
+    }
+
+
+# ============================================================
+# 模拟会话
+# ============================================================
+
+class _AgentSession:
+    """一个模拟会话：记录每次工具调用的耗时与结果"""
+
+    def __init__(self, execute: Callable[[str, dict], Any], records: list, rng: random.Random,
+                 think_ms: float, names: Dict[str, str]):
+        self._execute = execute
+        self._records = records
+        self.rng = rng
+        self._think = think_ms / 1000
+        self._names = names
+
+    def call(self, tool: str, arguments: dict) -> dict:
+        if self._think:
+            # 模型生成下一步的时间
+            time.sleep(self.rng.uniform(0.5, 1.5) * self._think)
+        started = time.perf_counter()
+        try:
+            result = self._execute(self._names.get(tool, tool), arguments)
+            if not isinstance(result, dict):
+                result = {"success": True, "data": result}
+        except Exception as e:
+            result = {"success": False, "error": f"{type(e).__name__}: {e}"}
+        elapsed = (time.perf_counter() - started) * 1000
+        # list.append 是原子操作，多个会话线程共用一个列表
+        self._records.append((tool, elapsed, bool(result.get("success")), result.get("error")))
+        return result
+
+
+def _publish_flow(session: _AgentSession, sequence, categories: List[str]) -> None:
+    created = session.call("create_article", {
+        "title": f"Load test #{next(sequence)}",
+        "content": "<h2>Load test</h2><p>" + "GEO 压测内容。" * 40 + "</p>",
+        "categories": [session.rng.choice(categories)],
+        "tags": ["GEO", "压测"],
+    })
+    if not created.get("success"):
+        return
+    post_id = created["data"]["post_id"]
+    if session.call("publish_article", {"post_id": post_id}).get("success"):
+        session.call("get_article_metrics", {"post_id": post_id, "days": 7})
+
+
+def _browse_flow(session: _AgentSession, sequence, categories: List[str], metrics_per_list: int = 3) -> None:
+    listed = session.call("list_articles_by_topic", {
+        "category": session.rng.choice(categories), "number": 10, "status": "publish",
+    })
+    if not listed.get("success"):
+        return
+    for article in listed["data"].get("articles", [])[:metrics_per_list]:
+        session.call("get_article_metrics", {"post_id": article["id"], "days": 30})
+
+
+MIXES = {
+    "publish": _publish_flow,
+    "browse": _browse_flow,
+}
+
+
+# ============================================================
+# 逐级加压
+# ============================================================
+
+def run_stage(execute, concurrency: int, seconds: float, mix: Dict[str, float], think_ms: float,
+              sequence, categories: List[str], seed: int, api_base: str, session_cache: bool = False,
+              names: Dict[str, str] = None) -> Dict[str, Any]:
+    """concurrency 个会话并发运行 seconds 秒（进行中的流程执行完才结束）"""
+    records: list = []
+    flows = Counter()
+    flows_lock = threading.Lock()
+    flow_names = list(mix)
+    weights = [mix[name] for name in flow_names]
+    deadline = time.perf_counter() + seconds
+
+    def session_loop(index: int) -> None:
+        rng = random.Random(seed * 100003 + concurrency * 1009 + index)
+        run = execute
+        if session_cache:
+            from cms_session import ToolSession
+            run = ToolSession(execute=execute).execute
+        session = _AgentSession(run, records, rng, think_ms, names or {})
+        completed = Counter()
+        while time.perf_counter() < deadline:
+            flow = rng.choices(flow_names, weights)[0]
+            MIXES[flow](session, sequence, categories)
+            completed[flow] += 1
+        with flows_lock:
+            flows.update(completed)
+
+    http_before = _stub_requests(api_base)
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session_loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    http_calls = _stub_requests(api_base) - http_before
+
+    calls = len(records)
+    errors = [error for _, _, ok, error in records if not ok]
+    by_tool: Dict[str, list] = {}
+    for tool, elapsed, ok, _ in records:
+        by_tool.setdefault(tool, []).append((elapsed, ok))
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(wall, 2),
+        "calls": calls,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / calls, 4) if calls else 0.0,
+        "throughput_per_s": round(calls / wall, 2),
+        "flows": dict(flows),
+        "flows_per_s": round(sum(flows.values()) / wall, 2),
+        "http_calls_per_s": round(http_calls / wall, 2),
+        "latency_ms": _latency_summary([elapsed for _, elapsed, _, _ in records]),
+        "tools": {
+            tool: {
+                "calls": len(items),
+                "errors": sum(1 for _, ok in items if not ok),
+                "latency_ms": _latency_summary([elapsed for elapsed, _ in items]),
+            }
+            for tool, items in sorted(by_tool.items())
+        },
+        "top_errors": [{"error": str(error)[:200], "count": count}
+                       for error, count in Counter(errors).most_common(3)],
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def find_saturation(stages: List[dict], gain: float = DEFAULT_GAIN, max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+                    p95_slo_ms: float = None) -> Dict[str, Any]:
+    """
+    饱和点：第一个错误率超标、或吞吐量比上一级增幅不足 gain 的并发级别（报告上一级）；
+    可承受并发：错误率与 p95（给定 SLO 时）都达标的最大并发
+    """
+    saturation = None
+    for index, stage in enumerate(stages):
+        previous = stages[index - 1] if index else None
+        if stage["error_rate"] > max_error_rate:
+            saturation = {"concurrency": previous["concurrency"] if previous else None,
+                          "reason": f"并发 {stage['concurrency']} 时错误率 {stage['error_rate']:.2%}"}
+            break
+        if previous and stage["throughput_per_s"] < previous["throughput_per_s"] * (1 + gain):
+            saturation = {"concurrency": previous["concurrency"],
+                          "throughput_per_s": previous["throughput_per_s"],
+                          "reason": f"并发 {stage['concurrency']} 时吞吐量 {stage['throughput_per_s']}/s，"
+                                    f"增幅不足 {gain:.0%}"}
+            break
+
+    sustainable = None
+    for stage in stages:
+        p95 = stage["latency_ms"].get("p95", 0)
+        if stage["error_rate"] <= max_error_rate and (p95_slo_ms is None or p95 <= p95_slo_ms):
+            sustainable = stage["concurrency"]
+    return {
+        "saturation": saturation,
+        "max_sustainable_concurrency": sustainable,
+        "peak_throughput_per_s": max((s["throughput_per_s"] for s in stages), default=0),
+    }
+
+
+# ============================================================
+# 执行入口
+# ============================================================
+
+def _load_executor(via: str, host_path: Optional[str]):
+    """返回 (execute, 工具名映射)"""
+    sys.path.insert(0, ROOT)
+    if via == "tool":
+        import cms_tools
+        return cms_tools.execute_cms_tool, {}
+    if host_path:
+        sys.path.insert(0, host_path)
+    # 需要 GEO Chatbot 的 tools.base
+    import geo_chatbot_adapter.wordpress as adapter
+    from tools.base import registry
+    return registry.execute, dict(adapter._TOOL_ALIASES)
+
+
+def _set_faults(api_base: str, faults: Dict[str, float]) -> None:
+    url = api_base.split("/rest/", 1)[0] + "/__stub__/faults"
+    request = urllib.request.Request(url, data=json.dumps(faults).encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+
+
+def run(ramp: List[int], stage_seconds: float = 10, mix: Dict[str, float] = None, posts: int = 1000,
+        latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, throttle_rate: float = 0,
+        think_ms: float = 0, session_cache: bool = False, via: str = "tool", host_path: str = None,
+        gain: float = DEFAULT_GAIN, max_error_rate: float = DEFAULT_MAX_ERROR_RATE, p95_slo_ms: float = None,
+        keep_going: bool = False, seed: int = 0) -> Dict[str, Any]:
+    mix = mix or DEFAULT_MIX
+    report = {
+        "python": sys.version.split()[0],
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {"ramp": ramp, "stage_seconds": stage_seconds, "mix": mix, "posts": posts,
+                   "latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate,
+                   "throttle_rate": throttle_rate, "think_ms": think_ms, "session_cache": session_cache,
+                   "via": via, "gain": gain, "max_error_rate": max_error_rate, "p95_slo_ms": p95_slo_ms,
+                   "seed": seed},
+        "stages": [],
+    }
+    stub, api_base = _start_stub(posts, latency_ms, jitter_ms, seed)
+    workdir = tempfile.mkdtemp(prefix="cms_load_")
+    try:
+        if error_rate or throttle_rate:
+            _set_faults(api_base, {"error_rate": error_rate, "throttle_rate": throttle_rate})
+        os.environ["WP_API_BASE"] = api_base
+        os.environ.setdefault("WP_ACCESS_TOKEN", "load-test-token")
+        # 本地索引等写到临时目录
+        os.environ["CMS_STATE_DIR"] = workdir
+        execute, names = _load_executor(via, host_path)
+        from cms_stub_server import CATEGORY_NAMES
+
+        # 文章标题在整个压测中唯一，避免被幂等创建命中
+        sequence = itertools.count()
+        for concurrency in ramp:
+            stage = run_stage(execute, concurrency, stage_seconds, mix, think_ms, sequence, CATEGORY_NAMES,
+                              seed, api_base, session_cache=session_cache, names=names)
+            report["stages"].append(stage)
+            print(f"sessions={concurrency:<4} calls/s={stage['throughput_per_s']:<8} "
+                  f"p50={stage['latency_ms'].get('p50')}ms p95={stage['latency_ms'].get('p95')}ms "
+                  f"errors={stage['error_rate']:.2%}", file=sys.stderr)
+            analysis = find_saturation(report["stages"], gain, max_error_rate, p95_slo_ms)
+            if analysis["saturation"] and not keep_going:
+                break
+    finally:
+        stub.terminate()
+        stub.wait()
+    report.update(find_saturation(report["stages"], gain, max_error_rate, p95_slo_ms))
+    return report
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def _mix(text: str) -> Dict[str, float]:
+    """"publish=1,browse=3" -> {"publish": 1.0, "browse": 3.0}"""
+    mix = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in MIXES:
+            raise argparse.ArgumentTypeError(f"未知的流程: {name}（可选 {', '.join(MIXES)}）")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="并发 Agent 会话压测")
+    parser.add_argument("--ramp", type=_int_list, default=DEFAULT_RAMP, help="逐级的并发会话数，逗号分隔")
+    parser.add_argument("--stage-seconds", type=float, default=10, help="每级运行时长（秒）")
+    parser.add_argument("--mix", type=_mix, default=DEFAULT_MIX, help="流程权重（如 publish=1,browse=3）")
+    parser.add_argument("--posts", type=int, default=1000, help="替身站点的文章数")
+    parser.add_argument("--latency-ms", type=float, default=0, help="替身注入的网络延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="替身返回 500 的比例")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="替身返回 429 的比例")
+    parser.add_argument("--think-ms", type=float, default=0, help="每次工具调用前的模拟思考时间")
+    parser.add_argument("--session-cache", action="store_true", help="每个会话使用 ToolSession 缓存")
+    parser.add_argument("--via", choices=("tool", "registry"), default="tool",
+                        help="tool: cms_tools.execute_cms_tool；registry: 适配层 registry.execute")
+    parser.add_argument("--host-path", help="GEO Chatbot 所在目录（--via registry 时需要 tools.base）")
+    parser.add_argument("--gain", type=float, default=DEFAULT_GAIN, help="判定饱和的吞吐量增幅下限")
+    parser.add_argument("--max-error-rate", type=float, default=DEFAULT_MAX_ERROR_RATE)
+    parser.add_argument("--p95-slo-ms", type=float, help="可承受并发要求的 p95 延迟上限")
+    parser.add_argument("--keep-going", action="store_true", help="达到饱和点后继续完成全部并发级别")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.ramp, stage_seconds=args.stage_seconds, mix=args.mix, posts=args.posts,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, think_ms=args.think_ms, session_cache=args.session_cache,
+        via=args.via, host_path=args.host_path, gain=args.gain, max_error_rate=args.max_error_rate,
+        p95_slo_ms=args.p95_slo_ms, keep_going=args.keep_going, seed=args.seed
+    )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
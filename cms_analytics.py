@@ -0,0 +1,260 @@
+"""
+CMS Analytics - 浏览量矩阵向量化分析
+把 top-posts 或本地仓库的数据装载成 天数 × 文章 的 NumPy 矩阵，按分类/标签做趋势汇总
+
+- 按分类/标签汇总每日浏览量
+- 滚动窗口平均、增长率（最近窗口 vs 上一窗口）、衰减半衰期
+- 涨跌幅最大的文章、浏览量分位数
+
+365 天 × 5 万篇文章的矩阵（float32 约 70MB）上，所有汇总都是整列/整块运算。
+"""
+
+from itertools import repeat
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+
+import numpy as np
+
+
+# 文章 ID 跨度不超过该值时用查找表映射列号（比排序去重快），否则退回 np.unique
+_ID_TABLE_MAX_SPAN = 1 << 24
+
+
+def _index_ids(ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """文章 ID → (升序去重的 ID, 每条记录的列号)"""
+    if not len(ids):
+        return ids, ids
+    low = int(ids.min())
+    span = int(ids.max()) - low + 1
+    if span > _ID_TABLE_MAX_SPAN:
+        return np.unique(ids, return_inverse=True)
+    offsets = ids - low
+    present = np.zeros(span, dtype=bool)
+    present[offsets] = True
+    column = np.cumsum(present, dtype=np.int64) - 1
+    return np.flatnonzero(present) + low, column[offsets]
+
+
+class ViewsMatrix:
+    """
+    天数 × 文章 的浏览量矩阵
+
+    Attributes:
+        dates: 日期列表（升序）
+        post_ids: 每一列对应的文章 ID
+        views: float32 矩阵，views[i, j] 为 dates[i] 当天 post_ids[j] 的浏览量
+        titles: post_id -> 标题
+    """
+
+    def __init__(self, dates: List[str], post_ids: np.ndarray, views: np.ndarray, titles: Dict[int, str] = None):
+        self.dates = dates
+        self.post_ids = post_ids
+        self.views = views
+        self.titles = titles or {}
+        self._column = {int(pid): i for i, pid in enumerate(post_ids)}
+
+    @classmethod
+    def from_records(cls, days: Iterable[str], post_ids: Iterable[int], views: Iterable[int],
+                     titles: Dict[int, str] = None, dates: List[str] = None) -> "ViewsMatrix":
+        """
+        从 (日期, 文章, 浏览量) 三列记录构建矩阵
+
+        日期和文章 ID 先映射为行号/列号，再一次性写入矩阵；
+        每个 (日期, 文章) 只应出现一次（top-posts 和仓库数据都满足），重复时保留最后一条。
+        不在 dates 中的日期被忽略。
+        """
+        days = days if isinstance(days, (list, tuple)) else list(days)
+        if dates is None:
+            dates = sorted(set(days))
+        dates = list(dates)
+
+        # 日期是少量重复的字符串：用字典映射到行号，避免把整列字符串转成 NumPy 数组再排序/二分
+        row_of = {d: i for i, d in enumerate(dates)}
+        rows = np.fromiter(map(row_of.get, days, repeat(-1)), dtype=np.int64, count=len(days))
+        pid_arr = np.fromiter(post_ids, dtype=np.int64, count=len(days))
+        view_arr = np.fromiter(views, dtype=np.float32, count=len(days))
+
+        unique_ids, cols = _index_ids(pid_arr)
+        matrix = np.zeros((len(dates), len(unique_ids)), dtype=np.float32)
+        keep = rows >= 0
+        if not keep.all():
+            rows, cols, view_arr = rows[keep], cols[keep], view_arr[keep]
+        matrix[rows, cols] = view_arr
+        return cls(dates, unique_ids, matrix, titles)
+
+    @classmethod
+    def from_top_posts(cls, top_data: dict) -> "ViewsMatrix":
+        """从 /stats/top-posts 响应（days.*.postviews）构建矩阵"""
+        days, ids, views = [], [], []
+        titles = {}
+        for day, info in (top_data.get("days") or {}).items():
+            if not isinstance(info, dict):
+                continue
+            for p in info.get("postviews", []):
+                if isinstance(p, dict) and p.get("id"):
+                    days.append(day)
+                    ids.append(p["id"])
+                    views.append(p.get("views", 0))
+                    titles[p["id"]] = p.get("title", "")
+        all_dates = sorted(k for k, v in (top_data.get("days") or {}).items() if isinstance(v, dict))
+        return cls.from_records(days, ids, views, titles, dates=all_dates)
+
+    @classmethod
+    def from_warehouse(cls, warehouse, days: int = 30) -> "ViewsMatrix":
+        """从本地每日浏览量仓库（cms_warehouse.StatsWarehouse）构建矩阵"""
+        rows, titles, dates = warehouse.export_rows(days)
+        if not rows:
+            return cls.from_records([], [], [], titles, dates=dates)
+        day_col, id_col, view_col = zip(*rows)
+        return cls.from_records(day_col, id_col, view_col, titles, dates=dates)
+
+    # ---------- 基础运算 ----------
+
+    def columns(self, post_ids: Iterable[int]) -> np.ndarray:
+        """文章 ID → 列下标（忽略矩阵中没有的文章）"""
+        return np.fromiter(
+            (self._column[pid] for pid in post_ids if pid in self._column),
+            dtype=np.int64
+        )
+
+    def totals(self) -> np.ndarray:
+        """每篇文章在整个周期内的总浏览量"""
+        return self.views.sum(axis=0)
+
+    def group_daily(self, groups: Dict[str, List[int]]) -> Tuple[List[str], np.ndarray]:
+        """
+        按分组汇总每日浏览量
+
+        Returns:
+            (分组名称列表, 天数 × 分组 矩阵)
+        """
+        names = list(groups)
+        out = np.zeros((len(self.dates), len(names)), dtype=np.float32)
+        for i, name in enumerate(names):
+            cols = self.columns(groups[name])
+            if len(cols):
+                out[:, i] = self.views[:, cols].sum(axis=1)
+        return names, out
+
+
+# ============================================================
+# 向量化指标
+# ============================================================
+
+def rolling_mean(series: np.ndarray, window: int = 7) -> np.ndarray:
+    """沿时间轴（第 0 维）计算滚动平均；前 window-1 天按已有天数平均"""
+    window = max(1, window)
+    csum = np.cumsum(series, axis=0, dtype=np.float64)
+    out = csum.copy()
+    out[window:] = csum[window:] - csum[:-window]
+    counts = np.minimum(np.arange(1, series.shape[0] + 1), window).reshape((-1,) + (1,) * (series.ndim - 1))
+    return (out / counts).astype(np.float32)
+
+
+def window_sums(series: np.ndarray, window: int = 7) -> Tuple[np.ndarray, np.ndarray]:
+    """最近一个窗口和上一个窗口的浏览量合计"""
+    recent = series[-window:].sum(axis=0)
+    previous = series[-2 * window:-window].sum(axis=0) if series.shape[0] > window else np.zeros_like(recent)
+    return recent, previous
+
+
+def growth_rate(series: np.ndarray, window: int = 7) -> np.ndarray:
+    """增长率 = 最近窗口 / 上一窗口 - 1（上一窗口为 0 时为 NaN）"""
+    recent, previous = window_sums(series, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous > 0, recent / previous - 1.0, np.nan)
+
+
+def decay_half_life(series: np.ndarray) -> np.ndarray:
+    """
+    峰值之后的衰减半衰期（天）
+
+    对每一列在峰值之后的 log(1 + views) 做最小二乘直线拟合，斜率为负时
+    半衰期 = ln2 / -斜率；没有衰减（斜率 >= 0 或峰值在最后一天）时为 NaN。
+    """
+    n_days = series.shape[0]
+    peaks = series.argmax(axis=0)
+    t = np.arange(n_days, dtype=np.float64)[:, None]
+    after = t >= peaks[None, :]
+    logs = np.log1p(series.astype(np.float64))
+
+    n = after.sum(axis=0)
+    tx = np.where(after, t, 0.0)
+    ly = np.where(after, logs, 0.0)
+    sum_t, sum_y = tx.sum(axis=0), ly.sum(axis=0)
+    sum_tt, sum_ty = (tx * tx).sum(axis=0), (tx * ly).sum(axis=0)
+    denom = n * sum_tt - sum_t * sum_t
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom > 0, (n * sum_ty - sum_t * sum_y) / denom, np.nan)
+        return np.where((slope < 0) & (n >= 3), np.log(2) / -slope, np.nan)
+
+
+def top_movers(matrix: ViewsMatrix, window: int = 7, limit: int = 10) -> List[Dict[str, Any]]:
+    """最近窗口相对上一窗口浏览量变化最大的文章（按变化量绝对值）"""
+    if not matrix.views.size:
+        return []
+    recent, previous = window_sums(matrix.views, window)
+    change = recent - previous
+    limit = min(limit, change.shape[0])
+    idx = np.argpartition(-np.abs(change), limit - 1)[:limit]
+    idx = idx[np.argsort(-np.abs(change[idx]))]
+    movers = []
+    for i in idx:
+        pid = int(matrix.post_ids[i])
+        movers.append({
+            "id": pid,
+            "title": matrix.titles.get(pid, ""),
+            "views_recent": int(recent[i]),
+            "views_previous": int(previous[i]),
+            "change": int(change[i]),
+            "growth_rate": round(float(recent[i] / previous[i] - 1), 4) if previous[i] > 0 else None
+        })
+    return movers
+
+
+def percentiles(values: np.ndarray, points=(50, 75, 90, 95, 99)) -> Dict[str, float]:
+    """浏览量分位数"""
+    if not values.size:
+        return {f"p{p}": 0.0 for p in points}
+    result = np.percentile(values, points)
+    return {f"p{p}": round(float(v), 2) for p, v in zip(points, result)}
+
+
+def _clean(value: float, digits: int = 4) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def topic_trends(
+    matrix: ViewsMatrix,
+    groups: Dict[str, List[int]],
+    window: int = 7,
+    top_n: int = 10
+) -> Dict[str, Any]:
+    """
+    分类/标签趋势汇总
+
+    Returns:
+        {"groups": [...], "top_movers": [...], "post_percentiles": {...}}
+    """
+    names, daily = matrix.group_daily(groups)
+    rolling = rolling_mean(daily, window) if daily.size else daily
+    growth = growth_rate(daily, window) if daily.size else np.array([])
+    half_life = decay_half_life(daily) if daily.size else np.array([])
+    totals = daily.sum(axis=0) if daily.size else np.zeros(len(names))
+
+    group_rows = []
+    for i, name in enumerate(names):
+        group_rows.append({
+            "name": name,
+            "posts": len(groups[name]),
+            "total_views": int(totals[i]),
+            "rolling_avg": _clean(rolling[-1, i], 2) if daily.size else 0.0,
+            "growth_rate": _clean(growth[i]) if daily.size else None,
+            "half_life_days": _clean(half_life[i], 1) if daily.size else None
+        })
+    group_rows.sort(key=lambda g: g["total_views"], reverse=True)
+
+    return {
+        "groups": group_rows[:top_n] if top_n else group_rows,
+        "top_movers": top_movers(matrix, window, top_n),
+        "post_percentiles": percentiles(matrix.totals())
+    }
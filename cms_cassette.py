@@ -0,0 +1,321 @@
+"""
+CMS Cassette - 录制/回放 _make_request 的 HTTP 交互
+录制模式把真实 API 的响应写入 gzip 压缩的 JSONL 文件（cassette）；回放模式不访问网络，
+按请求匹配录制的响应，并按原始延迟（可缩放）等待后返回。用于对真实数据做确定性的性能测试和回归测试。
+
+文件格式（每行一个 JSON）：
+    {"version": 1, "recorded_at": ..., "api_base": ...}                          文件头
+    {"method": "GET", "endpoint": "/sites/1/posts/2", "params": [["fields", "ID"]],
+     "body_sha256": ..., "status": 200, "headers": {...}, "content": "...", "elapsed_ms": 83.1}
+
+不保存请求头；参数中的令牌类字段和响应中出现的 WP_ACCESS_TOKEN 替换为 [REDACTED]。
+
+匹配规则：先按 方法 + 接口 + 参数 + 请求体摘要 精确匹配，找不到时忽略请求体再匹配
+（例如每次标题不同的创建请求）。同一请求录制了多次时按录制顺序依次返回，用完后从头循环。
+
+用法:
+    export CMS_CASSETTE=record
+    export CMS_CASSETTE_FILE=/tmp/session.cassette.jsonl.gz
+    python run_agent_session.py                                    # 访问真实 API 并录制
+
+    export CMS_CASSETTE=replay
+    export CMS_CASSETTE_LATENCY_SCALE=0.5                          # 按原始延迟的一半等待，0 为不等待
+    python run_agent_session.py                                    # 不访问网络
+"""
+
+import os
+import json
+import gzip
+import time
+import atexit
+import hashlib
+import threading
+from typing import Optional, List, Dict, Any, Tuple
+
+from cms_index import CMS_STATE_DIR
+
+# record / replay，留空关闭
+CMS_CASSETTE = os.getenv("CMS_CASSETTE", "")
+CMS_CASSETTE_FILE = os.getenv("CMS_CASSETTE_FILE", os.path.join(CMS_STATE_DIR, "cassette.jsonl.gz"))
+CMS_CASSETTE_LATENCY_SCALE = float(os.getenv("CMS_CASSETTE_LATENCY_SCALE", "1"))
+
+CASSETTE_MODES = ("record", "replay")
+CASSETTE_VERSION = 1
+
+REDACTED = "[REDACTED]"
+# 录制时替换的参数名（小写比较）
+SENSITIVE_KEYS = {"access_token", "token", "authorization", "client_secret", "password"}
+# 只保存这些响应头
+_KEPT_HEADERS = ("content-type", "retry-after")
+
+
+class CassetteMiss(Exception):
+    """回放时 cassette 中没有匹配的请求"""
+
+
+class _ReplayedRequest:
+    __slots__ = ("body",)
+
+    def __init__(self, body: Optional[bytes]):
+        self.body = body
+
+
+class CassetteResponse:
+    """回放的响应，提供 _make_request 用到的 requests.Response 属性"""
+
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str], request_body: Optional[bytes]):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.request = _ReplayedRequest(request_body)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _normalize_params(params: Optional[dict]) -> List[List[str]]:
+    if not params:
+        return []
+    return sorted(
+        [str(key), REDACTED if str(key).lower() in SENSITIVE_KEYS else str(value)]
+        for key, value in params.items() if value is not None
+    )
+
+
+def _body_digest(data: Optional[dict], body) -> Optional[str]:
+    """请求体摘要：JSON 按键排序后计算；流式请求体（如 multipart 上传）不参与匹配"""
+    if data is not None:
+        raw = json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    elif isinstance(body, str):
+        raw = body.encode("utf-8")
+    elif isinstance(body, (bytes, bytearray)):
+        raw = bytes(body)
+    else:
+        return None
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _complete_lines(f):
+    """逐行读取；文件没有正常关闭时丢弃最后不完整的一行"""
+    try:
+        for line in f:
+            if line.endswith("\n"):
+                yield line
+    except EOFError:
+        return
+
+
+class Cassette:
+    """
+    一个 cassette 文件
+
+    Args:
+        path: 文件路径（gzip 压缩的 JSONL）
+        mode: record（覆盖已有文件）/ replay
+        latency_scale: 回放时等待 原始延迟 × latency_scale，0 为不等待
+        secrets: 录制时从响应内容中替换掉的字符串（默认 WP_ACCESS_TOKEN）
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        mode: str = None,
+        latency_scale: float = None,
+        secrets: List[str] = None
+    ):
+        self.path = os.path.expanduser(path or CMS_CASSETTE_FILE)
+        self.mode = mode or CMS_CASSETTE
+        if self.mode not in CASSETTE_MODES:
+            raise ValueError(f"无效的 cassette 模式: {self.mode}")
+        self.latency_scale = CMS_CASSETTE_LATENCY_SCALE if latency_scale is None else latency_scale
+        if secrets is None:
+            secrets = [os.getenv("WP_ACCESS_TOKEN", "")]
+        self.secrets = [s for s in secrets if s]
+        self._lock = threading.Lock()
+        self._file = None
+        self._opened = False
+        self.counters = {"recorded": 0, "replayed": 0, "fallback": 0, "missed": 0}
+
+        # 回放索引：完整键 / 忽略请求体的键 -> [记录列表, 下一个位置]
+        self._exact: Dict[Tuple, list] = {}
+        self._loose: Dict[Tuple, list] = {}
+        if self.mode == "replay":
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ---------- 录制 ----------
+
+    def _scrub(self, text: str) -> str:
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        return text
+
+    def record(
+        self,
+        method: str,
+        endpoint: str,
+        response,
+        params: dict = None,
+        data: dict = None,
+        body=None,
+        elapsed: float = 0.0
+    ) -> None:
+        """追加一条交互（response 为 requests.Response）"""
+        entry = {
+            "method": method.upper(),
+            "endpoint": self._scrub(endpoint),
+            "params": [[key, self._scrub(value)] for key, value in _normalize_params(params)],
+            "body_sha256": _body_digest(data, body),
+            "status": response.status_code,
+            "headers": {
+                name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers
+            },
+            "content": self._scrub(response.content.decode("utf-8", errors="replace")),
+            "elapsed_ms": round(elapsed * 1000, 3),
+        }
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._file.write(line)
+            # 进程异常退出（没有写入 gzip 结尾）时已写入的记录仍可读
+            self._file.flush()
+            self.counters["recorded"] += 1
+
+    def _open(self) -> None:
+        """第一次打开时覆盖已有文件并写入文件头；close() 之后再录制则追加一个新的 gzip 成员"""
+        if self._opened:
+            self._file = gzip.open(self.path, "ab")
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(self.path, "wb")
+        self._opened = True
+        atexit.register(self.close)
+        header = {
+            "version": CASSETTE_VERSION,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "api_base": os.getenv("WP_API_BASE", ""),
+        }
+        self._file.write((json.dumps(header) + "\n").encode("utf-8"))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------- 回放 ----------
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"不支持的 cassette 版本: {header.get('version')}")
+            for line in _complete_lines(f):
+                entry = json.loads(line)
+                loose = (entry["method"], entry["endpoint"], tuple(map(tuple, entry["params"])))
+                exact = loose + (entry["body_sha256"],)
+                self._exact.setdefault(exact, [[], 0])[0].append(entry)
+                self._loose.setdefault(loose, [[], 0])[0].append(entry)
+
+    @staticmethod
+    def _next(slot: list) -> dict:
+        entries, position = slot
+        slot[1] = (position + 1) % len(entries)
+        return entries[position]
+
+    def play(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict = None,
+        data: dict = None,
+        body=None,
+        timeout: float = None
+    ) -> CassetteResponse:
+        """
+        返回匹配的录制响应
+
+        Raises:
+            CassetteMiss: 没有匹配的记录
+            requests.exceptions.Timeout: 缩放后的延迟超过 timeout（等待 timeout 后抛出）
+        """
+        method = method.upper()
+        loose = (method, endpoint, tuple(tuple(p) for p in _normalize_params(params)))
+        exact = loose + (_body_digest(data, body),)
+        with self._lock:
+            if exact in self._exact:
+                entry = self._next(self._exact[exact])
+                self.counters["replayed"] += 1
+            elif loose in self._loose:
+                entry = self._next(self._loose[loose])
+                self.counters["replayed"] += 1
+                self.counters["fallback"] += 1
+            else:
+                self.counters["missed"] += 1
+                raise CassetteMiss(f"cassette 中没有匹配的请求: {method} {endpoint}")
+
+        delay = entry["elapsed_ms"] / 1000 * self.latency_scale
+        if timeout is not None and delay > timeout:
+            import requests
+            time.sleep(max(timeout, 0))
+            raise requests.exceptions.Timeout(f"回放延迟 {delay:.3f}s 超过超时 {timeout}s")
+        if delay > 0:
+            time.sleep(delay)
+
+        request_body = None
+        if data is not None:
+            request_body = json.dumps(data).encode("utf-8")
+        return CassetteResponse(entry["status"], entry["content"].encode("utf-8"), entry["headers"], request_body)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "mode": self.mode,
+                "latency_scale": self.latency_scale,
+                "interactions": sum(len(slot[0]) for slot in self._exact.values()),
+                **self.counters
+            }
+
+
+_CASSETTE: Optional[Cassette] = None
+_CASSETTE_LOADED = False
+_CASSETTE_LOCK = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """全局 cassette（按环境变量配置，未开启时为 None）"""
+    global _CASSETTE, _CASSETTE_LOADED
+    if not _CASSETTE_LOADED:
+        with _CASSETTE_LOCK:
+            if not _CASSETTE_LOADED:
+                if CMS_CASSETTE:
+                    _CASSETTE = Cassette()
+                _CASSETTE_LOADED = True
+    return _CASSETTE
+
+
+def set_cassette(cassette: Optional[Cassette]) -> Optional[Cassette]:
+    """替换全局 cassette（None 关闭录制/回放），返回之前的 cassette；录制中的旧 cassette 会被关闭"""
+    global _CASSETTE, _CASSETTE_LOADED
+    with _CASSETTE_LOCK:
+        previous = _CASSETTE
+        _CASSETTE = cassette
+        _CASSETTE_LOADED = True
+    if previous is not None and previous is not cassette:
+        previous.close()
+    return previous
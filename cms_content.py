@@ -0,0 +1,325 @@
+"""
+CMS Content - 文章 HTML 压缩
+在 create/update 之前清理 LLM 生成的 HTML，缩小请求体
+
+- 未闭合的 <p>/<li>/<dt>/<dd>/<option>/<tr>/<td> 按浏览器规则隐式闭合，不会被嵌套
+- 合并多余空白（<pre>/<textarea>/<script>/<style> 内保持原样）
+- 删除空元素（如 <p> </p>、<span></span>）；带 id/name/class/style/role/aria-*/data-* 属性的空元素
+  （锚点、图标字体 <i class="fa ...">、wp-block-spacer 等）保留
+- 删除 inline style 与普通注释（保留 Gutenberg 的 <!-- wp:... --> 区块注释）
+- Gutenberg 区块（<!-- wp:... --> 与 <!-- /wp:... --> 之间）内的空元素和 style 原样保留，避免区块校验失败
+- CDATA 与处理指令（<?...>）原样保留
+- 实体归一化：&eacute;、&#8217; 等转为字符，只保留必须转义的 &amp; &lt; &gt; &quot;
+
+批量任务可用 compact_many(..., processes=N) 在进程池中处理，避免占用主线程。
+"""
+
+import re
+import html
+from html.parser import HTMLParser
+from typing import List, Tuple, Dict, Any, Optional
+
+# 无结束标签的元素
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "source", "track", "wbr"
+}
+
+# 内部空白需要原样保留的元素
+PRESERVE_WHITESPACE = {"pre", "textarea", "script", "style"}
+
+# 内容为空时可以删除的元素
+REMOVABLE_WHEN_EMPTY = {
+    "p", "span", "div", "strong", "b", "em", "i", "u", "s", "font", "small",
+    "mark", "sup", "sub", "blockquote", "section", "li", "ul", "ol",
+    "h1", "h2", "h3", "h4", "h5", "h6"
+}
+
+# 带这些属性的空元素有含义（锚点、图标、样式钩子、无障碍），不删除
+_MEANINGFUL_ATTRS = {"id", "name", "class", "style", "role"}
+_MEANINGFUL_ATTR_PREFIXES = ("aria-", "data-")
+
+# 块级元素：与其相邻的纯空白文本可以直接删除
+BLOCK_ELEMENTS = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+    "tbody", "td", "tfoot", "th", "thead", "tr", "ul", "br"
+}
+
+# 隐式闭合：打开这些元素时，先关闭尚未闭合的同类元素（与浏览器解析一致），
+# 避免 <p>a<p>b、<li>a<li>b 被嵌套，序列化后多出空段落或嵌套列表。
+# tag -> (被关闭的元素, 查找到这些元素时停止)
+_P_SCOPE = {"button", "table", "td", "th", "caption", "object", "template"}
+_IMPLIED_END = {
+    "p": ({"p"}, _P_SCOPE),
+    "li": ({"li"}, {"ul", "ol", "menu"}),
+    "dt": ({"dt", "dd"}, {"dl"}),
+    "dd": ({"dt", "dd"}, {"dl"}),
+    "option": ({"option"}, {"select", "datalist", "optgroup"}),
+    "optgroup": ({"optgroup"}, {"select"}),
+    "tr": ({"tr"}, {"table", "thead", "tbody", "tfoot"}),
+    "td": ({"td", "th"}, {"tr", "table"}),
+    "th": ({"td", "th"}, {"tr", "table"}),
+}
+# 打开这些块级元素时同样关闭未闭合的 <p>
+_CLOSES_P = {
+    "address", "article", "aside", "blockquote", "details", "div", "dl", "fieldset",
+    "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hgroup", "hr", "main", "menu", "nav", "ol", "pre", "section", "table", "ul"
+}
+for _tag in _CLOSES_P:
+    _IMPLIED_END.setdefault(_tag, _IMPLIED_END["p"])
+
+_WHITESPACE_RE = re.compile(r"[ \t\r\n\f]+")
+
+
+class _Node:
+    __slots__ = ("tag", "attrs", "children")
+
+    def __init__(self, tag: Optional[str], attrs=None):
+        self.tag = tag
+        self.attrs = attrs or []
+        self.children = []
+
+
+class _TreeBuilder(HTMLParser):
+    """把 HTML 解析成简单的节点树（容忍未闭合标签，按 _IMPLIED_END 隐式闭合）"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node(None)
+        self.stack = [self.root]
+
+    def _close_implied(self, tag):
+        implied = _IMPLIED_END.get(tag)
+        if not implied:
+            return
+        closes, boundaries = implied
+        for i in range(len(self.stack) - 1, 0, -1):
+            open_tag = self.stack[i].tag
+            if open_tag in closes:
+                del self.stack[i:]
+                return
+            if open_tag in boundaries:
+                return
+
+    def handle_starttag(self, tag, attrs):
+        self._close_implied(tag)
+        node = _Node(tag, attrs)
+        self.stack[-1].children.append(node)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self._close_implied(tag)
+        self.stack[-1].children.append(_Node(tag, attrs))
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        self.stack[-1].children.append(data)
+
+    def handle_comment(self, data):
+        self.stack[-1].children.append(("comment", data))
+
+    def handle_decl(self, decl):
+        self.stack[-1].children.append(("decl", decl))
+
+    def unknown_decl(self, data):
+        # <![CDATA[...]]> 等标记段
+        self.stack[-1].children.append(("marked", data))
+
+    def handle_pi(self, data):
+        self.stack[-1].children.append(("pi", data))
+
+
+def _in_preserved(stack: List[str]) -> bool:
+    return any(tag in PRESERVE_WHITESPACE for tag in stack)
+
+
+def _clean(node: _Node, options: Dict[str, Any], stack: List[str], in_block: bool = False) -> None:
+    """
+    就地清理子节点：删注释、style、空元素，合并空白
+
+    in_block: 是否位于 Gutenberg 区块注释之间（区块内不删空元素和 style）
+    """
+    preserved = _in_preserved(stack)
+    # 当前层级中尚未闭合的区块注释数
+    block_depth = 0
+    children = []
+    for child in node.children:
+        inside = in_block or block_depth > 0
+        if isinstance(child, _Node):
+            if options["strip_styles"] and not inside:
+                child.attrs = [(k, v) for k, v in child.attrs if k != "style"]
+            _clean(child, options, stack + [child.tag], inside)
+            if options["strip_empty"] and not inside and _is_empty(child):
+                continue
+            children.append(child)
+        elif isinstance(child, tuple):
+            kind, data = child
+            if kind == "comment" and _is_block_comment(data):
+                block_depth = max(0, block_depth + _block_comment_delta(data))
+            elif kind == "comment" and options["strip_comments"]:
+                continue
+            children.append(child)
+        elif preserved:
+            children.append(child)
+        elif options["minify"]:
+            text = _WHITESPACE_RE.sub(" ", child)
+            if text:
+                if children and isinstance(children[-1], str):
+                    children[-1] = _WHITESPACE_RE.sub(" ", children[-1] + text)
+                else:
+                    children.append(text)
+        else:
+            children.append(child)
+
+    if options["minify"] and not preserved:
+        children = _drop_block_whitespace(children, node.tag)
+    node.children = children
+
+
+def _drop_block_whitespace(children: list, parent_tag: Optional[str]) -> list:
+    """删除与块级元素相邻的空白，并修剪块级元素内部首尾空白"""
+    result = []
+    for i, child in enumerate(children):
+        if isinstance(child, str):
+            prev = children[i - 1] if i > 0 else None
+            nxt = children[i + 1] if i + 1 < len(children) else None
+            if _is_block(prev) or (prev is None and (parent_tag is None or parent_tag in BLOCK_ELEMENTS)):
+                child = child.lstrip(" ")
+            if _is_block(nxt) or (nxt is None and (parent_tag is None or parent_tag in BLOCK_ELEMENTS)):
+                child = child.rstrip(" ")
+            if not child:
+                continue
+        result.append(child)
+    return result
+
+
+def _is_block(node) -> bool:
+    if isinstance(node, tuple):
+        # CDATA、处理指令按行内内容处理
+        return node[0] in ("comment", "decl")
+    return isinstance(node, _Node) and node.tag in BLOCK_ELEMENTS
+
+
+def _is_block_comment(data: str) -> bool:
+    """Gutenberg 区块注释必须保留，否则编辑器无法识别区块"""
+    data = data.strip()
+    return data.startswith("wp:") or data.startswith("/wp:")
+
+
+def _block_comment_delta(data: str) -> int:
+    """<!-- wp:x --> 开始区块 +1，<!-- /wp:x --> 结束 -1，自闭合的 <!-- wp:x /--> 为 0"""
+    data = data.strip()
+    if data.startswith("/wp:"):
+        return -1
+    return 0 if data.endswith("/") else 1
+
+
+def _is_empty(node: _Node) -> bool:
+    if node.tag not in REMOVABLE_WHEN_EMPTY:
+        return False
+    if any(k in _MEANINGFUL_ATTRS or k.startswith(_MEANINGFUL_ATTR_PREFIXES) for k, _ in node.attrs):
+        return False
+    for child in node.children:
+        if isinstance(child, str):
+            if child.strip(" \t\r\n\f"):
+                return False
+        else:
+            return False
+    return True
+
+
+def _serialize(node: _Node, out: List[str], raw_text: bool = False) -> None:
+    for child in node.children:
+        if isinstance(child, str):
+            out.append(child if raw_text else html.escape(child, quote=False))
+        elif isinstance(child, tuple):
+            kind, data = child
+            if kind == "comment":
+                out.append(f"<!--{data}-->")
+            elif kind == "marked":
+                out.append(f"<![{data}]]>")
+            elif kind == "pi":
+                out.append(f"<?{data}>")
+            else:
+                out.append(f"<!{data}>")
+        else:
+            attrs = "".join(
+                f" {k}" if v is None else f' {k}="{html.escape(v, quote=True)}"'
+                for k, v in child.attrs
+            )
+            out.append(f"<{child.tag}{attrs}>")
+            if child.tag not in VOID_ELEMENTS:
+                _serialize(child, out, raw_text=child.tag in ("script", "style"))
+                out.append(f"</{child.tag}>")
+
+
+def compact_html(
+    content: str,
+    minify: bool = True,
+    strip_empty: bool = True,
+    strip_styles: bool = True,
+    strip_comments: bool = True
+) -> Tuple[str, Dict[str, int]]:
+    """
+    压缩文章 HTML
+
+    Returns:
+        (压缩后的 HTML, {"original_bytes", "compacted_bytes", "saved_bytes"})
+    """
+    original_bytes = len(content.encode("utf-8"))
+    builder = _TreeBuilder()
+    builder.feed(content)
+    builder.close()
+
+    options = {
+        "minify": minify,
+        "strip_empty": strip_empty,
+        "strip_styles": strip_styles,
+        "strip_comments": strip_comments
+    }
+    _clean(builder.root, options, [])
+
+    out = []
+    _serialize(builder.root, out)
+    compacted = "".join(out)
+    compacted_bytes = len(compacted.encode("utf-8"))
+    return compacted, {
+        "original_bytes": original_bytes,
+        "compacted_bytes": compacted_bytes,
+        "saved_bytes": original_bytes - compacted_bytes
+    }
+
+
+def _compact_one(args: Tuple[str, Dict[str, Any]]) -> Tuple[str, Dict[str, int]]:
+    content, options = args
+    return compact_html(content, **options)
+
+
+def compact_many(
+    contents: List[str],
+    processes: int = None,
+    chunksize: int = 8,
+    **options
+) -> List[Tuple[str, Dict[str, int]]]:
+    """
+    批量压缩 HTML
+
+    Args:
+        processes: 进程池大小；为 None 或 1 时在当前进程中处理
+        chunksize: 每次分发给子进程的文档数
+    """
+    if not processes or processes <= 1 or len(contents) <= 1:
+        return [compact_html(content, **options) for content in contents]
+    # 进程池（multiprocessing）只在批量处理时导入
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_compact_one, [(c, options) for c in contents], chunksize=chunksize))
@@ -0,0 +1,74 @@
+"""
+CMS Deadline - 工具调用的总时间预算
+一次工具调用可能依次发出多个请求（get_article_metrics 最多 4 个），每个请求各自 30 秒超时时
+总耗时可达 2 分钟。设置时间预算后：
+
+- 预算保存在上下文（contextvars）中，线程池中的子任务经 cms_tracing.bind_context 继承
+- _make_request 的超时取 min(原超时, 剩余时间)，预算用完时不再发请求
+- 可选的统计子请求在剩余时间不足 CMS_DEADLINE_RESERVE 时跳过，工具返回 data.partial = True
+
+用法:
+    export CMS_TOOL_DEADLINE=20                        # execute_cms_tool 默认预算（秒），0 不限制
+
+    execute_cms_tool("get_article_metrics", {"post_id": 1}, deadline=5)
+
+    with tool_deadline(5):                             # 经适配层 registry.execute 调用时从上下文获取
+        registry.execute("get_article_metrics", {"post_id": 1})
+"""
+
+import os
+import time
+import contextlib
+import contextvars
+from typing import Optional, List
+
+CMS_TOOL_DEADLINE = float(os.getenv("CMS_TOOL_DEADLINE", "0"))
+# 剩余时间低于该值（秒）时跳过可选的统计子请求
+CMS_DEADLINE_RESERVE = float(os.getenv("CMS_DEADLINE_RESERVE", "1"))
+
+# 截止时间（time.monotonic()），None 表示不限制
+_DEADLINE: contextvars.ContextVar = contextvars.ContextVar("cms_deadline", default=None)
+
+
+@contextlib.contextmanager
+def tool_deadline(seconds: Optional[float]):
+    """
+    在 seconds 秒的预算内执行（None 或 <= 0 不限制）；
+    嵌套时取更早的截止时间，内层不能延长外层的预算
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _DEADLINE.get()
+    token = _DEADLINE.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """剩余时间（秒，可能为负）；没有预算时为 None"""
+    deadline = _DEADLINE.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def request_timeout(timeout: float) -> float:
+    """请求超时：不超过剩余时间"""
+    left = remaining()
+    return timeout if left is None else min(timeout, left)
+
+
+def has_budget(reserve: float = None) -> bool:
+    """剩余时间是否足够再发一个可选请求（没有预算时总是 True）"""
+    left = remaining()
+    return left is None or left >= (CMS_DEADLINE_RESERVE if reserve is None else reserve)
+
+
+def mark_partial(data: dict, skipped: List[str]) -> dict:
+    """有步骤因时间预算被跳过或超时时，在结果数据中标记 partial / skipped"""
+    if skipped:
+        data["partial"] = True
+        data["skipped"] = skipped
+    return data
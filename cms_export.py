@@ -0,0 +1,258 @@
+"""
+CMS Export - 全量导出文章（NDJSON / gzip-NDJSON）
+用于备份和离线分析，内存占用与文章总数无关
+
+- 逐页拉取文章，当前页写盘的同时在后台预取下一页
+- 浏览量从一次 top-posts 请求建立的共享索引中关联，不再逐篇调用 get_article_metrics
+- 每写完一页把游标（page_handle）和文件字节偏移记录到 <输出文件>.cursor，中断后先截断到该偏移
+  （丢弃写了一半的页）再从该处继续
+- 游标同时记录导出参数（站点、状态筛选、是否含正文/指标、压缩），参数与上次不同时重新导出，
+  避免同一文件中混入结构不同的记录
+- gzip 输出每页压缩为一个完整的 gzip 成员，截断后文件仍然可读（gzip / zcat 按多成员读取）
+
+用法:
+    python cms_export.py posts.ndjson.gz --metrics --days 30
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any
+
+import cms_tools
+
+# 每页文章数（WordPress.com 上限 100）
+PAGE_SIZE = 100
+
+# top-posts 的 max=0 表示返回全部文章
+_TOP_POSTS_ALL = 0
+
+# 导出字段
+_EXPORT_FIELDS = (
+    "ID,title,status,URL,slug,date,modified,excerpt,author,"
+    "categories,tags,like_count,comment_count,word_count"
+)
+
+
+def _cursor_path(path: str) -> str:
+    return f"{path}.cursor"
+
+
+def _load_cursor(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_cursor_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cursor(path: str, cursor: Dict[str, Any]) -> None:
+    tmp = _cursor_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cursor, f)
+    os.replace(tmp, _cursor_path(path))
+
+
+def _export_options(status: str, include_content: bool, include_metrics: bool, days: int, compress: bool) -> dict:
+    """决定输出记录结构的导出参数，记录在游标中"""
+    return {
+        "site": str(cms_tools.WP_SITE_ID),
+        "status": status or "any",
+        "include_content": bool(include_content),
+        "include_metrics": bool(include_metrics),
+        "days": days if include_metrics else None,
+        "compress": bool(compress)
+    }
+
+
+def _can_resume(path: str, cursor: Dict[str, Any], options: Dict[str, Any]) -> bool:
+    """游标的导出参数与本次相同、记录了偏移，且文件至少有这么长"""
+    if cursor.get("options") != options:
+        return False
+    offset = cursor.get("offset")
+    if not isinstance(offset, int):
+        return False
+    try:
+        return os.path.getsize(path) >= offset
+    except OSError:
+        return False
+
+
+def _fetch_page(params: Dict[str, Any], page_handle: Optional[str]) -> dict:
+    if page_handle:
+        params = {**params, "page_handle": page_handle}
+    return cms_tools._make_request("GET", f"/sites/{cms_tools.WP_SITE_ID}/posts/", params=params)
+
+
+def _to_record(post: dict, views_map: Optional[Dict[int, int]], include_content: bool) -> dict:
+    record = {
+        "id": post["ID"],
+        "title": post.get("title"),
+        "status": post.get("status"),
+        "url": post.get("URL"),
+        "slug": post.get("slug"),
+        "date": post.get("date"),
+        "modified": post.get("modified"),
+        "author": (post.get("author") or {}).get("name", ""),
+        "excerpt": post.get("excerpt", ""),
+        "categories": list((post.get("categories") or {}).keys()),
+        "tags": list((post.get("tags") or {}).keys())
+    }
+    if include_content:
+        record["content"] = post.get("content", "")
+    if views_map is not None:
+        record["metrics"] = {
+            "views": views_map.get(post["ID"], 0),
+            "likes": post.get("like_count", 0),
+            "comments": post.get("comment_count", 0),
+            "word_count": post.get("word_count", 0)
+        }
+    return record
+
+
+def export_posts(
+    path: str,
+    status: str = "any",
+    include_content: bool = True,
+    include_metrics: bool = False,
+    days: int = 30,
+    resume: bool = True,
+    compress: bool = None,
+    progress_callback=None
+) -> dict:
+    """
+    导出全部文章到 NDJSON 文件（每行一篇）
+
+    Args:
+        path: 输出文件路径，以 .gz 结尾时默认 gzip 压缩
+        status: 状态筛选（默认 any）
+        include_content: 是否包含正文
+        include_metrics: 是否包含浏览量/点赞/评论等指标
+        days: 浏览量统计天数
+        resume: 存在游标文件且导出参数相同时从上次中断处继续（截断到游标记录的偏移后追加写入）
+        compress: 是否 gzip 压缩（默认按扩展名判断）
+        progress_callback: 进度回调 callback(exported)
+
+    Returns:
+        {"success": True, "data": {"path", "exported", "pages", "resumed", "elapsed_seconds"}}
+    """
+    if compress is None:
+        compress = path.endswith(".gz")
+    started = time.time()
+    days = min(max(1, days), 365)
+    options = _export_options(status, include_content, include_metrics, days, compress)
+
+    cursor = _load_cursor(path) if resume else None
+    if cursor and not _can_resume(path, cursor, options):
+        # 参数不同或游标与文件对不上（旧版游标、文件被删除或比记录的短）：重新导出
+        cursor = None
+    if cursor and cursor.get("done"):
+        return {"success": True, "data": {"path": path, "exported": cursor["exported"], "pages": 0,
+                                          "resumed": True, "elapsed_seconds": 0.0}}
+
+    # 共享浏览量索引：一次 top-posts 请求覆盖所有文章
+    views_map = None
+    if include_metrics:
+        top_posts_result = cms_tools._make_request(
+            "GET",
+            f"/sites/{cms_tools.WP_SITE_ID}/stats/top-posts",
+            params={"num": days, "max": _TOP_POSTS_ALL}
+        )
+        views_map = cms_tools._build_views_map(top_posts_result["data"]) if top_posts_result["success"] else {}
+
+    params = {
+        "number": PAGE_SIZE,
+        "status": status or "any",
+        "order_by": "date",
+        "order": "DESC",
+        "fields": _EXPORT_FIELDS + (",content" if include_content else "")
+    }
+
+    exported = cursor["exported"] if cursor else 0
+    page_handle = cursor.get("page_handle") if cursor else None
+    pages = 0
+
+    with ThreadPoolExecutor(max_workers=1) as prefetcher, \
+            open(path, "r+b" if cursor else "wb") as out:
+        if cursor:
+            # 丢弃上次中断时写了一半的页
+            out.truncate(cursor["offset"])
+            out.seek(cursor["offset"])
+        future = prefetcher.submit(_fetch_page, params, page_handle)
+        while True:
+            result = future.result()
+            if not result["success"]:
+                return {
+                    "success": False,
+                    "error": f"获取文章列表失败: {result['error']}",
+                    "data": {"path": path, "exported": exported, "pages": pages}
+                }
+
+            posts = result["data"].get("posts", [])
+            next_handle = result["data"].get("meta", {}).get("next_page")
+            if next_handle and posts:
+                # 写当前页的同时预取下一页
+                future = prefetcher.submit(_fetch_page, params, next_handle)
+
+            chunk = "".join(
+                json.dumps(_to_record(post, views_map, include_content), ensure_ascii=False) + "\n"
+                for post in posts
+            ).encode("utf-8")
+            if compress and chunk:
+                # 每页一个完整的 gzip 成员
+                chunk = gzip.compress(chunk)
+            out.write(chunk)
+            out.flush()
+            exported += len(posts)
+            pages += 1
+
+            done = not next_handle or not posts
+            _save_cursor(path, {"page_handle": next_handle, "exported": exported, "done": done,
+                                "offset": out.tell(), "options": options})
+            if progress_callback:
+                progress_callback(exported)
+            if done:
+                break
+
+    return {
+        "success": True,
+        "data": {
+            "path": path,
+            "exported": exported,
+            "pages": pages,
+            "resumed": cursor is not None,
+            "elapsed_seconds": round(time.time() - started, 2)
+        }
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="导出全部文章到 NDJSON")
+    parser.add_argument("path", help="输出文件（.gz 结尾时压缩）")
+    parser.add_argument("--status", default="any", choices=["publish", "draft", "private", "any"])
+    parser.add_argument("--no-content", action="store_true", help="不导出正文")
+    parser.add_argument("--metrics", action="store_true", help="包含浏览量等指标")
+    parser.add_argument("--days", type=int, default=30, help="浏览量统计天数")
+    parser.add_argument("--restart", action="store_true", help="忽略游标，重新导出")
+    args = parser.parse_args(argv)
+
+    result = export_posts(
+        args.path,
+        status=args.status,
+        include_content=not args.no_content,
+        include_metrics=args.metrics,
+        days=args.days,
+        resume=not args.restart,
+        progress_callback=lambda n: print(f"\r已导出 {n} 篇", end="", file=sys.stderr)
+    )
+    print(file=sys.stderr)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0 if result["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
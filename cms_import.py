@@ -0,0 +1,500 @@
+"""
+CMS Import - 批量导入本地 Markdown/HTML 草稿
+基于 create_article/update_article 的流式导入管道
+
+目录遍历 → 解析 front-matter / Markdown 转 HTML（进程池）→ 有界并发写入 → 清单记录
+
+- 目录按需遍历，解析和写入都只保留固定数量的在途任务，内存占用与文件数无关
+- 清单（SQLite）记录 相对路径 → (文件哈希, post_id)，重复运行只处理新增或修改过的文件
+- mtime 和大小都没变的文件不会被读取
+
+用法:
+    python cms_import.py ./drafts --status draft --concurrency 8 --processes 4
+"""
+
+import os
+import re
+import sys
+import html
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+try:
+    import markdown as _markdown
+except ImportError:
+    _markdown = None
+
+import cms_tools
+from cms_index import LocalIndex
+from cms_content import compact_html
+
+# 支持的文件类型
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+HTML_EXTENSIONS = (".html", ".htm")
+
+# 清单文件名（默认放在导入目录下）
+MANIFEST_FILENAME = ".cms_import.sqlite3"
+
+# 最多保留的失败明细条数
+_MAX_FAILURE_DETAILS = 100
+
+
+# ============================================================
+# 解析
+# ============================================================
+
+def iter_draft_files(root: str) -> Iterator[str]:
+    """按需遍历目录下的 Markdown/HTML 文件（跳过隐藏文件和目录）"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.name.lower().endswith(MARKDOWN_EXTENSIONS + HTML_EXTENSIONS):
+                yield entry.path
+        stack.extend(reversed(subdirs))
+
+
+def _parse_scalar(value: str) -> Any:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"'):
+        return value[1:-1]
+    if value.startswith("[") and value.endswith("]"):
+        return [_parse_scalar(v) for v in value[1:-1].split(",") if v.strip()]
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    return value
+
+
+def parse_front_matter(text: str) -> Tuple[Dict[str, Any], str]:
+    """
+    解析 YAML 风格的 front-matter（支持 key: value、key: [a, b] 和 "- item" 列表）
+
+    Returns:
+        (元数据, 正文)
+    """
+    if not text.startswith("---"):
+        return {}, text
+    match = re.match(r"^---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|$)", text, re.S)
+    if not match:
+        return {}, text
+
+    meta: Dict[str, Any] = {}
+    current = None
+    for line in match.group(1).splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        item = re.match(r"^\s*-\s+(.*)$", line)
+        if item and current:
+            if not isinstance(meta.get(current), list):
+                meta[current] = []
+            meta[current].append(_parse_scalar(item.group(1)))
+            continue
+        pair = re.match(r"^([A-Za-z_][\w-]*)\s*:\s*(.*)$", line)
+        if pair:
+            current = pair.group(1).lower()
+            meta[current] = _parse_scalar(pair.group(2)) if pair.group(2).strip() else []
+    return meta, text[match.end():]
+
+
+def _inline_markdown(text: str) -> str:
+    text = html.escape(text, quote=False)
+    text = re.sub(r"`([^`]+)`", r"<code>\1</code>", text)
+    text = re.sub(r"!\[([^\]]*)\]\(([^)\s]+)\)", r'<img src="\2" alt="\1">', text)
+    text = re.sub(r"\[([^\]]+)\]\(([^)\s]+)\)", r'<a href="\2">\1</a>', text)
+    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
+    text = re.sub(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])", r"<em>\1</em>", text)
+    return text
+
+
+def _basic_markdown(text: str) -> str:
+    """未安装 markdown 包时使用的简化转换（标题、段落、列表、引用、代码块、分隔线）"""
+    out = []
+    paragraph: List[str] = []
+    list_tag = None
+    lines = text.splitlines()
+    i = 0
+
+    def flush_paragraph():
+        if paragraph:
+            out.append(f"<p>{_inline_markdown(' '.join(paragraph))}</p>")
+            paragraph.clear()
+
+    def close_list():
+        nonlocal list_tag
+        if list_tag:
+            out.append(f"</{list_tag}>")
+            list_tag = None
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if stripped.startswith("```"):
+            flush_paragraph()
+            close_list()
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code.append(lines[i])
+                i += 1
+            out.append(f"<pre><code>{html.escape(chr(10).join(code), quote=False)}</code></pre>")
+        elif not stripped:
+            flush_paragraph()
+            close_list()
+        elif re.match(r"^#{1,6}\s", stripped):
+            flush_paragraph()
+            close_list()
+            level = len(stripped) - len(stripped.lstrip("#"))
+            out.append(f"<h{level}>{_inline_markdown(stripped[level:].strip())}</h{level}>")
+        elif re.match(r"^(-{3,}|\*{3,})$", stripped):
+            flush_paragraph()
+            close_list()
+            out.append("<hr>")
+        elif re.match(r"^[-*+]\s+", stripped) or re.match(r"^\d+[.)]\s+", stripped):
+            flush_paragraph()
+            tag = "ul" if re.match(r"^[-*+]\s+", stripped) else "ol"
+            if list_tag != tag:
+                close_list()
+                out.append(f"<{tag}>")
+                list_tag = tag
+            item = re.sub(r"^([-*+]|\d+[.)])\s+", "", stripped)
+            out.append(f"<li>{_inline_markdown(item)}</li>")
+        elif stripped.startswith(">"):
+            flush_paragraph()
+            close_list()
+            out.append(f"<blockquote><p>{_inline_markdown(stripped.lstrip('> ').strip())}</p></blockquote>")
+        else:
+            close_list()
+            paragraph.append(stripped)
+        i += 1
+
+    flush_paragraph()
+    close_list()
+    return "\n".join(out)
+
+
+def markdown_to_html(text: str) -> str:
+    """Markdown 转 HTML（优先使用 markdown 包）"""
+    if _markdown is not None:
+        return _markdown.markdown(text, extensions=["fenced_code", "tables"])
+    return _basic_markdown(text)
+
+
+def _as_list(value: Any) -> Optional[List[str]]:
+    if value is None or value == []:
+        return None
+    if isinstance(value, list):
+        return [str(v) for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).split(",") if v.strip()]
+
+
+def parse_draft_file(path: str, compact_content: bool = False) -> Dict[str, Any]:
+    """
+    解析单个草稿文件（在子进程中执行）
+
+    Returns:
+        {"path", "sha256", "title", "content", "excerpt", "categories", "tags", "slug", "status"}
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    text = raw.decode("utf-8-sig")
+    meta, body = parse_front_matter(text)
+
+    title = meta.get("title")
+    if path.lower().endswith(MARKDOWN_EXTENSIONS):
+        if not title:
+            heading = re.match(r"^\s*#\s+(.+)$", body, re.M)
+            if heading:
+                title = heading.group(1).strip()
+                body = body[:heading.start()] + body[heading.end():]
+        content = markdown_to_html(body)
+    else:
+        content = body
+        if not title:
+            heading = re.search(r"<h1[^>]*>(.*?)</h1>", body, re.S | re.I)
+            title = html.unescape(re.sub(r"<[^>]+>", "", heading.group(1))).strip() if heading else None
+
+    if compact_content:
+        content, _ = compact_html(content)
+
+    return {
+        "path": path,
+        "sha256": hashlib.sha256(raw).hexdigest(),
+        "title": title or os.path.splitext(os.path.basename(path))[0],
+        "content": content,
+        "excerpt": meta.get("excerpt") or meta.get("description"),
+        "categories": _as_list(meta.get("categories") or meta.get("category")),
+        "tags": _as_list(meta.get("tags") or meta.get("tag")),
+        "slug": meta.get("slug"),
+        "status": meta.get("status")
+    }
+
+
+# ============================================================
+# 导入
+# ============================================================
+
+def import_directory(
+    root: str,
+    status: str = "draft",
+    concurrency: int = 4,
+    processes: int = None,
+    manifest_path: str = None,
+    compact_content: bool = None,
+    dry_run: bool = False,
+    progress_callback=None
+) -> dict:
+    """
+    批量导入目录下的 Markdown/HTML 草稿
+
+    front-matter 支持 title、excerpt、categories、tags、slug、status 字段；
+    Markdown 没有 title 时使用第一个一级标题，都没有时使用文件名。
+
+    Args:
+        root: 草稿目录
+        status: 默认文章状态（front-matter 中的 status 优先）
+        concurrency: 并发写入数
+        processes: 解析/转换使用的进程数（None 或 1 时在当前进程解析）
+        manifest_path: 清单文件路径（默认 <root>/.cms_import.sqlite3）
+        compact_content: 是否压缩 HTML（默认由 CMS_COMPACT_CONTENT 决定）
+        dry_run: 只统计将要创建/更新的文件，不写入
+        progress_callback: 进度回调 callback(stats)
+
+    Returns:
+        {
+            "success": True,
+            "data": {"scanned", "created", "updated", "unchanged", "failed", "failures",
+                     "term_failures", "elapsed_seconds"}
+        }
+    """
+    if not os.path.isdir(root):
+        return {"success": False, "error": f"目录不存在: {root}"}
+
+    if compact_content is None:
+        compact_content = cms_tools.CMS_COMPACT_CONTENT
+    concurrency = min(max(1, concurrency), 32)
+    manifest = LocalIndex(manifest_path or os.path.join(root, MANIFEST_FILENAME))
+    namespace = f"import:{cms_tools.WP_SITE_ID}"
+    started = time.time()
+
+    stats = {"scanned": 0, "created": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    failures: List[Dict[str, Any]] = []
+    term_failures: List[Dict[str, Any]] = []
+    known_terms = {"categories": set(), "tags": set()}
+
+    def fail(path: str, error: str) -> None:
+        stats["failed"] += 1
+        if len(failures) < _MAX_FAILURE_DETAILS:
+            failures.append({"path": os.path.relpath(path, root), "error": error})
+
+    def ensure_new_terms(doc: dict) -> None:
+        # 词条缓存只在首次遇到新名称时访问站点，避免每篇文章写入时各自创建
+        new = {}
+        for taxonomy in ("categories", "tags"):
+            names = [n for n in doc.get(taxonomy) or [] if n not in known_terms[taxonomy]]
+            if names:
+                known_terms[taxonomy].update(names)
+                new[taxonomy] = names
+        if not new:
+            return
+        try:
+            result = cms_tools.ensure_terms(**new)
+        except Exception as e:
+            result = {"success": False, "data": {
+                taxonomy: {"failed": [{"name": n, "error": str(e)} for n in names]}
+                for taxonomy, names in new.items()
+            }}
+        if result["success"]:
+            return
+        # 创建失败的词条不记为已知，后续文章遇到时重试；文章写入时仍会各自解析
+        for taxonomy, part in result.get("data", {}).items():
+            for item in part.get("failed", []):
+                known_terms[taxonomy].discard(item["name"])
+                if len(term_failures) < _MAX_FAILURE_DETAILS:
+                    term_failures.append({"taxonomy": taxonomy, **item})
+
+    def write(doc: dict, entry: Optional[dict]) -> Tuple[dict, dict]:
+        if entry and entry.get("post_id"):
+            result = cms_tools.update_article(
+                post_id=entry["post_id"],
+                title=doc["title"],
+                content=doc["content"],
+                excerpt=doc["excerpt"],
+                categories=doc["categories"],
+                tags=doc["tags"],
+                slug=doc["slug"],
+                compact_content=False
+            )
+        else:
+            result = cms_tools.create_article(
+                title=doc["title"],
+                content=doc["content"],
+                excerpt=doc["excerpt"],
+                categories=doc["categories"],
+                tags=doc["tags"],
+                status=doc["status"] or status,
+                slug=doc["slug"],
+                idempotency_key=f"import:{doc['key']}:{doc['sha256']}",
+                compact_content=False
+            )
+        return doc, result
+
+    def on_written(doc: dict, entry: Optional[dict], result: dict) -> None:
+        if not result["success"]:
+            fail(doc["path"], result.get("error", "Unknown error"))
+            return
+        stats["updated" if entry and entry.get("post_id") else "created"] += 1
+        manifest.put(namespace, doc["key"], {
+            "sha256": doc["sha256"],
+            "post_id": result["data"]["post_id"],
+            "mtime": doc["mtime"],
+            "size": doc["size"]
+        })
+
+    parse_pool = ProcessPoolExecutor(max_workers=processes) if processes and processes > 1 else None
+    write_pool = ThreadPoolExecutor(max_workers=concurrency)
+    parse_window = (processes or 1) * 4
+    write_window = concurrency * 2
+    parsing: Dict[Any, Tuple[str, str, os.stat_result, Optional[dict]]] = {}
+    writing: Dict[Any, Tuple[str, Optional[dict]]] = {}
+
+    def drain_writes(block_until: int) -> None:
+        while len(writing) > block_until:
+            done, _ = wait(writing, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, entry = writing.pop(future)
+                try:
+                    doc, result = future.result()
+                except Exception as e:
+                    # 单个文件写入异常不影响其它文件
+                    fail(path, f"写入失败: {str(e)}")
+                    continue
+                on_written(doc, entry, result)
+            if progress_callback:
+                progress_callback(dict(stats))
+
+    def handle_parsed(path: str, key: str, st: os.stat_result, entry: Optional[dict], doc: dict) -> None:
+        doc.update({"key": key, "mtime": st.st_mtime, "size": st.st_size})
+        if entry and entry.get("sha256") == doc["sha256"]:
+            # 内容未变（只是 mtime 变了），更新清单中的 mtime 以便下次直接跳过
+            stats["unchanged"] += 1
+            manifest.put(namespace, key, {**entry, "mtime": st.st_mtime, "size": st.st_size})
+            return
+        if dry_run:
+            stats["updated" if entry and entry.get("post_id") else "created"] += 1
+            return
+        ensure_new_terms(doc)
+        drain_writes(write_window - 1)
+        writing[write_pool.submit(write, doc, entry)] = (path, entry)
+
+    def drain_parses(block_until: int) -> None:
+        while len(parsing) > block_until:
+            done, _ = wait(parsing, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, key, st, entry = parsing.pop(future)
+                try:
+                    doc = future.result()
+                except Exception as e:
+                    fail(path, f"解析失败: {str(e)}")
+                    continue
+                handle_parsed(path, key, st, entry, doc)
+
+    try:
+        for path in iter_draft_files(root):
+            stats["scanned"] += 1
+            key = os.path.relpath(path, root).replace(os.sep, "/")
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                fail(path, str(e))
+                continue
+
+            entry = manifest.get(namespace, key)
+            if entry and entry.get("mtime") == st.st_mtime and entry.get("size") == st.st_size:
+                stats["unchanged"] += 1
+                continue
+
+            if parse_pool is None:
+                try:
+                    doc = parse_draft_file(path, compact_content)
+                except Exception as e:
+                    fail(path, f"解析失败: {str(e)}")
+                    continue
+                handle_parsed(path, key, st, entry, doc)
+            else:
+                drain_parses(parse_window - 1)
+                parsing[parse_pool.submit(parse_draft_file, path, compact_content)] = (path, key, st, entry)
+
+        drain_parses(0)
+        drain_writes(0)
+    finally:
+        if parse_pool:
+            parse_pool.shutdown()
+        write_pool.shutdown()
+        manifest.close()
+
+    result = {
+        "success": stats["failed"] == 0 and not term_failures,
+        "data": {
+            **stats,
+            "dry_run": dry_run,
+            "failures": failures,
+            "term_failures": term_failures,
+            "elapsed_seconds": round(time.time() - started, 2)
+        }
+    }
+    errors = []
+    if stats["failed"]:
+        errors.append(f"{stats['failed']} 个文件导入失败")
+    if term_failures:
+        errors.append(f"{len(term_failures)} 个分类/标签创建失败")
+    if errors:
+        result["error"] = "；".join(errors)
+    return result
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量导入 Markdown/HTML 草稿到 WordPress")
+    parser.add_argument("root", help="草稿目录")
+    parser.add_argument("--status", default="draft", choices=["draft", "publish", "private"])
+    parser.add_argument("--concurrency", type=int, default=4, help="并发写入数")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="解析进程数")
+    parser.add_argument("--manifest", help="清单文件路径")
+    parser.add_argument("--compact", action="store_true", help="压缩 HTML")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+    args = parser.parse_args(argv)
+
+    def progress(stats: dict) -> None:
+        print(f"\r已扫描 {stats['scanned']} | 新建 {stats['created']} | 更新 {stats['updated']} "
+              f"| 未变 {stats['unchanged']} | 失败 {stats['failed']}", end="", file=sys.stderr)
+
+    result = import_directory(
+        args.root,
+        status=args.status,
+        concurrency=args.concurrency,
+        processes=args.processes,
+        manifest_path=args.manifest,
+        compact_content=args.compact or None,
+        dry_run=args.dry_run,
+        progress_callback=progress
+    )
+    print(file=sys.stderr)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0 if result["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
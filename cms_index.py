@@ -0,0 +1,123 @@
+"""
+CMS Index - 本地持久化索引
+基于 SQLite 的轻量 key-value 索引，供幂等创建等需要跨进程、跨重试保存状态的功能复用
+
+- 每条记录由 (namespace, key) 唯一确定，value 为 JSON
+- 主键为聚簇索引（WITHOUT ROWID），几十万条记录下单次查找仍是常数级的几次页读取
+- WAL 模式，允许多个进程同时读、单个进程写
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Dict, Any, Iterable
+
+# 配置
+CMS_STATE_DIR = os.getenv("CMS_STATE_DIR", os.path.join(os.path.expanduser("~"), ".cms_tools"))
+CMS_INDEX_PATH = os.getenv("CMS_INDEX_PATH", os.path.join(CMS_STATE_DIR, "index.sqlite3"))
+
+
+def content_hash(*parts: Any) -> str:
+    """计算若干字段的稳定哈希（sha256）"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LocalIndex:
+    """
+    本地 SQLite 索引
+
+    用法:
+        index = LocalIndex("/tmp/index.sqlite3")
+        index.put("posts", "abc", {"post_id": 123})
+        index.get("posts", "abc")  # -> {"post_id": 123}
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or CMS_INDEX_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """按 key 查找，不存在返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_first(self, namespace: str, keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """按顺序查找多个 key，返回第一个命中的记录"""
+        for key in keys:
+            value = self.get(namespace, key)
+            if value is not None:
+                return value
+        return None
+
+    def put(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
+        """写入（覆盖）一条记录"""
+        self.put_many(namespace, [key], value)
+
+    def put_many(self, namespace: str, keys: Iterable[str], value: Dict[str, Any]) -> None:
+        """将同一个 value 写入多个 key（单个事务）"""
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                [(namespace, key, raw, now) for key in keys]
+            )
+            self._conn.commit()
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        """删除记录"""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?",
+                [(namespace, key) for key in keys]
+            )
+            self._conn.commit()
+
+    def count(self, namespace: str) -> int:
+        """统计某个 namespace 下的记录数"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)
+            ).fetchone()
+        return row[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_index() -> LocalIndex:
+    """获取进程内共享的默认索引（首次使用时才创建文件）"""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = LocalIndex(CMS_INDEX_PATH)
+    return _default_index
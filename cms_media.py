@@ -0,0 +1,220 @@
+"""
+CMS Media - 媒体上传辅助
+流式 multipart 请求体与内容哈希，上传本地图片时不把整个文件读入内存
+
+- MultipartStream 是带长度的文件类对象，requests 会按块 read() 发送并带上 Content-Length
+- 不可 seek 的文件对象先边哈希边落到临时文件（小文件留在内存），保证只读一遍源数据
+"""
+
+import os
+import uuid
+import hashlib
+import mimetypes
+import tempfile
+from typing import List, Tuple, Union, BinaryIO
+
+# 允许上传的本地文件根目录；未配置时工具不接受本地文件路径（只接受文件对象）
+CMS_MEDIA_ROOT = os.getenv("CMS_MEDIA_ROOT", "")
+
+# 每次读取的块大小
+CHUNK_SIZE = 1024 * 1024
+# 不可 seek 的文件对象缓存到内存的上限，超过后转存到临时文件
+_SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+MediaSource = Union[str, os.PathLike, BinaryIO]
+
+
+class MediaFile:
+    """
+    待上传的媒体文件（本地路径或二进制文件对象）
+
+    Attributes:
+        name: 文件名
+        mime_type: MIME 类型
+        size: 字节数
+        sha256: 内容哈希
+    """
+
+    def __init__(self, source: MediaSource, name: str = None):
+        self._owned = None
+        if isinstance(source, (str, os.PathLike)):
+            self.path = os.fspath(source)
+            self.name = name or os.path.basename(self.path)
+            self.size = os.path.getsize(self.path)
+            self.sha256 = _hash_path(self.path)
+            self._fileobj = None
+        else:
+            self.path = None
+            self.name = name or os.path.basename(getattr(source, "name", "") or "") or "upload.bin"
+            self._fileobj, self._start, self.size, self.sha256 = _prepare_fileobj(source)
+            if self._fileobj is not source:
+                self._owned = self._fileobj
+        self.mime_type = mimetypes.guess_type(self.name)[0] or "application/octet-stream"
+
+    def open(self) -> BinaryIO:
+        """打开文件用于读取（文件对象会回到起始位置）"""
+        if self.path:
+            return open(self.path, "rb")
+        self._fileobj.seek(self._start)
+        return _NonClosing(self._fileobj)
+
+    def close(self) -> None:
+        if self._owned is not None:
+            self._owned.close()
+            self._owned = None
+
+
+class MultipartStream:
+    """
+    流式 multipart/form-data 请求体
+
+    只持有当前正在读取的文件句柄，len() 返回总长度，供 requests 设置 Content-Length。
+
+    Args:
+        files: [(字段名, MediaFile)]
+        fields: 额外的普通表单字段 [(字段名, 值)]
+    """
+
+    def __init__(self, files: List[Tuple[str, MediaFile]], fields: List[Tuple[str, str]] = None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self._parts = []
+        for field, value in fields or []:
+            self._parts.append(self._field_header(field).encode("utf-8") + str(value).encode("utf-8") + b"\r\n")
+        for field, media in files:
+            header = self._file_header(field, media).encode("utf-8")
+            self._parts.extend([header, media, b"\r\n"])
+        self._parts.append(f"--{self.boundary}--\r\n".encode("utf-8"))
+        self._length = sum(p.size if isinstance(p, MediaFile) else len(p) for p in self._parts)
+        self._iter = self._generate()
+        self._buffer = b""
+        self._pos = 0
+
+    def _field_header(self, field: str) -> str:
+        return f'--{self.boundary}\r\nContent-Disposition: form-data; name="{field}"\r\n\r\n'
+
+    def _file_header(self, field: str, media: MediaFile) -> str:
+        filename = media.name.replace('"', "")
+        return (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f"Content-Type: {media.mime_type}\r\n\r\n"
+        )
+
+    def _generate(self):
+        for part in self._parts:
+            if isinstance(part, MediaFile):
+                with part.open() as f:
+                    while True:
+                        chunk = f.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        yield chunk
+            else:
+                yield part
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        """按需读取，最多缓存一个块"""
+        if size is None or size < 0:
+            data = self._buffer[self._pos:] + b"".join(self._iter)
+            self._buffer, self._pos = b"", 0
+            return data
+
+        pieces = []
+        while size > 0:
+            if self._pos >= len(self._buffer):
+                self._buffer, self._pos = next(self._iter, b""), 0
+                if not self._buffer:
+                    break
+            piece = self._buffer[self._pos:self._pos + size]
+            self._pos += len(piece)
+            size -= len(piece)
+            pieces.append(piece)
+        return b"".join(pieces)
+
+
+class _NonClosing:
+    """包装调用方传入的文件对象，with 退出时不关闭它"""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+
+    def read(self, size: int = -1) -> bytes:
+        return self._f.read(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _hash_path(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _prepare_fileobj(f: BinaryIO) -> Tuple[BinaryIO, int, int, str]:
+    """
+    计算文件对象（从当前位置起）的大小和哈希；不可 seek 时转存到临时文件
+
+    Returns:
+        (可重复读取的文件对象, 起始位置, 字节数, 哈希)
+    """
+    seekable = getattr(f, "seekable", lambda: False)()
+    target = f if seekable else tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+    start = f.tell() if seekable else 0
+
+    h = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        h.update(chunk)
+        size += len(chunk)
+        if target is not f:
+            target.write(chunk)
+    return target, start, size, h.hexdigest()
+
+
+class MediaPathError(ValueError):
+    """本地路径不允许上传（未配置媒体根目录、不在根目录下或不是文件）"""
+
+
+def is_local_path(value) -> bool:
+    """featured_image 等参数是否按本地文件路径处理（而不是 URL 或附件 ID）"""
+    if not isinstance(value, (str, os.PathLike)):
+        return False
+    value = os.fspath(value)
+    return bool(value) and "://" not in value and not value.isdigit()
+
+
+def resolve_media_path(path: Union[str, os.PathLike], root: str = None) -> str:
+    """
+    把模型传入的本地路径解析为媒体根目录（CMS_MEDIA_ROOT）下的真实路径
+
+    相对路径相对于根目录；解析符号链接后仍须位于根目录内。未配置根目录时不接受任何本地路径。
+
+    Raises:
+        MediaPathError: 未配置根目录、路径在根目录外或不是文件
+    """
+    root = CMS_MEDIA_ROOT if root is None else root
+    if not root:
+        raise MediaPathError("未配置 CMS_MEDIA_ROOT，不接受本地文件路径")
+    real_root = os.path.realpath(os.path.expanduser(root))
+    resolved = os.path.realpath(os.path.join(real_root, os.fspath(path)))
+    if os.path.commonpath([real_root, resolved]) != real_root:
+        raise MediaPathError(f"路径不在媒体根目录内: {os.fspath(path)}")
+    if not os.path.isfile(resolved):
+        raise MediaPathError(f"文件不存在: {os.fspath(path)}")
+    return resolved
@@ -0,0 +1,274 @@
+"""
+CMS Metrics - 按接口模板统计请求指标
+进程内注册表，记录每个 WordPress 接口（/sites/{site}/posts/{id} 这样的模板）的：
+
+- 请求数（按状态码）、延迟直方图、请求/响应字节数
+- JSON 解析耗时
+- 重试次数、缓存命中/未命中
+
+通过 snapshot() 获取字典快照，render_prometheus() 输出 Prometheus 文本格式，
+start_metrics_server(port) 在本地端口提供 /metrics 供抓取（同一 host:port 只启动一次，
+重复调用返回已运行的 server；http.server 在启动时才导入，不影响导入耗时）。
+"""
+
+import os
+import re
+import threading
+from typing import List, Dict, Any, Tuple
+
+CMS_METRICS_ENABLED = os.getenv("CMS_METRICS", "1") != "0"
+
+# 延迟直方图的桶（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# JSON 解析耗时的桶（秒）
+DECODE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+_SITE_SEGMENT_RE = re.compile(r"^(/sites/)[^/]+")
+_ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+_SLUG_SEGMENT_RE = re.compile(r"/slug:[^/]+")
+
+
+def endpoint_template(endpoint: str) -> str:
+    """/sites/251193948/posts/42/ -> /sites/{site}/posts/{id}（去掉查询串和末尾的 /）"""
+    endpoint = endpoint.split("?", 1)[0].rstrip("/") or "/"
+    endpoint = _SITE_SEGMENT_RE.sub(r"\1{site}", endpoint)
+    endpoint = _SLUG_SEGMENT_RE.sub("/slug:{slug}", endpoint)
+    return _ID_SEGMENT_RE.sub("/{id}", endpoint)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets, self.counts):
+            running += n
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.count
+        return {"buckets": cumulative, "sum": round(self.sum, 6), "count": self.count}
+
+
+class MetricsRegistry:
+    """进程内指标注册表（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            # (client, method, endpoint, status) -> 次数
+            self._requests: Dict[Tuple[str, str, str, str], int] = {}
+            # (client, method, endpoint) -> 直方图 / 字节数
+            self._latency: Dict[Tuple[str, str, str], _Histogram] = {}
+            self._decode: Dict[Tuple[str, str, str], _Histogram] = {}
+            self._bytes_out: Dict[Tuple[str, str, str], int] = {}
+            self._bytes_in: Dict[Tuple[str, str, str], int] = {}
+            # (client, method, endpoint) -> 重试次数
+            self._retries: Dict[Tuple[str, str, str], int] = {}
+            # (cache, outcome) -> 次数
+            self._cache: Dict[Tuple[str, str], int] = {}
+
+    # ---------- 记录 ----------
+
+    def observe_request(
+        self,
+        method: str,
+        endpoint: str,
+        status: Any,
+        seconds: float,
+        bytes_out: int = 0,
+        bytes_in: int = 0,
+        decode_seconds: float = None,
+        client: str = "cms_tools"
+    ) -> None:
+        """记录一次请求；endpoint 可以是原始路径，会归一化为模板"""
+        if not CMS_METRICS_ENABLED:
+            return
+        key = (client, method.upper(), endpoint_template(endpoint))
+        with self._lock:
+            status_key = key + (str(status),)
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = _Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+            self._bytes_out[key] = self._bytes_out.get(key, 0) + bytes_out
+            self._bytes_in[key] = self._bytes_in.get(key, 0) + bytes_in
+            if decode_seconds is not None:
+                histogram = self._decode.get(key)
+                if histogram is None:
+                    histogram = self._decode[key] = _Histogram(DECODE_BUCKETS)
+                histogram.observe(decode_seconds)
+
+    def record_retry(self, method: str, endpoint: str, client: str = "cms_tools") -> None:
+        if not CMS_METRICS_ENABLED:
+            return
+        key = (client, method.upper(), endpoint_template(endpoint))
+        with self._lock:
+            self._retries[key] = self._retries.get(key, 0) + 1
+
+    def record_cache(self, cache: str, hit: bool, count: int = 1) -> None:
+        """记录缓存命中/未命中（cache 为缓存名称，如 post_status、terms、session）"""
+        if not CMS_METRICS_ENABLED or count <= 0:
+            return
+        key = (cache, "hit" if hit else "miss")
+        with self._lock:
+            self._cache[key] = self._cache.get(key, 0) + count
+
+    # ---------- 读取 ----------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        指标快照
+
+        Returns:
+            {"endpoints": [{"client", "method", "endpoint", "requests", "status", "latency",
+                            "json_decode", "bytes_out", "bytes_in", "retries"}],
+             "caches": {name: {"hit": n, "miss": n}}}
+        """
+        with self._lock:
+            endpoints = []
+            for key in sorted(self._latency):
+                client, method, endpoint = key
+                status = {s: n for (c, m, e, s), n in self._requests.items() if (c, m, e) == key}
+                endpoints.append({
+                    "client": client,
+                    "method": method,
+                    "endpoint": endpoint,
+                    "requests": sum(status.values()),
+                    "status": status,
+                    "latency": self._latency[key].snapshot(),
+                    "json_decode": self._decode[key].snapshot() if key in self._decode else None,
+                    "bytes_out": self._bytes_out.get(key, 0),
+                    "bytes_in": self._bytes_in.get(key, 0),
+                    "retries": self._retries.get(key, 0)
+                })
+            caches: Dict[str, Dict[str, int]] = {}
+            for (cache, outcome), n in sorted(self._cache.items()):
+                caches.setdefault(cache, {"hit": 0, "miss": 0})[outcome] = n
+        return {"endpoints": endpoints, "caches": caches}
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文本格式（exposition format 0.0.4）"""
+        snap = self.snapshot()
+        lines: List[str] = []
+
+        def labels(**kv) -> str:
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in kv.items()) + "}"
+
+        def header(name: str, kind: str, text: str) -> None:
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        header("cms_http_requests_total", "counter", "HTTP requests by endpoint template and status")
+        for e in snap["endpoints"]:
+            for status, n in sorted(e["status"].items()):
+                lines.append(f"cms_http_requests_total"
+                             f"{labels(client=e['client'], method=e['method'], endpoint=e['endpoint'], status=status)} {n}")
+
+        for metric, field, text in (
+            ("cms_http_request_duration_seconds", "latency", "HTTP request latency"),
+            ("cms_http_json_decode_seconds", "json_decode", "Response JSON decode time"),
+        ):
+            header(metric, "histogram", text)
+            for e in snap["endpoints"]:
+                hist = e[field]
+                if not hist:
+                    continue
+                base = dict(client=e["client"], method=e["method"], endpoint=e["endpoint"])
+                for bound, n in hist["buckets"].items():
+                    lines.append(f"{metric}_bucket{labels(**base, le=bound)} {n}")
+                lines.append(f"{metric}_sum{labels(**base)} {hist['sum']}")
+                lines.append(f"{metric}_count{labels(**base)} {hist['count']}")
+
+        for metric, field, text in (
+            ("cms_http_request_bytes_total", "bytes_out", "Request body bytes sent"),
+            ("cms_http_response_bytes_total", "bytes_in", "Response body bytes received"),
+            ("cms_http_retries_total", "retries", "HTTP request retries"),
+        ):
+            header(metric, "counter", text)
+            for e in snap["endpoints"]:
+                lines.append(f"{metric}{labels(client=e['client'], method=e['method'], endpoint=e['endpoint'])} {e[field]}")
+
+        header("cms_cache_requests_total", "counter", "Cache lookups by outcome")
+        for cache, outcomes in snap["caches"].items():
+            for outcome, n in outcomes.items():
+                lines.append(f"cms_cache_requests_total{labels(cache=cache, outcome=outcome)} {n}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# 全局注册表
+METRICS = MetricsRegistry()
+
+
+# ============================================================
+# HTTP 导出
+# ============================================================
+
+# 已启动的 server：(host, port) -> (server, thread)
+_SERVERS: Dict[Tuple[str, int], Tuple[Any, threading.Thread]] = {}
+_SERVERS_LOCK = threading.Lock()
+
+
+def _make_handler(registry: MetricsRegistry):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_metrics_server(
+    port: int = 9464,
+    host: str = "127.0.0.1",
+    registry: MetricsRegistry = None
+):
+    """
+    在后台线程中提供 http://host:port/metrics；返回 ThreadingHTTPServer，调用 server.shutdown() 停止
+
+    同一 host:port 已在运行时直接返回已有的 server（cms_tools 被多次加载时不会因端口占用失败）
+    """
+    from http.server import ThreadingHTTPServer
+
+    key = (host, port)
+    with _SERVERS_LOCK:
+        running = _SERVERS.get(key)
+        if running is not None and running[1].is_alive():
+            return running[0]
+        server = ThreadingHTTPServer((host, port), _make_handler(registry or METRICS))
+        thread = threading.Thread(target=server.serve_forever, name="cms-metrics", daemon=True)
+        thread.start()
+        _SERVERS[key] = (server, thread)
+        return server
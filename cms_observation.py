@@ -0,0 +1,245 @@
+"""
+CMS Observation - 工具结果的紧凑输出
+ReAct 循环会把 execute_cms_tool 的结果整体序列化后放进下一轮 prompt，
+这里把结果压缩到给定的字节/token 预算以内，同时保留文章 ID 和关键指标
+
+压缩步骤（超出预算时才进入下一步）：
+1. 删除 None、空字符串、空列表/字典
+2. 同结构的字典列表改为表格 {"columns": [...], "rows": [[...]]}，嵌套一层的字段展开为 a.b
+3. 逐步截短长文本（摘要、内容等）；URL 和 ID 类字符串不截短（截短后的 URL 是错的）
+4. 表格只保留 ID、标题、状态、日期/周期和数值列
+5. 从表格末尾删除行，并用 _overflow 汇总被删除的行（数量、ID、数值合计）
+"""
+
+import re
+import copy
+import json
+from typing import Optional, List, Dict, Any, Callable
+
+# 默认预算（字节）
+DEFAULT_MAX_BYTES = 4096
+
+# 表格缩减时始终保留的列（没有日期的浏览量明细对模型没有意义）
+KEY_COLUMNS = {"id", "post_id", "ID", "title", "status", "name", "date", "period"}
+
+# 长文本逐步截短到的长度
+_TRUNCATE_STEPS = (200, 120, 60, 30)
+
+_OVERFLOW_KEY = "_overflow"
+
+# 不截短的字符串：URL，以及不含空白的 ASCII 标识（slug、UUID、令牌等）
+_IDENTIFIER_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.\-]*://\S+|[A-Za-z0-9_\-.:/#?=&%+@~]+")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：ASCII 约 4 字符一个 token，其他字符（中文等）约一个字符一个 token"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _prune(value: Any) -> Any:
+    """递归删除 None、空字符串、空列表/字典"""
+    if isinstance(value, dict):
+        pruned = {}
+        for k, v in value.items():
+            v = _prune(v)
+            if v is None or v == "" or v == [] or v == {}:
+                continue
+            pruned[k] = v
+        return pruned
+    if isinstance(value, list):
+        return [_prune(v) for v in value if v is not None]
+    return value
+
+
+def _flatten(item: Dict[str, Any]) -> Dict[str, Any]:
+    """嵌套一层的字典展开为 a.b"""
+    flat = {}
+    for k, v in item.items():
+        if isinstance(v, dict) and v and all(not isinstance(x, (dict, list)) for x in v.values()):
+            for sub_k, sub_v in v.items():
+                flat[f"{k}.{sub_k}"] = sub_v
+        else:
+            flat[k] = v
+    return flat
+
+
+def _is_table(value: Any) -> bool:
+    return isinstance(value, dict) and set(value) >= {"columns", "rows"} and isinstance(value["rows"], list)
+
+
+def _tabulate(value: Any) -> Any:
+    """把字典列表（至少 2 项）转为表格"""
+    if isinstance(value, dict):
+        return {k: _tabulate(v) for k, v in value.items()}
+    if isinstance(value, list):
+        if len(value) >= 2 and all(isinstance(v, dict) for v in value):
+            rows = [_flatten(v) for v in value]
+            columns = []
+            for row in rows:
+                for k in row:
+                    if k not in columns:
+                        columns.append(k)
+            return {"columns": columns, "rows": [[row.get(c) for c in columns] for row in rows]}
+        return [_tabulate(v) for v in value]
+    return value
+
+
+def _walk_tables(value: Any, found: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if _is_table(value):
+        found.append(value)
+    elif isinstance(value, dict):
+        for v in value.values():
+            _walk_tables(v, found)
+    elif isinstance(value, list):
+        for v in value:
+            _walk_tables(v, found)
+    return found
+
+
+def _truncate_strings(value: Any, limit: int) -> Any:
+    if isinstance(value, str):
+        if len(value) <= limit or _IDENTIFIER_RE.fullmatch(value):
+            return value
+        return value[:limit] + "…"
+    if isinstance(value, dict):
+        return {k: _truncate_strings(v, limit) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_truncate_strings(v, limit) for v in value]
+    return value
+
+
+def _key_columns(table: Dict[str, Any]) -> List[int]:
+    """需要保留的列：ID/标题/状态/日期，以及所有数值列"""
+    keep = []
+    for i, col in enumerate(table["columns"]):
+        cells = [row[i] for row in table["rows"] if row[i] is not None]
+        numeric = cells and all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in cells)
+        if col.split(".")[-1] in KEY_COLUMNS or numeric:
+            keep.append(i)
+    return keep
+
+
+def _id_column(table: Dict[str, Any]) -> Optional[int]:
+    for name in ("id", "post_id", "ID"):
+        if name in table["columns"]:
+            return table["columns"].index(name)
+    return None
+
+
+def _drop_rows(table: Dict[str, Any], count: int) -> None:
+    """从表格末尾删除 count 行，并在 _overflow 中汇总"""
+    removed = table["rows"][-count:]
+    del table["rows"][-count:]
+
+    overflow = table.get(_OVERFLOW_KEY) or {"rows_omitted": 0}
+    overflow["rows_omitted"] += len(removed)
+    id_index = _id_column(table)
+    if id_index is not None:
+        overflow["ids"] = [row[id_index] for row in removed] + overflow.get("ids", [])
+    sums = overflow.get("sums", {})
+    for i, col in enumerate(table["columns"]):
+        if i == id_index:
+            continue
+        cells = [row[i] for row in removed if isinstance(row[i], (int, float)) and not isinstance(row[i], bool)]
+        if cells:
+            sums[col] = round(sums.get(col, 0) + sum(cells), 2)
+    if sums:
+        overflow["sums"] = sums
+    table[_OVERFLOW_KEY] = overflow
+
+
+def compact_observation(
+    result: Dict[str, Any],
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_tokens: int = None
+) -> Dict[str, Any]:
+    """
+    把工具结果压缩到预算以内
+
+    Args:
+        result: 工具返回的 {"success", "data", "error"} 字典
+        max_bytes: 序列化后（UTF-8）的最大字节数
+        max_tokens: 最大 token 数（按 estimate_tokens 估计）；指定时优先于 max_bytes
+
+    Returns:
+        压缩后的结果；实际上已无法再缩减时可能仍略超预算
+    """
+    if max_tokens:
+        measure: Callable[[str], int] = estimate_tokens
+        budget = max_tokens
+    else:
+        measure = lambda text: len(text.encode("utf-8"))
+        budget = max_bytes or DEFAULT_MAX_BYTES
+
+    def fits(value: Any) -> bool:
+        return measure(_dumps(value)) <= budget
+
+    compacted = _prune(result)
+    if fits(compacted):
+        return compacted
+    compacted = _tabulate(compacted)
+    if fits(compacted):
+        return compacted
+
+    for limit in _TRUNCATE_STEPS:
+        compacted = _truncate_strings(compacted, limit)
+        if fits(compacted):
+            return compacted
+
+    tables = _walk_tables(compacted, [])
+    for table in tables:
+        keep = _key_columns(table)
+        table["columns"] = [table["columns"][i] for i in keep]
+        table["rows"] = [[row[i] for i in keep] for row in table["rows"]]
+    if fits(compacted):
+        return compacted
+
+    # 从最大的表格开始删行
+    for table in sorted(tables, key=lambda t: len(_dumps(t["rows"])), reverse=True):
+        _fit_rows(table, lambda: fits(compacted))
+        if fits(compacted):
+            return compacted
+        # ID 列表本身也放不下时只保留数量
+        table.get(_OVERFLOW_KEY, {}).pop("ids", None)
+        if fits(compacted):
+            return compacted
+    return compacted
+
+
+def _fit_rows(table: Dict[str, Any], fits: Callable[[], bool]) -> None:
+    """二分查找表格能保留的最多行数，其余行汇总到 _overflow"""
+    rows = table["rows"]
+    overflow = table.get(_OVERFLOW_KEY)
+
+    def keep(n: int) -> None:
+        table["rows"] = list(rows)
+        if overflow is None:
+            table.pop(_OVERFLOW_KEY, None)
+        else:
+            table[_OVERFLOW_KEY] = copy.deepcopy(overflow)
+        if n < len(rows):
+            _drop_rows(table, len(rows) - n)
+
+    lo, hi = 0, len(rows)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        keep(mid)
+        if fits():
+            lo = mid
+        else:
+            hi = mid - 1
+    keep(lo)
+
+
+def format_observation(
+    result: Dict[str, Any],
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_tokens: int = None
+) -> str:
+    """压缩并序列化为放进 prompt 的紧凑 JSON 文本"""
+    return _dumps(compact_observation(result, max_bytes, max_tokens))
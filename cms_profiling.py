@@ -0,0 +1,266 @@
+"""
+CMS Profiling - 按比例抽样的工具调用性能剖析
+在生产流量下按 CMS_PROFILE_RATE 抽取一部分 execute_cms_tool 调用做剖析，按工具汇总后写入：
+
+- <dir>/<tool>.pstats      cProfile 统计（python -m pstats 或 snakeviz 查看）
+- <dir>/<tool>.collapsed   调用栈采样，每行 "a;b;c 次数"（flamegraph.pl / speedscope 可直接读取）
+
+模式（CMS_PROFILE_MODE）：
+- cprofile: cProfile + 栈采样，两种文件都写
+- sample:   只做栈采样（开销更小），只写 .collapsed
+无效的 CMS_PROFILE_MODE 只警告一次并按 cprofile 处理；CMS_PROFILE_RATE 为 0 时不创建剖析器。
+
+同一时刻只剖析一个调用（cProfile 不能同时启用多个），其它被抽中的调用直接跳过；
+只剖析调用所在线程，工具内部线程池中的工作不计入。
+目录总大小超过 CMS_PROFILE_MAX_BYTES 时不再写入新数据。
+"""
+
+import os
+import sys
+import random
+import marshal
+import warnings
+import threading
+import contextlib
+from collections import Counter
+from typing import Optional, Dict, Any
+
+from cms_index import CMS_STATE_DIR
+
+CMS_PROFILE_RATE = float(os.getenv("CMS_PROFILE_RATE", "0"))
+CMS_PROFILE_MODE = os.getenv("CMS_PROFILE_MODE", "cprofile")
+CMS_PROFILE_DIR = os.getenv("CMS_PROFILE_DIR", os.path.join(CMS_STATE_DIR, "profiles"))
+CMS_PROFILE_MAX_BYTES = int(os.getenv("CMS_PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+# 栈采样间隔（秒）
+CMS_PROFILE_INTERVAL = float(os.getenv("CMS_PROFILE_INTERVAL", "0.005"))
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# 每个工具最多保留的不同调用栈数量（超出的计入 "[other]"）
+_MAX_STACKS = 20000
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+def _stack_depth(frame) -> int:
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+class _StackSampler:
+    """后台线程定时读取目标线程的调用栈"""
+
+    def __init__(self, thread_id: int, interval: float, base_depth: int = 0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        # 剖析开始时已有的外层调用栈深度，这些帧不计入
+        self._base_depth = base_depth
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cms-profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            stack = stack[self._base_depth:]
+            if stack:
+                self.stacks[";".join(stack)] += 1
+
+
+class ToolProfiler:
+    """
+    抽样剖析器
+
+    Args:
+        rate: 抽样比例（0 关闭，1 剖析每个调用）
+        directory: 输出目录
+        max_bytes: 输出目录总大小上限
+        mode: cprofile / sample
+        interval: 栈采样间隔（秒）
+    """
+
+    def __init__(
+        self,
+        rate: float = None,
+        directory: str = None,
+        max_bytes: int = None,
+        mode: str = None,
+        interval: float = None
+    ):
+        self.rate = CMS_PROFILE_RATE if rate is None else rate
+        self.directory = os.path.expanduser(directory or CMS_PROFILE_DIR)
+        self.max_bytes = CMS_PROFILE_MAX_BYTES if max_bytes is None else max_bytes
+        self.mode = mode or CMS_PROFILE_MODE
+        if self.mode not in PROFILE_MODES:
+            raise ValueError(f"无效的剖析模式: {self.mode}")
+        self.interval = CMS_PROFILE_INTERVAL if interval is None else interval
+        # 同一时刻只剖析一个调用
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Any] = {}        # tool -> pstats.Stats
+        self._stacks: Dict[str, Counter] = {}   # tool -> Counter
+        self.counters = {"sampled": 0, "skipped_busy": 0, "skipped_disk": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def should_sample(self) -> bool:
+        return self.rate > 0 and (self.rate >= 1 or random.random() < self.rate)
+
+    @contextlib.contextmanager
+    def profile(self, tool_name: str):
+        """剖析一次调用（已有调用在剖析时直接执行，不剖析）"""
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.counters["skipped_busy"] += 1
+            yield
+            return
+        try:
+            profiler = None
+            if self.mode == "cprofile":
+                import cProfile
+                profiler = cProfile.Profile()
+            # 当前帧 -> contextlib.__enter__ -> with 语句所在的函数
+            sampler = _StackSampler(threading.get_ident(), self.interval, _stack_depth(sys._getframe(2)))
+            sampler.start()
+            if profiler:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler:
+                    profiler.disable()
+                sampler.stop()
+        finally:
+            self._active.release()
+        self._record(tool_name, profiler, sampler.stacks)
+
+    # ---------- 汇总与写入 ----------
+
+    def _record(self, tool_name: str, profiler, stacks: Counter) -> None:
+        with self._lock:
+            self.counters["sampled"] += 1
+            if profiler is not None:
+                import pstats
+                if tool_name in self._stats:
+                    self._stats[tool_name].add(profiler)
+                else:
+                    self._stats[tool_name] = pstats.Stats(profiler)
+            total = self._stacks.setdefault(tool_name, Counter())
+            for stack, count in stacks.items():
+                if stack in total or len(total) < _MAX_STACKS:
+                    total[stack] += count
+                else:
+                    total["[other]"] += count
+            self._write(tool_name)
+
+    def _write(self, tool_name: str) -> None:
+        """重写该工具的汇总文件；写入后目录会超出上限时跳过"""
+        files = {}
+        if tool_name in self._stats:
+            files[f"{tool_name}.pstats"] = marshal.dumps(self._stats[tool_name].stats)
+        stacks = self._stacks.get(tool_name)
+        if stacks:
+            files[f"{tool_name}.collapsed"] = "".join(
+                f"{stack} {count}\n" for stack, count in stacks.most_common()
+            ).encode("utf-8")
+
+        os.makedirs(self.directory, exist_ok=True)
+        if self._projected_size(files) > self.max_bytes:
+            self.counters["skipped_disk"] += 1
+            return
+        for name, content in files.items():
+            path = os.path.join(self.directory, name)
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+
+    def _projected_size(self, files: Dict[str, bytes]) -> int:
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name not in files:
+                    total += entry.stat().st_size
+        return total + sum(len(content) for content in files.values())
+
+    def summary(self) -> Dict[str, Any]:
+        """各工具的采样次数与计数器"""
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "mode": self.mode,
+                "rate": self.rate,
+                "tools": {tool: sum(stacks.values()) for tool, stacks in self._stacks.items()},
+                **self.counters
+            }
+
+
+_PROFILER: Optional[ToolProfiler] = None
+
+
+def _env_mode() -> str:
+    """CMS_PROFILE_MODE，无效时警告并回退到 cprofile"""
+    if CMS_PROFILE_MODE in PROFILE_MODES:
+        return CMS_PROFILE_MODE
+    warnings.warn(
+        f"无效的 CMS_PROFILE_MODE: {CMS_PROFILE_MODE!r}（可选 {', '.join(PROFILE_MODES)}），使用 cprofile",
+        RuntimeWarning,
+        stacklevel=3
+    )
+    return "cprofile"
+
+
+_PROFILER_LOCK = threading.Lock()
+
+
+def get_profiler() -> ToolProfiler:
+    """全局剖析器（按环境变量配置）"""
+    global _PROFILER
+    if _PROFILER is None:
+        with _PROFILER_LOCK:
+            if _PROFILER is None:
+                _PROFILER = ToolProfiler(mode=_env_mode())
+    return _PROFILER
+
+
+def set_profiler(profiler: Optional[ToolProfiler]) -> None:
+    """替换全局剖析器（None 时下次使用按环境变量重新创建）"""
+    global _PROFILER
+    _PROFILER = profiler
+
+
+_NOT_SAMPLED = contextlib.nullcontext()
+
+
+def maybe_profile(tool_name: str):
+    """按抽样比例决定是否剖析这次调用"""
+    profiler = _PROFILER
+    if profiler is None:
+        if CMS_PROFILE_RATE <= 0:
+            # 未开启剖析：不创建剖析器
+            return _NOT_SAMPLED
+        profiler = get_profiler()
+    if profiler.should_sample():
+        return profiler.profile(tool_name)
+    return _NOT_SAMPLED
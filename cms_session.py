@@ -0,0 +1,182 @@
+"""
+CMS Session - 单次会话内的只读工具结果缓存
+同一轮对话中模型经常用相同参数重复调用 get_site_stats、list_articles_by_topic 等只读工具，
+会话内在短 TTL 内直接返回上次结果；任何写操作执行后整个会话缓存失效
+
+用法:
+    session = ToolSession()                       # 包装 cms_tools.execute_cms_tool
+    session.execute("get_site_stats", {"days": 7})
+
+    session = ToolSession(registry.execute)       # 包装 GEO Chatbot 的 registry.execute
+"""
+
+import os
+import copy
+import json
+import time
+import threading
+from typing import Optional, List, Dict, Any, Callable, Tuple, Union
+
+from cms_metrics import METRICS
+from cms_tracing import span
+
+CMS_SESSION_TTL = float(os.getenv("CMS_SESSION_TTL", "60"))
+
+
+def _schema_defaults(schema: List[dict]) -> Dict[str, Dict[str, Any]]:
+    defaults = {}
+    for tool in schema:
+        function = tool["function"]
+        properties = function.get("parameters", {}).get("properties", {})
+        defaults[function["name"]] = {
+            name: prop["default"] for name, prop in properties.items() if "default" in prop
+        }
+    return defaults
+
+
+def _is_partial(result: dict) -> bool:
+    data = result.get("data")
+    return isinstance(data, dict) and bool(data.get("partial"))
+
+
+class ToolSession:
+    """
+    会话级只读工具结果缓存
+
+    Args:
+        execute: 工具执行函数 execute(tool_name, arguments, **options)，默认 cms_tools.execute_cms_tool
+        ttl: 缓存有效期（秒）
+        read_only_tools: 可缓存的只读工具（默认 cms_tools.READ_ONLY_TOOLS）；
+                         其它工具一律视为写操作，执行后清空缓存
+        schema: 用于补全参数默认值的 Tool Schema 列表（默认 cms_tools.CMS_TOOLS_SCHEMA）
+    """
+
+    def __init__(
+        self,
+        execute: Callable[..., dict] = None,
+        ttl: float = None,
+        read_only_tools: set = None,
+        schema: List[dict] = None
+    ):
+        self._batch = None
+        if execute is None or read_only_tools is None or schema is None:
+            import cms_tools
+            if execute is None:
+                execute = cms_tools.execute_cms_tool
+                self._batch = cms_tools.execute_cms_tools_batch
+            read_only_tools = cms_tools.READ_ONLY_TOOLS if read_only_tools is None else read_only_tools
+            schema = cms_tools.CMS_TOOLS_SCHEMA if schema is None else schema
+        self._execute = execute
+        self.ttl = CMS_SESSION_TTL if ttl is None else ttl
+        self.read_only_tools = set(read_only_tools)
+        self._defaults = _schema_defaults(schema)
+        self._cache: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    # ---------- 缓存 ----------
+
+    def _key(self, tool_name: str, arguments: dict, options: dict) -> str:
+        """(工具, 归一化参数)：补全 schema 默认值，去掉 None；时间预算不影响结果，不计入"""
+        args = dict(self._defaults.get(tool_name, {}))
+        args.update({k: v for k, v in (arguments or {}).items() if v is not None})
+        options = {k: v for k, v in options.items() if k != "deadline"}
+        return json.dumps([tool_name, args, options], sort_keys=True, ensure_ascii=False, default=str)
+
+    def _get(self, key: str) -> Optional[dict]:
+        with span("cache.lookup", cache="session") as trace, self._lock:
+            entry = self._cache.get(key)
+            hit = bool(entry) and time.monotonic() - entry[0] < self.ttl
+            if hit:
+                self.stats["hits"] += 1
+            else:
+                self._cache.pop(key, None)
+                self.stats["misses"] += 1
+            trace.set_attribute("outcome", "hit" if hit else "miss")
+        METRICS.record_cache("session", hit)
+        return copy.deepcopy(entry[1]) if hit else None
+
+    def _put(self, key: str, result: dict) -> None:
+        # 因时间预算跳过了部分步骤的结果不缓存
+        if isinstance(result, dict) and result.get("success") and not _is_partial(result):
+            with self._lock:
+                self._cache[key] = (time.monotonic(), copy.deepcopy(result))
+
+    def invalidate(self) -> None:
+        """清空会话缓存"""
+        with self._lock:
+            self._cache.clear()
+            self.stats["invalidations"] += 1
+
+    def is_read_only(self, tool_name: str) -> bool:
+        return tool_name in self.read_only_tools
+
+    # ---------- 执行 ----------
+
+    def execute(self, tool_name: str, arguments: dict = None, **options) -> dict:
+        """执行工具；只读工具命中缓存时不发请求，写操作执行后清空缓存"""
+        arguments = arguments or {}
+        if not self.is_read_only(tool_name):
+            try:
+                return self._execute(tool_name, arguments, **options)
+            finally:
+                self.invalidate()
+
+        key = self._key(tool_name, arguments, options)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        result = self._execute(tool_name, arguments, **options)
+        self._put(key, result)
+        return result
+
+    def execute_batch(self, calls: List[Union[Tuple[str, dict], dict]], **options) -> List[Dict[str, Any]]:
+        """
+        批量执行（见 cms_tools.execute_cms_tools_batch）
+
+        第一个写操作之前的只读调用可以命中缓存；之后的调用要看到写入结果，不使用缓存。
+        只有包装 execute_cms_tool 时才并发执行，包装其它执行函数时按顺序执行。
+        """
+        normalized = []
+        for call in calls:
+            if isinstance(call, dict):
+                normalized.append((call.get("name"), call.get("arguments") or {}))
+            else:
+                normalized.append((call[0], call[1] or {}))
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(normalized)
+        pending = []
+        last_write = -1
+        for i, (tool_name, arguments) in enumerate(normalized):
+            if not self.is_read_only(tool_name):
+                last_write = i
+            elif last_write < 0:
+                cached = self._get(self._key(tool_name, arguments, options))
+                if cached is not None:
+                    results[i] = {"tool_name": tool_name, "result": cached, "elapsed_ms": 0.0}
+                    continue
+            pending.append(i)
+
+        if pending:
+            if self._batch:
+                executed = self._batch([normalized[i] for i in pending], **options)
+            else:
+                executed = []
+                for i in pending:
+                    started = time.perf_counter()
+                    result = self._execute(normalized[i][0], normalized[i][1], **options)
+                    executed.append({
+                        "tool_name": normalized[i][0],
+                        "result": result,
+                        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+                    })
+            for i, item in zip(pending, executed):
+                results[i] = item
+
+        if last_write >= 0:
+            self.invalidate()
+        for i in pending:
+            tool_name, arguments = normalized[i]
+            if self.is_read_only(tool_name) and i > last_write:
+                self._put(self._key(tool_name, arguments, options), results[i]["result"])
+        return results
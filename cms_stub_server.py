@@ -0,0 +1,794 @@
+"""
+CMS Stub Server - 本地 WordPress.com REST API 替身
+实现 cms_tools / wordpress_tool 用到的接口，数据按随机种子生成，可在无网络、无 Token 的环境中
+运行 test_cms_tools.py 和基准测试：
+
+- /sites/{site}                               站点信息
+- /sites/{site}/posts/                        文章列表（number/page/page_handle、status、category、tag、search、after、fields）
+- /sites/{site}/posts/new                     创建文章
+- /sites/{site}/posts/{id}                    获取 / 更新文章（GET / POST）
+- /sites/{site}/posts/{id}/delete             删除文章（先进回收站，再次删除时彻底删除）
+- /sites/{site}/stats/summary                 今日汇总
+- /sites/{site}/stats/top-posts               热门文章（period=day、date、num、max，summarize=1 时附带 summary）
+- /sites/{site}/stats/post/{id}               单篇文章浏览量
+- /sites/{site}/stats/visits                  浏览量走势（unit=day/week/month、quantity）
+- /sites/{site}/categories、/tags 及 /new      分类 / 标签
+- /sites/{site}/media/new                     上传媒体（multipart）
+- /batch                                      批量 GET（urls[]）
+
+可注入延迟（latency_ms + jitter_ms）、500 错误（error_rate）和 429 限流（throttle_rate）。
+/__stub__/stats 返回按接口模板统计的请求数，POST /__stub__/faults 在运行中修改注入参数。
+
+用法:
+    python cms_stub_server.py --posts 1000 --port 8089 --latency-ms 50
+    export WP_API_BASE=http://127.0.0.1:8089/rest/v1.1
+
+    with StubServer(posts=1000) as server:
+        cms_tools.WP_API_BASE = server.api_base
+"""
+
+import os
+import re
+import json
+import gzip
+import time
+import sys
+import random
+import argparse
+import threading
+from bisect import bisect_right
+from itertools import accumulate
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from typing import Optional, List, Dict, Any, Tuple
+
+from cms_metrics import endpoint_template
+
+API_PREFIX = "/rest/v1.1"
+DEFAULT_SITE_ID = os.getenv("WP_SITE_ID", "251193948")
+
+CATEGORY_NAMES = [
+    "技术", "产品", "运营", "市场", "教程", "案例", "行业观察", "AI", "SEO", "GEO",
+    "Python", "WordPress", "数据分析", "内容策略", "增长", "品牌", "设计", "开发", "云计算", "安全",
+]
+_TAG_WORDS = [
+    "API", "LLM", "Agent", "RAG", "搜索", "排名", "性能", "缓存", "自动化", "指标",
+    "趋势", "最佳实践", "入门", "进阶", "工具", "插件", "主题", "架构", "部署", "监控",
+]
+# 生成文章的状态分布
+_STATUS_WEIGHTS = (("publish", 80), ("draft", 12), ("private", 5), ("future", 3))
+_ORDER_FIELDS = {"date", "modified", "title", "ID"}
+
+
+class StubError(Exception):
+    """按 WordPress.com 的错误格式返回 {"error", "message"}"""
+
+    def __init__(self, status: int, error: str, message: str = ""):
+        super().__init__(message or error)
+        self.status = status
+        self.error = error
+        self.message = message or error
+
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+def _parse_time(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _slugify(text: str) -> str:
+    return re.sub(r"[^\w]+", "-", text.lower()).strip("-") or "post"
+
+
+class StubSite:
+    """
+    一个站点的内存数据
+
+    Args:
+        site_id: 站点 ID
+        posts: 生成的文章数
+        seed: 随机种子（相同参数生成相同数据）
+        daily_active: 每天有浏览量的文章数
+    """
+
+    def __init__(self, site_id: str = DEFAULT_SITE_ID, posts: int = 200, seed: int = 0, daily_active: int = 500):
+        self.site_id = str(site_id)
+        self.seed = seed
+        self.daily_active = daily_active
+        self._lock = threading.RLock()
+        self._posts: Dict[int, Dict[str, Any]] = {}
+        self._terms: Dict[str, Dict[str, Dict[str, Any]]] = {"categories": {}, "tags": {}}
+        self._next_id = 1
+        self._next_term_id = 1
+        self._next_media_id = 100000
+        self._sorted: Dict[str, Any] = {}
+        self._cum_weights: List[float] = []
+        self._seed_posts(posts)
+
+    @property
+    def url(self) -> str:
+        return f"https://stub-{self.site_id}.wordpress.com"
+
+    # ---------- 生成数据 ----------
+
+    def _term(self, taxonomy: str, name: str) -> Dict[str, Any]:
+        terms = self._terms[taxonomy]
+        key = name.strip().lower()
+        if key not in terms:
+            terms[key] = {"ID": self._next_term_id, "name": name.strip(), "slug": _slugify(name), "post_count": 0}
+            self._next_term_id += 1
+        return terms[key]
+
+    def _seed_posts(self, count: int) -> None:
+        rng = random.Random(self.seed)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        for name in CATEGORY_NAMES:
+            self._term("categories", name)
+        tag_names = [f"{a}{b}" for a in _TAG_WORDS for b in ("", " 指南")]
+        for name in tag_names:
+            self._term("tags", name)
+
+        statuses = [s for s, _ in _STATUS_WEIGHTS]
+        weights = [w for _, w in _STATUS_WEIGHTS]
+        for i in range(count):
+            status = rng.choices(statuses, weights)[0]
+            if status == "future":
+                created = now + timedelta(days=rng.randint(1, 30))
+            else:
+                created = now - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86399))
+            categories = rng.sample(CATEGORY_NAMES, rng.randint(1, 2))
+            tags = rng.sample(tag_names, rng.randint(0, 4))
+            topic = categories[0]
+            self._insert({
+                "title": f"{topic}实践 #{i + 1}: {rng.choice(_TAG_WORDS)} 与 {rng.choice(_TAG_WORDS)}",
+                "content": f"<h2>{topic}</h2><p>示例文章 {i + 1} 的正文。</p>",
+                "excerpt": f"关于{topic}的示例文章 {i + 1}",
+                "status": status,
+                "date": created,
+                "modified": created + timedelta(hours=rng.randint(0, 48)),
+                "categories": categories,
+                "tags": tags,
+                "like_count": rng.randint(0, 50),
+                "comment_count": rng.randint(0, 20),
+            })
+
+    def _insert(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        post_id = self._next_id
+        self._next_id += 1
+        title = fields.get("title", "")
+        content = fields.get("content", "")
+        slug = fields.get("slug") or f"{_slugify(title)[:60]}-{post_id}"
+        post = {
+            "ID": post_id,
+            "site_ID": int(self.site_id) if self.site_id.isdigit() else self.site_id,
+            "author": {"ID": 1, "name": "stub-author"},
+            "date": _iso(fields["date"]),
+            "modified": _iso(fields.get("modified") or fields["date"]),
+            "title": title,
+            "URL": f"{self.url}/{slug}/",
+            "short_URL": f"https://wp.me/stub-{post_id}",
+            "content": content,
+            "excerpt": fields.get("excerpt", ""),
+            "slug": slug,
+            "status": fields.get("status", "draft"),
+            "like_count": fields.get("like_count", 0),
+            "comment_count": fields.get("comment_count", 0),
+            "word_count": len(re.sub(r"<[^>]+>", "", content).split()),
+            "featured_image": fields.get("featured_image", ""),
+            "categories": {},
+            "tags": {},
+        }
+        self._set_terms(post, "categories", fields.get("categories") or ["Uncategorized"])
+        self._set_terms(post, "tags", fields.get("tags") or [])
+        self._posts[post_id] = post
+        self._sorted.clear()
+        return post
+
+    def _set_terms(self, post: Dict[str, Any], taxonomy: str, names: List[str]) -> None:
+        terms = {}
+        for name in names:
+            if name and name.strip():
+                term = self._term(taxonomy, name)
+                terms[term["name"]] = {"ID": term["ID"], "name": term["name"], "slug": term["slug"]}
+        post[taxonomy] = terms
+
+    # ---------- 浏览量 ----------
+
+    def _published_by_date(self) -> Tuple[List[str], List[int]]:
+        """已发布文章按发布日期升序：(日期列表, ID 列表)，写入后重建"""
+        if "_published" not in self._sorted:
+            published = sorted((p["date"][:10], pid) for pid, p in self._posts.items() if p["status"] == "publish")
+            self._sorted["_published"] = ([d for d, _ in published], [pid for _, pid in published])
+        return self._sorted["_published"]
+
+    @lru_cache(maxsize=1024)
+    def _day_views(self, day: str) -> Tuple[Tuple[int, int], ...]:
+        """某天有浏览量的文章：((post_id, views), ...)，按浏览量降序；同一天结果固定"""
+        with self._lock:
+            dates, ids = self._published_by_date()
+            count = bisect_right(dates, day)
+            if not count:
+                return ()
+            published = ids[:count]
+            if len(self._cum_weights) < count:
+                # 发布越早的文章越可能上榜（模拟长尾）
+                self._cum_weights = list(accumulate(1 / (i + 1) ** 0.5 for i in range(max(count, 2 * len(self._cum_weights)))))
+            cum_weights = self._cum_weights[:count]
+        rng = random.Random(f"{self.seed}:{day}")
+        chosen = set(rng.choices(published, cum_weights=cum_weights, k=min(count, self.daily_active)))
+        views = [(pid, max(1, int(2000 / (rank + 1) ** 0.8 * rng.uniform(0.5, 1.5)))) for rank, pid in enumerate(sorted(chosen))]
+        return tuple(sorted(views, key=lambda item: -item[1]))
+
+    def _postview(self, post_id: int, views: int) -> Dict[str, Any]:
+        post = self._posts.get(post_id)
+        return {
+            "id": post_id,
+            "href": post["URL"] if post else "",
+            "title": post["title"] if post else "",
+            "type": "post",
+            "views": views,
+        }
+
+    def _window(self, params: Dict[str, str], default_num: int = 1) -> List[str]:
+        end = date.fromisoformat(params["date"]) if params.get("date") else date.today()
+        num = max(1, min(int(params.get("num") or default_num), 365))
+        return [(end - timedelta(days=i)).isoformat() for i in range(num)]
+
+    # ---------- 路由 ----------
+
+    def handle(self, method: str, path: str, params: Dict[str, Any], body: Any) -> Any:
+        """处理一个 API 请求（path 不含 API 前缀），返回响应数据或抛出 StubError"""
+        parts = [p for p in path.split("/") if p]
+        if parts == ["batch"]:
+            return self._batch(params)
+        if len(parts) < 2 or parts[0] != "sites":
+            raise StubError(404, "unknown_endpoint", f"Unknown endpoint: {path}")
+        if parts[1] != self.site_id:
+            raise StubError(404, "unknown_blog", "Unknown blog")
+        rest = parts[2:]
+
+        with self._lock:
+            if not rest and method == "GET":
+                return self._site()
+            if rest[:1] == ["posts"]:
+                return self._posts_route(method, rest[1:], params, body)
+            if rest[:1] == ["stats"]:
+                return self._stats_route(rest[1:], params)
+            if rest[:1] in (["categories"], ["tags"]):
+                return self._terms_route(method, rest[0], rest[1:], params, body)
+            if rest == ["media", "new"] and method == "POST":
+                return self._upload(body)
+        raise StubError(404, "unknown_endpoint", f"Unknown endpoint: {method} {path}")
+
+    def _site(self) -> Dict[str, Any]:
+        return {
+            "ID": int(self.site_id) if self.site_id.isdigit() else self.site_id,
+            "name": "Stub Site",
+            "description": "本地 WordPress.com API 替身",
+            "URL": self.url,
+            "post_count": sum(1 for p in self._posts.values() if p["status"] == "publish"),
+            "options": {"gmt_offset": 0, "timezone": "UTC"},
+        }
+
+    # ---------- 文章 ----------
+
+    def _posts_route(self, method: str, rest: List[str], params: Dict[str, Any], body: Any) -> Any:
+        if not rest:
+            if method != "GET":
+                raise StubError(405, "method_not_allowed")
+            return self._list(params)
+        if rest == ["new"] and method == "POST":
+            return self._create(body or {})
+        try:
+            post_id = int(rest[0])
+        except ValueError:
+            raise StubError(404, "unknown_post", "Unknown post")
+        post = self._posts.get(post_id)
+        if post is None:
+            raise StubError(404, "unknown_post", "Unknown post")
+        if len(rest) == 1 and method == "GET":
+            return self._project(post, params.get("fields"))
+        if len(rest) == 1 and method == "POST":
+            return self._update(post, body or {})
+        if rest[1:] == ["delete"] and method == "POST":
+            return self._delete(post)
+        raise StubError(404, "unknown_endpoint")
+
+    def _sorted_ids(self, order_by: str) -> List[int]:
+        """按排序字段升序排列的文章 ID（写入后重建）"""
+        if order_by not in self._sorted:
+            self._sorted[order_by] = sorted(self._posts, key=lambda pid: self._sort_key(self._posts[pid], order_by))
+        return self._sorted[order_by]
+
+    @staticmethod
+    def _sort_key(post: Dict[str, Any], order_by: str) -> Tuple:
+        return (post.get(order_by, post["ID"]) if order_by != "ID" else post["ID"], post["ID"])
+
+    def _list(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        number = max(1, min(int(params.get("number") or 20), 100))
+        order_by = params.get("order_by") or "date"
+        order_by = order_by if order_by in _ORDER_FIELDS else "date"
+        descending = (params.get("order") or "DESC").upper() != "ASC"
+
+        statuses = set((params.get("status") or "publish").split(","))
+        if "any" in statuses:
+            statuses = {"publish", "draft", "private", "future", "pending"}
+        category = (params.get("category") or "").lower()
+        tag = (params.get("tag") or "").lower()
+        search = (params.get("search") or "").lower()
+        after = _parse_time(params["after"]) if params.get("after") else None
+        before = _parse_time(params["before"]) if params.get("before") else None
+
+        def matches(post: Dict[str, Any]) -> bool:
+            if post["status"] not in statuses:
+                return False
+            if category and not any(category in (n.lower(), t["slug"]) for n, t in post["categories"].items()):
+                return False
+            if tag and not any(tag in (n.lower(), t["slug"]) for n, t in post["tags"].items()):
+                return False
+            if search and search not in post["title"].lower() and search not in post["content"].lower():
+                return False
+            if after or before:
+                created = _parse_time(post["date"])
+                if (after and created <= after) or (before and created >= before):
+                    return False
+            return True
+
+        ids = self._sorted_ids(order_by)
+        ordered = reversed(ids) if descending else iter(ids)
+        matched = [self._posts[pid] for pid in ordered if matches(self._posts[pid])]
+
+        if params.get("page_handle"):
+            # 游标翻页：从上一页最后一篇文章的排序键之后继续（结果集变化时不漏、不重复）
+            last = tuple(json.loads(params["page_handle"]))
+            start = next(
+                (i for i, p in enumerate(matched)
+                 if (self._sort_key(p, order_by) < last if descending else self._sort_key(p, order_by) > last)),
+                len(matched)
+            )
+        else:
+            start = (max(1, int(params.get("page") or 1)) - 1) * number
+        page = matched[start:start + number]
+
+        data = {
+            "found": len(matched),
+            "posts": [self._project(p, params.get("fields")) for p in page],
+            "meta": {},
+        }
+        if start + number < len(matched) and page:
+            data["meta"]["next_page"] = json.dumps(list(self._sort_key(page[-1], order_by)), ensure_ascii=False)
+        return data
+
+    def _project(self, post: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+        if not fields:
+            return dict(post)
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        return {f: post[f] for f in wanted if f in post}
+
+    def _apply(self, post: Dict[str, Any], body: Dict[str, Any]) -> None:
+        for field in ("title", "content", "excerpt", "slug", "featured_image"):
+            if body.get(field) is not None:
+                post[field] = body[field]
+        if body.get("content") is not None:
+            post["word_count"] = len(re.sub(r"<[^>]+>", "", post["content"]).split())
+        if body.get("date"):
+            created = _parse_time(body["date"])
+            if created is None:
+                raise StubError(400, "invalid_input", f"Invalid date: {body['date']}")
+            post["date"] = _iso(created)
+        if body.get("status"):
+            status = body["status"]
+            if status not in {"publish", "draft", "private", "pending", "future", "trash"}:
+                raise StubError(400, "invalid_input", f"Invalid status: {status}")
+            if status == "publish" and _parse_time(post["date"]) > datetime.now(timezone.utc):
+                status = "future"
+            post["status"] = status
+        for taxonomy in ("categories", "tags"):
+            # <taxonomy>_by_id 按词条 ID 指定（未知 ID 忽略），可与按名称的 <taxonomy> 同时使用
+            by_id = body.get(f"{taxonomy}_by_id")
+            if body.get(taxonomy) is None and by_id is None:
+                continue
+            names = body.get(taxonomy) or []
+            names = names.split(",") if isinstance(names, str) else names
+            if by_id is not None:
+                ids = {int(i) for i in (by_id.split(",") if isinstance(by_id, str) else by_id) if str(i).strip()}
+                names = [t["name"] for t in self._terms[taxonomy].values() if t["ID"] in ids] + list(names)
+            self._set_terms(post, taxonomy, [str(n) for n in names])
+        post["modified"] = _iso(datetime.now(timezone.utc))
+        self._sorted.clear()
+
+    def _create(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        if not body.get("title") and not body.get("content"):
+            raise StubError(400, "invalid_input", "Title or content is required")
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        post = self._insert({"title": body.get("title", ""), "date": now, "status": "draft"})
+        self._apply(post, body)
+        if not body.get("slug"):
+            post["slug"] = f"{_slugify(post['title'])[:60]}-{post['ID']}"
+        post["URL"] = f"{self.url}/{post['slug']}/"
+        return dict(post)
+
+    def _update(self, post: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+        self._apply(post, body)
+        return dict(post)
+
+    def _delete(self, post: Dict[str, Any]) -> Dict[str, Any]:
+        if post["status"] == "trash":
+            del self._posts[post["ID"]]
+        else:
+            post["status"] = "trash"
+        self._sorted.clear()
+        return dict(post)
+
+    # ---------- 统计 ----------
+
+    def _stats_route(self, rest: List[str], params: Dict[str, Any]) -> Any:
+        if rest == ["summary"]:
+            today = date.today().isoformat()
+            views = sum(v for _, v in self._day_views(today))
+            return {
+                "date": today,
+                "period": "day",
+                "views": views,
+                "visitors": views * 2 // 3,
+                "likes": views // 50,
+                "reblogs": 0,
+                "comments": views // 100,
+                "followers": 1200,
+            }
+        if rest == ["top-posts"]:
+            return self._top_posts(params)
+        if rest[:1] == ["post"] and len(rest) == 2:
+            return self._post_stats(int(rest[1]), params)
+        if rest == ["visits"]:
+            return self._visits(params)
+        raise StubError(404, "unknown_endpoint")
+
+    def _top_posts(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        limit = int(params.get("max") or 10)
+        days = {}
+        totals: Dict[int, int] = {}
+        for day in self._window(params):
+            views = self._day_views(day)
+            ranked = views if limit <= 0 else views[:limit]
+            days[day] = {
+                "postviews": [self._postview(pid, v) for pid, v in ranked],
+                "total_views": sum(v for _, v in views),
+            }
+            for pid, v in views:
+                totals[pid] = totals.get(pid, 0) + v
+        data = {"date": max(days), "period": "day", "days": days}
+        if params.get("summarize"):
+            ranked = sorted(totals.items(), key=lambda item: -item[1])
+            ranked = ranked if limit <= 0 else ranked[:limit]
+            data["summary"] = {
+                "postviews": [self._postview(pid, v) for pid, v in ranked],
+                "total_views": sum(totals.values()),
+            }
+        return data
+
+    def _post_stats(self, post_id: int, params: Dict[str, Any]) -> Dict[str, Any]:
+        if post_id not in self._posts:
+            raise StubError(404, "unknown_post", "Unknown post")
+        series = {}
+        for day in sorted(self._window(params, default_num=30)):
+            series[day] = dict(self._day_views(day)).get(post_id, 0)
+        # 与 cms_tools 的解析一致：data 为 {日期: 浏览量}
+        return {"date": max(series), "views": sum(series.values()), "data": series}
+
+    def _visits(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        unit = params.get("unit") or "day"
+        span_days = {"day": 1, "week": 7, "month": 30}.get(unit)
+        if span_days is None:
+            raise StubError(400, "invalid_input", f"Invalid unit: {unit}")
+        quantity = max(1, min(int(params.get("quantity") or 30), 365))
+        today = date.today()
+        rows = []
+        for i in range(quantity):
+            end = today - timedelta(days=i * span_days)
+            days = [(end - timedelta(days=d)).isoformat() for d in range(span_days)]
+            views = sum(sum(v for _, v in self._day_views(day)) for day in days)
+            rows.append([days[-1], views, views * 2 // 3])
+        # 最新的周期在前（cms_tools 反转后按时间升序使用）
+        return {"date": today.isoformat(), "unit": unit, "fields": ["period", "views", "visitors"], "data": rows}
+
+    # ---------- 分类 / 标签 ----------
+
+    def _terms_route(self, method: str, taxonomy: str, rest: List[str], params: Dict[str, Any], body: Any) -> Any:
+        if rest == ["new"] and method == "POST":
+            name = (body or {}).get("name", "").strip()
+            if not name:
+                raise StubError(400, "invalid_input", "Name is required")
+            if name.lower() in self._terms[taxonomy]:
+                raise StubError(400, "duplicate", "A term with the name provided already exists.")
+            return dict(self._term(taxonomy, name))
+        if rest or method != "GET":
+            raise StubError(404, "unknown_endpoint")
+        terms = list(self._terms[taxonomy].values())
+        search = (params.get("search") or "").lower()
+        if search:
+            terms = [t for t in terms if search in t["name"].lower()]
+        number = max(1, min(int(params.get("number") or 100), 1000))
+        page = max(1, int(params.get("page") or 1))
+        chunk = terms[(page - 1) * number:page * number]
+        return {"found": len(terms), taxonomy: [self._project(t, params.get("fields")) for t in chunk]}
+
+    # ---------- 媒体 ----------
+
+    def _upload(self, body: Any) -> Dict[str, Any]:
+        if not isinstance(body, (bytes, bytearray)):
+            raise StubError(400, "invalid_input", "Multipart body required")
+        media = []
+        for match in re.finditer(rb'filename="([^"]*)"\r\nContent-Type: ([^\r\n]+)\r\n\r\n', body):
+            name, mime = match.group(1).decode("utf-8", "replace"), match.group(2).decode()
+            media_id = self._next_media_id
+            self._next_media_id += 1
+            media.append({
+                "ID": media_id,
+                "URL": f"{self.url}/wp-content/uploads/{media_id}-{name}",
+                "file": name,
+                "mime_type": mime,
+            })
+        if not media:
+            return {"media": [], "errors": [{"message": "No files"}]}
+        return {"media": media}
+
+    # ---------- 批量 ----------
+
+    def _batch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        urls = params.get("urls[]") or []
+        urls = [urls] if isinstance(urls, str) else urls
+        responses = {}
+        for url in urls:
+            parts = urlsplit(url)
+            sub_params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+            try:
+                responses[url] = self.handle("GET", parts.path, sub_params, None)
+            except StubError as e:
+                responses[url] = {"error": e.error, "message": e.message}
+        return responses
+
+
+# ============================================================
+# HTTP 服务
+# ============================================================
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_StubHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _send(self, status: int, data: Any, headers: Dict[str, str] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        content_type = self.headers.get("Content-Type") or ""
+        if content_type.startswith("application/json"):
+            return json.loads(raw or b"{}")
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            return {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+        return raw
+
+    def _dispatch(self, method: str) -> None:
+        stub = self.server.stub
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        params = {k: (v if k.endswith("[]") else v[0]) for k, v in query.items()}
+        try:
+            body = self._read_body() if method == "POST" else None
+        except (ValueError, OSError):
+            self._send(400, {"error": "invalid_body", "message": "Request body could not be decoded"})
+            return
+
+        if parts.path.startswith("/__stub__/"):
+            self._admin(method, parts.path[len("/__stub__/"):], body)
+            return
+        if not parts.path.startswith(API_PREFIX):
+            self._send(404, {"error": "unknown_endpoint", "message": parts.path})
+            return
+        path = parts.path[len(API_PREFIX):]
+        stub.count(method, path)
+
+        faults = stub.faults
+        delay = faults["latency_ms"] + random.uniform(0, faults["jitter_ms"])
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if faults["throttle_rate"] and random.random() < faults["throttle_rate"]:
+            self._send(429, {"error": "rate_limit_exceeded", "message": "Too many requests"}, {"Retry-After": "1"})
+            return
+        if faults["error_rate"] and random.random() < faults["error_rate"]:
+            self._send(500, {"error": "internal_error", "message": "Injected failure"})
+            return
+        if stub.token and self.headers.get("Authorization") != f"Bearer {stub.token}":
+            self._send(403, {"error": "authorization_required", "message": "An active access token must be used"})
+            return
+
+        try:
+            data = stub.site.handle(method, path, params, body)
+        except StubError as e:
+            self._send(e.status, {"error": e.error, "message": e.message})
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": "invalid_input", "message": str(e)})
+            return
+        self._send(200, data)
+
+    def _admin(self, method: str, command: str, body: Any) -> None:
+        stub = self.server.stub
+        if command == "stats" and method == "GET":
+            self._send(200, stub.stats())
+        elif command == "faults" and method == "POST":
+            stub.set_faults(**(body or {}))
+            self._send(200, stub.faults)
+        elif command == "reset" and method == "POST":
+            stub.reset_stats()
+            self._send(200, {"reset": True})
+        else:
+            self._send(404, {"error": "unknown_endpoint"})
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 压测时同时到达的连接较多
+    request_queue_size = 256
+    stub: "StubServer"
+
+    def handle_error(self, request, client_address) -> None:
+        # 客户端超时（如时间预算用完）后断开连接属于正常情况，不打印堆栈
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubServer:
+    """
+    在后台线程运行的 API 替身
+
+    Args:
+        posts / seed / daily_active / site_id: 见 StubSite
+        host / port: 监听地址（port=0 时自动分配）
+        latency_ms / jitter_ms: 每个请求的固定延迟与随机抖动（毫秒）
+        error_rate: 返回 500 的比例
+        throttle_rate: 返回 429 的比例
+        token: 要求的 Bearer Token（None 时不校验）
+    """
+
+    def __init__(
+        self,
+        posts: int = 200,
+        seed: int = 0,
+        daily_active: int = 500,
+        site_id: str = DEFAULT_SITE_ID,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        throttle_rate: float = 0,
+        token: str = None
+    ):
+        self.site = StubSite(site_id=site_id, posts=posts, seed=seed, daily_active=daily_active)
+        self.token = token
+        self.faults = {"latency_ms": 0.0, "jitter_ms": 0.0, "error_rate": 0.0, "throttle_rate": 0.0}
+        self.set_faults(latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate, throttle_rate=throttle_rate)
+        self._counts: Dict[str, int] = {}
+        self._counts_lock = threading.Lock()
+        self._httpd = _StubHTTPServer((host, port), _StubHandler)
+        self._httpd.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def site_id(self) -> str:
+        return self.site.site_id
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._httpd.server_address[:2]
+
+    @property
+    def api_base(self) -> str:
+        """WP_API_BASE 应设置的值"""
+        host, port = self.address
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def set_faults(self, **faults) -> None:
+        unknown = set(faults) - set(self.faults)
+        if unknown:
+            raise ValueError(f"未知的注入参数: {sorted(unknown)}")
+        # 整体替换，处理中的请求读到的是一致的配置
+        self.faults = {**self.faults, **{k: float(v) for k, v in faults.items()}}
+
+    def count(self, method: str, path: str) -> None:
+        key = f"{method} {endpoint_template(path)}"
+        with self._counts_lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """已处理的请求数：{"total": n, "endpoints": {"GET /sites/{site}/posts": n, ...}}"""
+        with self._counts_lock:
+            return {"total": sum(self._counts.values()), "endpoints": dict(sorted(self._counts.items()))}
+
+    def reset_stats(self) -> None:
+        with self._counts_lock:
+            self._counts.clear()
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="cms-stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 WordPress.com REST API 替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--site-id", default=DEFAULT_SITE_ID)
+    parser.add_argument("--posts", type=int, default=200, help="生成的文章数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--daily-active", type=int, default=500, help="每天有浏览量的文章数")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--token", default=None, help="要求的 Bearer Token（默认不校验）")
+    args = parser.parse_args()
+
+    server = StubServer(
+        posts=args.posts, seed=args.seed, daily_active=args.daily_active, site_id=args.site_id,
+        host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, throttle_rate=args.throttle_rate, token=args.token
+    )
+    print(f"export WP_API_BASE={server.api_base}")
+    print(f"export WP_SITE_ID={server.site_id}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
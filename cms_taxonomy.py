@@ -0,0 +1,289 @@
+"""
+CMS Taxonomy - 分类/标签缓存
+按站点缓存分类和标签，在本地完成名称归一化和解析，减少 WordPress 在每次写入时的词条解析与重复创建
+
+- ensure()（批量预创建）首次使用时从 /categories、/tags 端点全量拉取（每页 1000 条），并持久化到本地索引，供冷启动复用
+- 单篇写入用 resolve_ids()：缓存冷启动时不全量拉取，只通过一次 /batch 请求按关键词查找本次用到的名称
+- 缓存未命中的名称通过一次 /batch 请求按关键词增量查找
+- 文章创建/更新的响应中带有完整的分类/标签信息，会顺带写回缓存
+"""
+
+import re
+import time
+import threading
+import unicodedata
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+from cms_index import LocalIndex
+from cms_tracing import bind_context
+
+TAXONOMIES = ("categories", "tags")
+
+# 本地索引中的 namespace
+_TERMS_NAMESPACE = "terms"
+# 每页拉取的词条数（WordPress.com 上限）
+_PAGE_SIZE = 1000
+# 单次 /batch 请求包含的最大子请求数
+_BATCH_SIZE = 20
+
+
+def normalize_term(name: str) -> str:
+    """
+    归一化词条名称：全角转半角、去首尾空白、合并连续空白、忽略大小写
+
+    例如 "AI"、"ai "、"Ａｉ" 归一化后相同
+    """
+    name = unicodedata.normalize("NFKC", str(name))
+    name = re.sub(r"\s+", " ", name).strip()
+    return name.casefold()
+
+
+class TermCache:
+    """
+    单个站点的分类/标签缓存
+
+    Args:
+        site_id: 站点 ID
+        request: 请求函数，签名同 cms_tools._make_request
+        index: 用于持久化的本地索引（可选）
+        ttl: 缓存有效期（秒），过期后重新全量拉取
+    """
+
+    def __init__(
+        self,
+        site_id: str,
+        request: Callable[..., dict],
+        index: LocalIndex = None,
+        ttl: int = 3600
+    ):
+        self.site_id = site_id
+        self.ttl = ttl
+        self._request = request
+        self._index = index
+        self._lock = threading.Lock()
+        # taxonomy -> {归一化名称: {"ID", "name", "slug"}}；没有全量加载时只包含查找过的词条
+        self._terms: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # 全量加载时间（只有部分词条的分类法不在其中）
+        self._loaded_at: Dict[str, float] = {}
+
+    # ---------- 加载 ----------
+
+    def _is_fresh(self, taxonomy: str) -> bool:
+        return taxonomy in self._loaded_at and time.time() - self._loaded_at[taxonomy] < self.ttl
+
+    def _fetch_all(self, taxonomy: str) -> Optional[List[Dict[str, Any]]]:
+        """逐页拉取某个分类法下的全部词条"""
+        terms = []
+        page = 1
+        while True:
+            result = self._request(
+                "GET",
+                f"/sites/{self.site_id}/{taxonomy}",
+                params={"number": _PAGE_SIZE, "page": page, "fields": "ID,name,slug"}
+            )
+            if not result["success"]:
+                return None
+            batch = result["data"].get(taxonomy, [])
+            terms.extend(batch)
+            if len(batch) < _PAGE_SIZE or len(terms) >= result["data"].get("found", 0):
+                return terms
+            page += 1
+
+    def _load_stored(self, taxonomy: str) -> Optional[Dict[str, Any]]:
+        """读取本地索引中未过期的全量缓存并装入内存"""
+        stored = self._index.get(_TERMS_NAMESPACE, f"{self.site_id}:{taxonomy}") if self._index else None
+        if not stored or time.time() - stored["loaded_at"] >= self.ttl:
+            return None
+        with self._lock:
+            self._terms[taxonomy] = {normalize_term(t["name"]): _slim(t) for t in stored["terms"]}
+            self._loaded_at[taxonomy] = stored["loaded_at"]
+        return stored
+
+    def _ensure_loaded(self, taxonomy: str) -> bool:
+        if self._is_fresh(taxonomy) or self._load_stored(taxonomy):
+            return True
+
+        terms = self._fetch_all(taxonomy)
+        if terms is None:
+            return False
+        with self._lock:
+            self._terms[taxonomy] = {normalize_term(t["name"]): _slim(t) for t in terms}
+            self._loaded_at[taxonomy] = time.time()
+        self._persist(taxonomy)
+        return True
+
+    def _persist(self, taxonomy: str) -> None:
+        """持久化全量缓存（只有部分词条时不持久化，否则下次会被当作全量）"""
+        if not self._index or taxonomy not in self._loaded_at:
+            return
+        with self._lock:
+            value = {
+                "loaded_at": self._loaded_at[taxonomy],
+                "terms": list(self._terms[taxonomy].values())
+            }
+        self._index.put(_TERMS_NAMESPACE, f"{self.site_id}:{taxonomy}", value)
+
+    def invalidate(self, taxonomy: str = None) -> None:
+        """使缓存失效，下次使用时重新拉取"""
+        with self._lock:
+            for t in ([taxonomy] if taxonomy else TAXONOMIES):
+                self._terms.pop(t, None)
+                self._loaded_at.pop(t, None)
+        if self._index:
+            self._index.delete(_TERMS_NAMESPACE, [
+                f"{self.site_id}:{t}" for t in ([taxonomy] if taxonomy else TAXONOMIES)
+            ])
+
+    # ---------- 增量更新 ----------
+
+    def add(self, taxonomy: str, terms: List[Dict[str, Any]], persist: bool = True) -> None:
+        """将新观察到的词条写入缓存（只有出现新词条时才重新持久化）"""
+        if not terms:
+            return
+        changed = False
+        with self._lock:
+            cached = self._terms.setdefault(taxonomy, {})
+            for term in terms:
+                if not term.get("name"):
+                    continue
+                key = normalize_term(term["name"])
+                slim = _slim(term)
+                if cached.get(key) != slim:
+                    cached[key] = slim
+                    changed = True
+        if changed and persist:
+            self._persist(taxonomy)
+
+    def learn_from_post(self, post: dict) -> None:
+        """从文章响应中的 categories/tags 字段（{名称: {ID, slug, ...}}）更新缓存"""
+        for taxonomy in TAXONOMIES:
+            terms = post.get(taxonomy)
+            if isinstance(terms, dict) and terms:
+                self.add(taxonomy, [{"name": name, **(info or {})} for name, info in terms.items()])
+
+    def _lookup_remote(self, taxonomy: str, names: List[str]) -> None:
+        """通过 /batch 按关键词查找缓存中没有的名称（缓存加载后新建的词条）"""
+        found = []
+        for i in range(0, len(names), _BATCH_SIZE):
+            urls = [
+                f"/sites/{self.site_id}/{taxonomy}?search={quote(name)}&fields=ID,name,slug"
+                for name in names[i:i + _BATCH_SIZE]
+            ]
+            result = self._request("GET", "/batch", params={"urls[]": urls})
+            if not result["success"]:
+                return
+            for response in result["data"].values():
+                if isinstance(response, dict):
+                    found.extend(response.get(taxonomy, []))
+        self.add(taxonomy, found)
+
+    # ---------- 解析 ----------
+
+    @staticmethod
+    def _clean_names(names: List[str]) -> List[Tuple[str, str]]:
+        """去重并清理名称：[(归一化名称, 清理后的名称)]，保持原顺序"""
+        cleaned = []
+        seen = set()
+        for name in names or []:
+            key = normalize_term(name)
+            if key and key not in seen:
+                seen.add(key)
+                cleaned.append((key, re.sub(r"\s+", " ", unicodedata.normalize("NFKC", str(name))).strip()))
+        return cleaned
+
+    def resolve_ids(self, taxonomy: str, names: List[str]) -> Tuple[List[int], List[str]]:
+        """
+        将名称解析为站点中已有词条的 ID（单篇文章写入时使用）
+
+        全量缓存有效时不发请求；否则只通过 /batch 查找缓存中没有的名称，不全量拉取。
+
+        Returns:
+            (ids, unknown): 已有词条的 ID（保持原顺序、去重），以及站点中找不到的名称（由写入请求按名称创建）
+        """
+        cleaned = self._clean_names(names)
+        if not cleaned:
+            return [], []
+        if not self._is_fresh(taxonomy):
+            self._load_stored(taxonomy)
+        if not self._is_fresh(taxonomy):
+            cached = self._terms.get(taxonomy, {})
+            unknown = [name for key, name in cleaned if key not in cached]
+            if unknown:
+                self._lookup_remote(taxonomy, unknown)
+
+        ids = []
+        unknown = []
+        terms = self._terms.get(taxonomy, {})
+        for key, name in cleaned:
+            term = terms.get(key)
+            if term and term.get("ID"):
+                if term["ID"] not in ids:
+                    ids.append(term["ID"])
+            else:
+                unknown.append(name)
+        return ids, unknown
+
+    def resolve(self, taxonomy: str, names: List[str], lookup_missing: bool = True) -> Tuple[List[str], List[str]]:
+        """
+        将名称解析为站点中已有词条的规范名称
+
+        Returns:
+            (names, missing): 去重后的名称列表（已有词条替换为规范名称，保持原顺序），
+            以及站点中不存在的名称
+        """
+        cleaned = self._clean_names(names)
+        if not cleaned or not self._ensure_loaded(taxonomy):
+            return [name for _, name in cleaned], []
+
+        if lookup_missing:
+            unknown = [name for key, name in cleaned if key not in self._terms[taxonomy]]
+            if unknown:
+                self._lookup_remote(taxonomy, unknown)
+
+        resolved = []
+        missing = []
+        terms = self._terms[taxonomy]
+        for key, name in cleaned:
+            if key in terms:
+                resolved.append(terms[key]["name"])
+            else:
+                resolved.append(name)
+                missing.append(name)
+        return resolved, missing
+
+    def ensure(self, taxonomy: str, names: List[str], concurrency: int = 4) -> Dict[str, Any]:
+        """
+        预先创建站点中不存在的词条（批量发布前调用，避免每篇文章写入时各自创建）
+
+        Returns:
+            {"names": [...], "existing": [...], "created": [...], "failed": [{"name", "error"}]}
+        """
+        resolved, missing = self.resolve(taxonomy, names)
+        created = []
+        failed = []
+
+        def create(name: str) -> Tuple[str, dict]:
+            return name, self._request("POST", f"/sites/{self.site_id}/{taxonomy}/new", data={"name": name})
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max(1, concurrency), len(missing))) as executor:
+                for name, result in executor.map(bind_context(create), missing):
+                    if result["success"]:
+                        created.append(_slim(result["data"]))
+                    else:
+                        failed.append({"name": name, "error": result.get("error")})
+            self.add(taxonomy, created)
+
+        return {
+            "names": resolved,
+            "existing": [name for name in resolved if name not in missing],
+            "created": [term["name"] for term in created],
+            "failed": failed
+        }
+
+
+def _slim(term: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留解析需要的字段"""
+    return {"ID": term.get("ID"), "name": term.get("name"), "slug": term.get("slug")}
@@ -9,19 +9,82 @@ CMS Tools - 内容管理系统工具集
 - unpublish_article   下线（转为草稿）
 - get_article_metrics 获取表现（浏览量、点赞等）
 - list_articles_by_topic 资产盘点（按主题/分类列出）
+- bulk_update_status  批量上线/下线（按筛选条件）
+- upload_media        上传媒体文件（特色图片）
+- get_topic_trends    分类/标签浏览量趋势分析
 """
 
-import requests
 import json
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Union, Tuple
+from datetime import datetime, timezone
+import time
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import os
+import html
+import gzip
+from collections import OrderedDict
+
+# 同目录下的辅助模块
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from cms_index import get_default_index, content_hash
+from cms_taxonomy import TermCache
+from cms_media import MediaFile, MultipartStream, MediaPathError, is_local_path, resolve_media_path
+from cms_content import compact_html
+from cms_warehouse import StatsWarehouse, GRANULARITIES, resolve_granularity, downsample
+from cms_observation import compact_observation
+from cms_validation import compile_validators, format_errors
+from cms_metrics import METRICS, start_metrics_server, endpoint_template
+from cms_tracing import span, bind_context
+from cms_profiling import maybe_profile
+from cms_cassette import get_cassette, CassetteMiss
+from cms_deadline import CMS_TOOL_DEADLINE, tool_deadline, request_timeout, has_budget, mark_partial
 
 # 配置
 WP_ACCESS_TOKEN = os.getenv("WP_ACCESS_TOKEN", "your-wordpress-access-token")
 WP_SITE_ID = os.getenv("WP_SITE_ID", "251193948")
-WP_API_BASE = "https://public-api.wordpress.com/rest/v1.1"
+# 本地测试时指向 cms_stub_server（如 http://127.0.0.1:8089/rest/v1.1）
+WP_API_BASE = os.getenv("WP_API_BASE", "https://public-api.wordpress.com/rest/v1.1")
+
+# 幂等创建：相同 idempotency_key 的重复创建直接返回已有文章
+CMS_IDEMPOTENCY_ENABLED = os.getenv("CMS_IDEMPOTENCY", "1") != "0"
+# 没有 idempotency_key 时也按 (站点, 标题, 内容, slug) 的哈希去重（默认关闭：有意重复发布相同内容时会被误判）
+CMS_IDEMPOTENCY_CONTENT_HASH = os.getenv("CMS_IDEMPOTENCY_CONTENT_HASH", "0") == "1"
+# 幂等记录有效期（秒），过期后重新创建；0 为不过期
+CMS_IDEMPOTENCY_TTL = float(os.getenv("CMS_IDEMPOTENCY_TTL", "86400"))
+
+# 媒体上传超时（秒）：大图片上传比普通请求慢得多
+CMS_UPLOAD_TIMEOUT = float(os.getenv("CMS_UPLOAD_TIMEOUT", "300"))
+
+# 内容压缩：create/update 前清理 HTML（空白、空元素、inline style、实体）
+CMS_COMPACT_CONTENT = os.getenv("CMS_COMPACT_CONTENT", "0") == "1"
+
+# 请求体 gzip 压缩（需要 API 网关支持 Content-Encoding: gzip，默认关闭）
+CMS_GZIP_REQUESTS = os.getenv("CMS_GZIP_REQUESTS", "0") == "1"
+CMS_GZIP_MIN_BYTES = int(os.getenv("CMS_GZIP_MIN_BYTES", "4096"))
+
+# 每日浏览量仓库：get_article_metrics / get_site_stats 从本地仓库回答浏览量查询
+CMS_WAREHOUSE_ENABLED = os.getenv("CMS_WAREHOUSE", "0") == "1"
+CMS_WAREHOUSE_SYNC_INTERVAL = int(os.getenv("CMS_WAREHOUSE_SYNC_INTERVAL", "300"))
+
+# 分类/标签缓存：写入前在本地归一化并解析为已有词条名称
+CMS_TERM_CACHE_ENABLED = os.getenv("CMS_TERM_CACHE", "1") != "0"
+CMS_TERM_CACHE_TTL = int(os.getenv("CMS_TERM_CACHE_TTL", "3600"))
+
+# 紧凑输出：execute_cms_tool 的结果压缩到预算以内（用于放进 LLM prompt）
+CMS_COMPACT_OBSERVATIONS = os.getenv("CMS_COMPACT_OBSERVATIONS", "0") == "1"
+CMS_OBSERVATION_MAX_BYTES = int(os.getenv("CMS_OBSERVATION_MAX_BYTES", "4096"))
+CMS_OBSERVATION_MAX_TOKENS = int(os.getenv("CMS_OBSERVATION_MAX_TOKENS", "0")) or None
+
+# 本地端口提供 Prometheus /metrics（不设置则不启动）
+CMS_METRICS_PORT = int(os.getenv("CMS_METRICS_PORT", "0"))
+
+# execute_cms_tools_batch 共享线程池大小
+CMS_BATCH_WORKERS = int(os.getenv("CMS_BATCH_WORKERS", "8"))
+
+# 文章状态缓存最多保留的文章数（按最近使用淘汰）
+CMS_POST_STATUS_CACHE_SIZE = int(os.getenv("CMS_POST_STATUS_CACHE_SIZE", "10000"))
 
 
 # ============================================================
@@ -38,10 +101,12 @@ CREATE_ARTICLE_TOOL = {
             "properties": {
                 "title": {
                     "type": "string",
+                    "minLength": 1,
                     "description": "文章标题"
                 },
                 "content": {
                     "type": "string",
+                    "minLength": 1,
                     "description": "文章内容，支持 HTML 格式（推荐使用 <h2>, <p>, <ul> 等标签）"
                 },
                 "excerpt": {
@@ -66,11 +131,20 @@ CREATE_ARTICLE_TOOL = {
                 },
                 "slug": {
                     "type": "string",
+                    "maxLength": 200,
                     "description": "URL 别名（可选，如 'my-first-post'）"
                 },
                 "featured_image": {
+                    "type": ["string", "integer"],
+                    "description": "特色图片（可选）：图片 URL、媒体库附件 ID（upload_media 返回的 media_id），或媒体根目录（CMS_MEDIA_ROOT）下的本地文件路径"
+                },
+                "idempotency_key": {
                     "type": "string",
-                    "description": "特色图片 URL（可选）"
+                    "description": "幂等键（可选）。重试时传入相同的值，保证只创建一篇文章"
+                },
+                "compact_content": {
+                    "type": "boolean",
+                    "description": "是否在提交前压缩 HTML（去除多余空白、空标签、inline style）"
                 }
             },
             "required": ["title", "content"]
@@ -88,6 +162,7 @@ UPDATE_ARTICLE_TOOL = {
             "properties": {
                 "post_id": {
                     "type": "integer",
+                    "minimum": 1,
                     "description": "要更新的文章 ID"
                 },
                 "title": {
@@ -114,7 +189,12 @@ UPDATE_ARTICLE_TOOL = {
                 },
                 "slug": {
                     "type": "string",
+                    "maxLength": 200,
                     "description": "新 URL 别名（可选）"
+                },
+                "compact_content": {
+                    "type": "boolean",
+                    "description": "是否在提交前压缩 HTML（去除多余空白、空标签、inline style）"
                 }
             },
             "required": ["post_id"]
@@ -132,6 +212,7 @@ PUBLISH_ARTICLE_TOOL = {
             "properties": {
                 "post_id": {
                     "type": "integer",
+                    "minimum": 1,
                     "description": "要发布的文章 ID"
                 },
                 "schedule_time": {
@@ -154,6 +235,7 @@ UNPUBLISH_ARTICLE_TOOL = {
             "properties": {
                 "post_id": {
                     "type": "integer",
+                    "minimum": 1,
                     "description": "要下线的文章 ID"
                 },
                 "target_status": {
@@ -178,10 +260,13 @@ GET_ARTICLE_METRICS_TOOL = {
             "properties": {
                 "post_id": {
                     "type": "integer",
+                    "minimum": 1,
                     "description": "文章 ID"
                 },
                 "days": {
                     "type": "integer",
+                    "minimum": 1,
+                    "maximum": 365,
                     "description": "查看最近 N 天的数据（默认 30 天，最多 365 天）",
                     "default": 30
                 },
@@ -189,6 +274,12 @@ GET_ARTICLE_METRICS_TOOL = {
                     "type": "boolean",
                     "description": "是否包含每日明细数据",
                     "default": False
+                },
+                "granularity": {
+                    "type": "string",
+                    "enum": ["auto", "day", "week", "month"],
+                    "description": "明细的时间粒度（默认 auto：31 天以内按天，180 天以内按周，更长按月）",
+                    "default": "auto"
                 }
             },
             "required": ["post_id"]
@@ -236,11 +327,14 @@ LIST_ARTICLES_BY_TOPIC_TOOL = {
                 },
                 "number": {
                     "type": "integer",
+                    "minimum": 1,
+                    "maximum": 100,
                     "description": "返回数量（默认 20，最多 100）",
                     "default": 20
                 },
                 "page": {
                     "type": "integer",
+                    "minimum": 1,
                     "description": "页码（从 1 开始，用于分页）",
                     "default": 1
                 },
@@ -259,40 +353,421 @@ LIST_ARTICLES_BY_TOPIC_TOOL = {
 # Tool 实现函数
 # ============================================================
 
-def _make_request(method: str, endpoint: str, data: dict = None, params: dict = None) -> dict:
+def _make_request(
+    method: str,
+    endpoint: str,
+    data: dict = None,
+    params: dict = None,
+    body=None,
+    content_type: str = None,
+    timeout: float = 30
+) -> dict:
     """
     统一的 API 请求函数
+    
+    Args:
+        body: 原始请求体（bytes 或带 len() 的文件类对象，如流式 multipart），
+            提供时代替 data 以 content_type 发送
+    
+    设置 CMS_CASSETTE 时按 cms_cassette 录制真实响应，或不访问网络直接回放录制的响应。
+    
+    有时间预算（cms_deadline）时超时不超过剩余时间，预算用完时不发请求，
+    返回 {"success": False, "deadline_exceeded": True, ...}。
     """
+    # 第一次请求时才导入 HTTP 客户端（适配层注册工具时不需要它）
+    import requests
+    
+    limit = request_timeout(timeout)
+    if limit <= 0:
+        return {"success": False, "error": "超出时间预算，未发送请求", "deadline_exceeded": True}
+    deadline_bound = limit < timeout
+    timeout = limit
+    
     url = f"{WP_API_BASE}{endpoint}"
     headers = {
         "Authorization": f"Bearer {WP_ACCESS_TOKEN}",
-        "Content-Type": "application/json"
+        "Content-Type": content_type or "application/json"
     }
     
-    try:
-        if method.upper() == "GET":
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-        elif method.upper() == "POST":
-            response = requests.post(url, headers=headers, json=data, timeout=30)
-        elif method.upper() == "DELETE":
-            response = requests.delete(url, headers=headers, timeout=30)
-        else:
-            return {"success": False, "error": f"Unsupported method: {method}"}
+    # 指标：按接口模板记录状态码、延迟、字节数和 JSON 解析耗时
+    method = method.upper()
+    status = "error"
+    bytes_out = bytes_in = 0
+    decode_seconds = None
+    started = time.perf_counter()
+    
+    # 录制/回放（CMS_CASSETTE）
+    cassette = get_cassette()
+    
+    with span("http", method=method, endpoint=endpoint_template(endpoint)) as trace:
+        try:
+            if cassette is not None and cassette.replaying:
+                response = cassette.play(method, endpoint, params=params, data=data, body=body, timeout=timeout)
+                bytes_out = _body_size(body if body is not None else response.request.body)
+            elif method == "GET":
+                response = requests.get(url, headers=headers, params=params, timeout=timeout)
+            elif method == "POST" and body is not None:
+                bytes_out = _body_size(body)
+                response = requests.post(url, headers=headers, params=params, data=body, timeout=timeout)
+            elif method == "POST" and CMS_GZIP_REQUESTS and data:
+                raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                if len(raw) >= CMS_GZIP_MIN_BYTES:
+                    headers["Content-Encoding"] = "gzip"
+                    raw = gzip.compress(raw)
+                bytes_out = len(raw)
+                response = requests.post(url, headers=headers, data=raw, timeout=timeout)
+            elif method == "POST":
+                response = requests.post(url, headers=headers, json=data, timeout=timeout)
+                bytes_out = _body_size(response.request.body)
+            elif method == "DELETE":
+                response = requests.delete(url, headers=headers, timeout=timeout)
+            else:
+                return {"success": False, "error": f"Unsupported method: {method}"}
+            
+            if cassette is not None and cassette.recording:
+                cassette.record(method, endpoint, response, params=params, data=data, body=body,
+                                elapsed=time.perf_counter() - started)
         
-        result = response.json()
+            status = response.status_code
+            bytes_in = len(response.content)
+            decode_started = time.perf_counter()
+            with span("parse.json", bytes=bytes_in):
+                result = response.json()
+            decode_seconds = time.perf_counter() - decode_started
         
-        if response.status_code in [200, 201]:
-            return {"success": True, "data": result}
-        else:
-            error_msg = result.get("message", result.get("error", str(result)))
-            return {"success": False, "error": error_msg, "status_code": response.status_code}
+            if response.status_code in [200, 201]:
+                return {"success": True, "data": result}
+            else:
+                error_msg = result.get("message", result.get("error", str(result)))
+                return {"success": False, "error": error_msg, "status_code": response.status_code}
             
-    except requests.exceptions.Timeout:
-        return {"success": False, "error": "请求超时"}
-    except requests.exceptions.RequestException as e:
-        return {"success": False, "error": f"网络错误: {str(e)}"}
-    except json.JSONDecodeError:
-        return {"success": False, "error": "响应解析失败"}
+        except requests.exceptions.Timeout:
+            status = "timeout"
+            if deadline_bound:
+                return {"success": False, "error": "请求超时（超出时间预算）", "deadline_exceeded": True}
+            return {"success": False, "error": "请求超时"}
+        except requests.exceptions.RequestException as e:
+            return {"success": False, "error": f"网络错误: {str(e)}"}
+        except json.JSONDecodeError:
+            return {"success": False, "error": "响应解析失败"}
+        except CassetteMiss as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            METRICS.observe_request(
+                method, endpoint, status, time.perf_counter() - started,
+                bytes_out=bytes_out, bytes_in=bytes_in, decode_seconds=decode_seconds
+            )
+            trace.set_attributes({"status": status, "bytes_out": bytes_out, "bytes_in": bytes_in})
+            if status not in (200, 201):
+                trace.set_error(str(status))
+
+
+def _body_size(body) -> int:
+    """请求体字节数（bytes/str 或带 len() 的文件类对象，如流式 multipart）"""
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+
+def _optional_request(step: str, skipped: List[str], method: str, endpoint: str, **kwargs) -> dict:
+    """
+    可选的统计子请求：剩余时间不足时跳过，因时间预算超时时同样记入 skipped
+    （工具据此返回 data.partial = True，而不是整体失败）
+    """
+    if not has_budget():
+        skipped.append(step)
+        return {"success": False, "error": "时间预算不足，已跳过", "deadline_exceeded": True}
+    result = _make_request(method, endpoint, **kwargs)
+    if result.get("deadline_exceeded"):
+        skipped.append(step)
+    return result
+
+
+# 文章状态缓存：(site_id, post_id) -> 最近一次观察到的状态（来自创建/更新/列表等响应），LRU
+_POST_STATUS_CACHE: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+_POST_STATUS_CACHE_LOCK = threading.Lock()
+
+
+def _remember_status(post: dict) -> None:
+    """记录响应中文章的当前状态"""
+    if isinstance(post, dict) and post.get("ID") and post.get("status"):
+        key = (WP_SITE_ID, post["ID"])
+        with _POST_STATUS_CACHE_LOCK:
+            _POST_STATUS_CACHE[key] = post["status"]
+            _POST_STATUS_CACHE.move_to_end(key)
+            while len(_POST_STATUS_CACHE) > CMS_POST_STATUS_CACHE_SIZE:
+                _POST_STATUS_CACHE.popitem(last=False)
+
+
+def _forget_status(post_id: int) -> None:
+    """状态写入失败时文章的实际状态未知，删除缓存"""
+    with _POST_STATUS_CACHE_LOCK:
+        _POST_STATUS_CACHE.pop((WP_SITE_ID, post_id), None)
+
+
+def _get_post_status(post_id: int) -> str:
+    """获取文章当前状态：优先读缓存，未命中时只请求 status 字段"""
+    key = (WP_SITE_ID, post_id)
+    with span("cache.lookup", cache="post_status") as trace, _POST_STATUS_CACHE_LOCK:
+        cached = _POST_STATUS_CACHE.get(key)
+        if cached:
+            _POST_STATUS_CACHE.move_to_end(key)
+        trace.set_attribute("outcome", "hit" if cached else "miss")
+    METRICS.record_cache("post_status", bool(cached))
+    if cached:
+        return cached
+    
+    result = _make_request(
+        "GET",
+        f"/sites/{WP_SITE_ID}/posts/{post_id}",
+        params={"fields": "ID,status"}
+    )
+    if result["success"]:
+        _remember_status(result["data"])
+        return result["data"].get("status", "unknown")
+    return "unknown"
+
+
+def _prepare_content(content: str, compact_content: Optional[bool]) -> Tuple[str, Optional[dict]]:
+    """按需压缩文章 HTML，返回 (内容, 压缩统计)"""
+    if compact_content is None:
+        compact_content = CMS_COMPACT_CONTENT
+    if not compact_content or not content:
+        return content, None
+    return compact_html(content)
+
+
+# 每日浏览量仓库：site_id -> StatsWarehouse
+_WAREHOUSES: Dict[str, StatsWarehouse] = {}
+_WAREHOUSES_LOCK = threading.Lock()
+
+
+def _use_warehouse(use_warehouse: Optional[bool]) -> bool:
+    return CMS_WAREHOUSE_ENABLED if use_warehouse is None else use_warehouse
+
+
+# 已获取到时区设置的站点：site_id -> gmt_offset（站点没有该设置时为 None）
+_SITE_UTC_OFFSETS: Dict[str, Optional[float]] = {}
+
+
+def _load_site_utc_offset() -> None:
+    """获取站点时区相对 UTC 的小时数（站点设置 gmt_offset）；失败时不记录，下次再取"""
+    if WP_SITE_ID in _SITE_UTC_OFFSETS or not has_budget():
+        return
+    result = _make_request("GET", f"/sites/{WP_SITE_ID}", params={"fields": "ID,options"})
+    if not result["success"]:
+        return
+    offset = (result["data"].get("options") or {}).get("gmt_offset")
+    try:
+        _SITE_UTC_OFFSETS[WP_SITE_ID] = float(offset)
+    except (TypeError, ValueError):
+        _SITE_UTC_OFFSETS[WP_SITE_ID] = None
+
+
+def _get_warehouse() -> StatsWarehouse:
+    """获取当前站点的每日浏览量仓库（带站点时区，用于判断哪些日期已经结束）"""
+    with _WAREHOUSES_LOCK:
+        _load_site_utc_offset()
+        warehouse = _WAREHOUSES.get(WP_SITE_ID)
+        if warehouse is None:
+            warehouse = StatsWarehouse(WP_SITE_ID, _make_request, sync_interval=CMS_WAREHOUSE_SYNC_INTERVAL)
+            _WAREHOUSES[WP_SITE_ID] = warehouse
+        warehouse.utc_offset = _SITE_UTC_OFFSETS.get(WP_SITE_ID)
+    return warehouse
+
+
+def _sync_warehouse(warehouse: StatsWarehouse, days: int, skipped: List[str]) -> Optional[dict]:
+    """
+    增量同步仓库：剩余时间不足时跳过，有请求失败时记入 skipped（warehouse_sync）；
+    周期内没有任何已同步的数据时返回失败结果，避免把同步失败当作零浏览量返回
+    """
+    if has_budget():
+        report = warehouse.sync(days)
+    else:
+        report = {"requests": 0, "days_synced": 0, "errors": ["时间预算不足，已跳过"]}
+    if not report["errors"]:
+        return None
+    skipped.append("warehouse_sync")
+    if warehouse.synced_day_count(days) == 0:
+        return {"success": False, "error": f"浏览量仓库同步失败: {report['errors'][0]}"}
+    return None
+
+
+# 分类/标签缓存：site_id -> TermCache
+_TERM_CACHES: Dict[str, TermCache] = {}
+_TERM_CACHES_LOCK = threading.Lock()
+
+
+def _get_term_cache() -> TermCache:
+    """获取当前站点的分类/标签缓存"""
+    with _TERM_CACHES_LOCK:
+        cache = _TERM_CACHES.get(WP_SITE_ID)
+        if cache is None:
+            cache = TermCache(WP_SITE_ID, _make_request, index=get_default_index(), ttl=CMS_TERM_CACHE_TTL)
+            _TERM_CACHES[WP_SITE_ID] = cache
+    return cache
+
+
+def _resolve_terms(taxonomy: str, names: Optional[List[str]]) -> Tuple[List[int], List[str]]:
+    """
+    写入前将分类/标签名称解析为站点已有词条的 ID（服务端不再按名称匹配）
+
+    Returns:
+        (ids, names): 已有词条的 ID，以及站点中不存在、需要由写入请求按名称创建的词条
+    """
+    if not names:
+        return [], []
+    if not CMS_TERM_CACHE_ENABLED:
+        return [], list(names)
+    with span("cache.lookup", cache="terms", taxonomy=taxonomy) as trace:
+        ids, missing = _get_term_cache().resolve_ids(taxonomy, names)
+        trace.set_attributes({"hits": len(ids), "misses": len(missing)})
+    METRICS.record_cache("terms", True, len(ids))
+    METRICS.record_cache("terms", False, len(missing))
+    return ids, missing
+
+
+def _add_terms(payload: dict, taxonomy: str, names: List[str]) -> None:
+    """
+    写入 payload：已有词条用 <taxonomy>_by_id 传 ID，新词条按名称传入由服务端创建；
+    names 为空列表时清空该文章的分类/标签
+    """
+    ids, missing = _resolve_terms(taxonomy, names)
+    if ids:
+        payload[f"{taxonomy}_by_id"] = ",".join(str(term_id) for term_id in ids)
+    if missing or not ids:
+        payload[taxonomy] = ",".join(missing)
+
+
+def _learn_terms(post: dict) -> None:
+    """用文章响应中的分类/标签更新缓存"""
+    if CMS_TERM_CACHE_ENABLED:
+        _get_term_cache().learn_from_post(post)
+
+
+def ensure_terms(
+    categories: List[str] = None,
+    tags: List[str] = None,
+    concurrency: int = 4
+) -> dict:
+    """
+    预先创建不存在的分类/标签
+    
+    批量发布前调用：先在本地解析全部名称，站点中不存在的词条一次性并发创建，
+    之后每篇文章写入时都能直接命中已有词条。
+    
+    Returns:
+        {
+            "success": True,
+            "data": {
+                "categories": {"names": [...], "existing": [...], "created": [...], "failed": [...]},
+                "tags": {...}
+            }
+        }
+    """
+    cache = _get_term_cache()
+    data = {}
+    if categories:
+        data["categories"] = cache.ensure("categories", categories, concurrency=concurrency)
+    if tags:
+        data["tags"] = cache.ensure("tags", tags, concurrency=concurrency)
+    
+    failed = [f for part in data.values() for f in part["failed"]]
+    result = {"success": not failed, "data": data}
+    if failed:
+        result["error"] = f"{len(failed)} 个分类/标签创建失败"
+    return result
+
+
+# 幂等索引中的 namespace
+_IDEMPOTENCY_NAMESPACE = "created_posts"
+# 上一次创建请求结果未知（超时等）时，按标题回查该时间窗口内新建的文章
+_PENDING_LOOKBACK_SECONDS = 120
+
+
+def _idempotency_keys(title: str, content: str, slug: str, idempotency_key: str = None) -> List[str]:
+    """生成一次创建请求对应的索引 key（调用方提供的幂等键优先；内容哈希需开启 CMS_IDEMPOTENCY_CONTENT_HASH）"""
+    keys = []
+    if idempotency_key:
+        keys.append(f"key:{WP_SITE_ID}:{idempotency_key}")
+    if CMS_IDEMPOTENCY_CONTENT_HASH:
+        keys.append(f"hash:{content_hash(WP_SITE_ID, title, content, slug or '')}")
+    return keys
+
+
+def _created_post_exists(post_id: int) -> Optional[bool]:
+    """幂等命中前确认文章仍存在：True 存在，False 已删除或在回收站，None 无法确认（网络错误等）"""
+    result = _make_request(
+        "GET",
+        f"/sites/{WP_SITE_ID}/posts/{post_id}",
+        params={"fields": "ID,status"}
+    )
+    if result["success"]:
+        _remember_status(result["data"])
+        return result["data"].get("status") != "trash"
+    if result.get("status_code") in (403, 404, 410):
+        return False
+    return None
+
+
+def _lookup_created_post(index, keys: List[str]) -> Optional[dict]:
+    """
+    查找幂等记录；已过期（CMS_IDEMPOTENCY_TTL）或文章已被删除的 created 记录视为未命中并清除。
+    无法确认文章是否存在时仍按命中处理，避免重复创建。
+    """
+    entry = index.get_first(_IDEMPOTENCY_NAMESPACE, keys)
+    if not entry or entry.get("state") != "created":
+        return entry
+    
+    expired = CMS_IDEMPOTENCY_TTL > 0 and time.time() - entry.get("created_at", 0) > CMS_IDEMPOTENCY_TTL
+    if expired or _created_post_exists(entry["data"]["post_id"]) is False:
+        index.delete(_IDEMPOTENCY_NAMESPACE, keys)
+        return None
+    return entry
+
+
+def _recover_pending_create(title: str, started_at: float) -> Optional[dict]:
+    """
+    上一次创建请求没有拿到结果（如超时），文章可能已在服务端创建。
+    按标题回查请求发起后新建的文章，找到则视为上一次请求已成功。
+    """
+    after = datetime.fromtimestamp(started_at - _PENDING_LOOKBACK_SECONDS, tz=timezone.utc).isoformat(timespec="seconds")
+    result = _make_request("GET", f"/sites/{WP_SITE_ID}/posts/", params={
+        "search": title,
+        "status": "any",
+        "after": after,
+        "number": 20,
+        "order_by": "date",
+        "order": "DESC"
+    })
+    if not result["success"]:
+        return None
+    
+    for post in result["data"].get("posts", []):
+        if html.unescape(post.get("title", "")) == title:
+            return post
+    return None
+
+
+def _format_created_post(post: dict) -> dict:
+    """将 posts/new 返回的文章转为 create_article 的返回结构"""
+    return {
+        "post_id": post["ID"],
+        "title": post["title"],
+        "status": post["status"],
+        "url": post["URL"],
+        "short_url": post.get("short_URL", ""),
+        "edit_url": f"https://wordpress.com/post/{WP_SITE_ID}/{post['ID']}",
+        "created_at": post["date"],
+        "author": post.get("author", {}).get("name", ""),
+        "categories": list(post.get("categories", {}).keys()),
+        "tags": list(post.get("tags", {}).keys())
+    }
 
 
 def create_article(
@@ -303,11 +778,23 @@ def create_article(
     tags: List[str] = None,
     status: str = "draft",
     slug: str = None,
-    featured_image: str = None
+    featured_image: Union[str, int] = None,
+    idempotency_key: str = None,
+    compact_content: bool = None
 ) -> dict:
     """
     新建文章
     
+    featured_image 可以是图片 URL、媒体库附件 ID，或 CMS_MEDIA_ROOT 下的本地文件路径（自动上传）；
+    未配置 CMS_MEDIA_ROOT 或路径在根目录外时返回错误，不读取文件。
+    compact_content=True 时先压缩 HTML，返回中带 content_stats（节省的字节数）；
+    不传则由环境变量 CMS_COMPACT_CONTENT 决定。
+    
+    幂等：创建成功后会在本地索引中记录 idempotency_key 到 post_id 的映射
+    （开启 CMS_IDEMPOTENCY_CONTENT_HASH 时还记录 (站点, 标题, 内容, slug) 的哈希）。
+    有效期 CMS_IDEMPOTENCY_TTL 内重复调用、且文章仍存在时直接返回已有文章（data.deduplicated=True），
+    不会解析分类/标签、上传图片或再次写入。
+    
     Returns:
         {
             "success": True,
@@ -321,43 +808,78 @@ def create_article(
             }
         }
     """
+    # 先查幂等记录：命中时不应有任何写入（创建分类/标签、上传图片）
+    index = None
+    keys = _idempotency_keys(title, content, slug, idempotency_key) if CMS_IDEMPOTENCY_ENABLED else []
+    if keys:
+        index = get_default_index()
+        entry = _lookup_created_post(index, keys)
+        
+        if entry and entry.get("state") == "created":
+            # 已创建过：直接返回，不发起网络写入
+            index.put_many(_IDEMPOTENCY_NAMESPACE, keys, entry)
+            return {"success": True, "data": {**entry["data"], "deduplicated": True}}
+        
+        if entry and entry.get("state") == "pending":
+            post = _recover_pending_create(title, entry["started_at"])
+            if post:
+                data = _format_created_post(post)
+                index.put_many(_IDEMPOTENCY_NAMESPACE, keys, {"state": "created", "created_at": time.time(), "data": data})
+                return {"success": True, "data": {**data, "deduplicated": True}}
+    
+    compacted, content_stats = _prepare_content(content, compact_content)
+    
     payload = {
         "title": title,
-        "content": content,
+        "content": compacted,
         "status": status
     }
     
     if excerpt:
         payload["excerpt"] = excerpt
     if categories:
-        payload["categories"] = ",".join(categories)
+        _add_terms(payload, "categories", categories)
     if tags:
-        payload["tags"] = ",".join(tags)
+        _add_terms(payload, "tags", tags)
     if slug:
         payload["slug"] = slug
     if featured_image:
         payload["featured_image"] = featured_image
     
+    if is_local_path(featured_image):
+        # 本地图片：限定在媒体根目录内，先上传到媒体库（按内容哈希去重），再使用附件 ID
+        try:
+            featured_path = resolve_media_path(featured_image)
+        except MediaPathError as e:
+            return {"success": False, "error": f"特色图片不可用: {e}"}
+        upload = upload_media([featured_path])
+        if not upload["success"]:
+            return {"success": False, "error": f"特色图片上传失败: {upload.get('error')}"}
+        payload["featured_image"] = upload["data"]["media"][0]["media_id"]
+    
+    if index:
+        index.put_many(_IDEMPOTENCY_NAMESPACE, keys, {"state": "pending", "started_at": time.time()})
+    
     result = _make_request("POST", f"/sites/{WP_SITE_ID}/posts/new", data=payload)
     
     if result["success"]:
-        post = result["data"]
+        _remember_status(result["data"])
+        _learn_terms(result["data"])
+        data = _format_created_post(result["data"])
+        if index:
+            index.put_many(_IDEMPOTENCY_NAMESPACE, keys, {"state": "created", "created_at": time.time(), "data": data})
+        if content_stats:
+            data = {**data, "content_stats": content_stats}
         return {
             "success": True,
-            "data": {
-                "post_id": post["ID"],
-                "title": post["title"],
-                "status": post["status"],
-                "url": post["URL"],
-                "short_url": post.get("short_URL", ""),
-                "edit_url": f"https://wordpress.com/post/{WP_SITE_ID}/{post['ID']}",
-                "created_at": post["date"],
-                "author": post.get("author", {}).get("name", ""),
-                "categories": list(post.get("categories", {}).keys()),
-                "tags": list(post.get("tags", {}).keys())
-            }
+            "data": data
         }
     
+    # 服务端明确拒绝（有状态码）说明没有创建成功，清除 pending 记录；
+    # 超时/网络错误时结果未知，保留 pending 以便下次重试时回查
+    if index and "status_code" in result:
+        index.delete(_IDEMPOTENCY_NAMESPACE, keys)
+    
     return result
 
 
@@ -368,23 +890,27 @@ def update_article(
     excerpt: str = None,
     categories: List[str] = None,
     tags: List[str] = None,
-    slug: str = None
+    slug: str = None,
+    compact_content: bool = None
 ) -> dict:
     """
     更新文章
+    
+    compact_content=True 时先压缩 HTML，返回中带 content_stats
     """
     payload = {}
+    content_stats = None
     
     if title is not None:
         payload["title"] = title
     if content is not None:
-        payload["content"] = content
+        payload["content"], content_stats = _prepare_content(content, compact_content)
     if excerpt is not None:
         payload["excerpt"] = excerpt
     if categories is not None:
-        payload["categories"] = ",".join(categories)
+        _add_terms(payload, "categories", categories)
     if tags is not None:
-        payload["tags"] = ",".join(tags)
+        _add_terms(payload, "tags", tags)
     if slug is not None:
         payload["slug"] = slug
     
@@ -395,6 +921,8 @@ def update_article(
     
     if result["success"]:
         post = result["data"]
+        _remember_status(post)
+        _learn_terms(post)
         return {
             "success": True,
             "data": {
@@ -403,7 +931,8 @@ def update_article(
                 "status": post["status"],
                 "url": post["URL"],
                 "modified_at": post["modified"],
-                "message": "文章更新成功"
+                "message": "文章更新成功",
+                **({"content_stats": content_stats} if content_stats else {})
             }
         }
     
@@ -437,6 +966,7 @@ def publish_article(
     
     if result["success"]:
         post = result["data"]
+        _remember_status(post)
         return {
             "success": True,
             "data": {
@@ -451,12 +981,14 @@ def publish_article(
             }
         }
     
+    _forget_status(post_id)
     return result
 
 
 def unpublish_article(
     post_id: int,
-    target_status: str = "draft"
+    target_status: str = "draft",
+    previous_status: str = None
 ) -> dict:
     """
     下线文章
@@ -464,13 +996,19 @@ def unpublish_article(
     Args:
         post_id: 文章 ID
         target_status: 目标状态 (draft/private/trash)
+        previous_status: 调用方已知的当前状态（如批量操作来自列表结果），
+            不传则从状态缓存读取，缓存未命中时查询一次
     """
+    if previous_status is None:
+        previous_status = _get_post_status(post_id)
+    
     payload = {"status": target_status}
     
     result = _make_request("POST", f"/sites/{WP_SITE_ID}/posts/{post_id}", data=payload)
     
     if result["success"]:
         post = result["data"]
+        _remember_status(post)
         status_names = {
             "draft": "草稿",
             "private": "私密",
@@ -481,19 +1019,62 @@ def unpublish_article(
             "data": {
                 "post_id": post["ID"],
                 "title": post["title"],
-                "previous_status": "publish",
+                "previous_status": previous_status,
                 "current_status": post["status"],
                 "message": f"文章已下线，当前状态：{status_names.get(target_status, target_status)}"
             }
         }
     
+    _forget_status(post_id)
     return result
 
 
+def _find_post_views(
+    top_posts_data: dict,
+    post_id: int,
+    include_daily_breakdown: bool = False
+) -> Tuple[int, str, List[Dict[str, Any]]]:
+    """
+    在 top-posts 响应中查找单篇文章的浏览量
+    
+    Returns:
+        (总浏览量, 数据来源, 每日明细)
+    """
+    total_views = 0
+    views_source = "unavailable"
+    daily_views = []
+    
+    # 从 summary.postviews 中查找
+    if "summary" in top_posts_data and "postviews" in top_posts_data["summary"]:
+        for p in top_posts_data["summary"]["postviews"]:
+            if isinstance(p, dict) and p.get("id") == post_id:
+                total_views = p.get("views", 0)
+                views_source = "top-posts-summary"
+                break
+    
+    # 从 days 中累加（days 是一个 dict，key 是日期字符串）
+    if "days" in top_posts_data and isinstance(top_posts_data["days"], dict):
+        for day_date, day_info in top_posts_data["days"].items():
+            if isinstance(day_info, dict) and "postviews" in day_info:
+                for p in day_info["postviews"]:
+                    if isinstance(p, dict) and p.get("id") == post_id:
+                        views = p.get("views", 0)
+                        total_views += views
+                        if include_daily_breakdown:
+                            daily_views.append({"date": day_date, "views": views})
+        
+        if total_views > 0:
+            views_source = "top-posts"
+    
+    return total_views, views_source, daily_views
+
+
 def get_article_metrics(
     post_id: int,
     days: int = 30,
-    include_daily_breakdown: bool = False
+    include_daily_breakdown: bool = False,
+    use_warehouse: bool = None,
+    granularity: str = "auto"
 ) -> dict:
     """
     获取文章表现指标
@@ -502,9 +1083,21 @@ def get_article_metrics(
     1. /posts/{id} - 文章基本信息（likes, comments）
     2. /stats/top-posts - 热门文章浏览量
     3. /stats/summary - 站点汇总统计
+    
+    开启本地仓库（use_warehouse=True 或 CMS_WAREHOUSE=1）时，第 2 步改为增量同步
+    本地每日浏览量仓库并在本地查询，不受 top-posts 最多 100 篇的限制。
+    
+    明细按 granularity（day / week / month，auto 按天数选择）合并，
+    以 daily_breakdown / weekly_breakdown / monthly_breakdown 返回。
+    
+    有时间预算（cms_deadline）时，剩余时间不足的浏览量、站点统计子请求会被跳过，
+    返回已获取的部分并标记 data.partial / data.skipped。
     """
     # 限制天数范围
     days = min(max(1, days), 365)
+    if granularity not in GRANULARITIES and granularity != "auto":
+        return {"success": False, "error": f"无效的时间粒度: {granularity}"}
+    granularity = resolve_granularity(days, granularity)
     
     # 1. 获取文章基本信息
     post_result = _make_request("GET", f"/sites/{WP_SITE_ID}/posts/{post_id}")
@@ -513,53 +1106,50 @@ def get_article_metrics(
         return post_result
     
     post = post_result["data"]
+    _remember_status(post)
     
     # 2. 尝试从 top-posts 获取浏览量
     total_views = 0
     views_source = "unavailable"
     daily_views = []
+    skipped: List[str] = []
     
-    # 方法 A: 从 top-posts 端点查找
-    top_posts_params = {
-        "num": days,
-        "max": 100  # 获取更多文章以增加找到目标文章的概率
-    }
-    
-    top_posts_result = _make_request(
-        "GET",
-        f"/sites/{WP_SITE_ID}/stats/top-posts",
-        params=top_posts_params
-    )
-    
-    if top_posts_result["success"]:
-        # 在 top-posts 结果中查找目标文章
-        top_posts_data = top_posts_result["data"]
+    if _use_warehouse(use_warehouse):
+        # 本地仓库：只同步缺少的日期，浏览量查询在本地完成
+        warehouse = _get_warehouse()
+        failed = _sync_warehouse(warehouse, days, skipped)
+        if failed:
+            return failed
+        total_views = warehouse.post_total_views(post_id, days)
+        if total_views > 0:
+            views_source = "warehouse"
+            if include_daily_breakdown:
+                # 按周/按月时直接读取汇总表
+                daily_views = warehouse.post_views_series(post_id, days, granularity)
+    else:
+        # 方法 A: 从 top-posts 端点查找
+        top_posts_params = {
+            "num": days,
+            "max": 100  # 获取更多文章以增加找到目标文章的概率
+        }
         
-        # 从 summary.postviews 中查找
-        if "summary" in top_posts_data and "postviews" in top_posts_data["summary"]:
-            for p in top_posts_data["summary"]["postviews"]:
-                if isinstance(p, dict) and p.get("id") == post_id:
-                    total_views = p.get("views", 0)
-                    views_source = "top-posts-summary"
-                    break
+        top_posts_result = _optional_request(
+            "top_posts", skipped,
+            "GET",
+            f"/sites/{WP_SITE_ID}/stats/top-posts",
+            params=top_posts_params
+        )
         
-        # 从 days 中累加（days 是一个 dict，key 是日期字符串）
-        if "days" in top_posts_data and isinstance(top_posts_data["days"], dict):
-            for day_date, day_info in top_posts_data["days"].items():
-                if isinstance(day_info, dict) and "postviews" in day_info:
-                    for p in day_info["postviews"]:
-                        if isinstance(p, dict) and p.get("id") == post_id:
-                            views = p.get("views", 0)
-                            total_views += views
-                            if include_daily_breakdown:
-                                daily_views.append({"date": day_date, "views": views})
-            
-            if total_views > 0:
-                views_source = "top-posts"
+        if top_posts_result["success"]:
+            with span("parse.post_views"):
+                total_views, views_source, daily_views = _find_post_views(
+                    top_posts_result["data"], post_id, include_daily_breakdown
+                )
     
     # 方法 B: 如果 top-posts 没找到，尝试 stats/post/{id}（某些站点可用）
     if total_views == 0:
-        post_stats_result = _make_request(
+        post_stats_result = _optional_request(
+            "post_stats", skipped,
             "GET",
             f"/sites/{WP_SITE_ID}/stats/post/{post_id}"
         )
@@ -576,7 +1166,7 @@ def get_article_metrics(
     
     # 3. 获取站点整体统计作为参考
     site_stats = {}
-    summary_result = _make_request("GET", f"/sites/{WP_SITE_ID}/stats/summary")
+    summary_result = _optional_request("site_summary", skipped, "GET", f"/sites/{WP_SITE_ID}/stats/summary")
     if summary_result["success"]:
         site_stats = {
             "site_views_today": summary_result["data"].get("views", 0),
@@ -620,9 +1210,11 @@ def get_article_metrics(
         }
     }
     
-    # 添加每日明细
+    # 添加明细（按粒度合并）
     if include_daily_breakdown and daily_views:
-        metrics["data"]["daily_breakdown"] = sorted(daily_views, key=lambda x: x["date"], reverse=True)
+        label = {"day": "daily", "week": "weekly", "month": "monthly"}[granularity]
+        metrics["data"][f"{label}_breakdown"] = downsample(daily_views, granularity)
+        metrics["data"]["dates"]["granularity"] = granularity
     
     # 计算平均值
     if days > 0 and total_views > 0:
@@ -630,11 +1222,35 @@ def get_article_metrics(
     
     # 如果无法获取浏览量，添加说明
     if total_views == 0:
-        metrics["data"]["metrics"]["note"] = "浏览量数据暂不可用（文章可能太新或尚无访问）"
+        if "post_stats" in skipped:
+            metrics["data"]["metrics"]["note"] = "时间预算不足，浏览量数据未获取"
+        else:
+            metrics["data"]["metrics"]["note"] = "浏览量数据暂不可用（文章可能太新或尚无访问）"
     
+    mark_partial(metrics["data"], skipped)
     return metrics
 
 
+def _build_views_map(top_data: dict) -> Dict[int, int]:
+    """从 top-posts 响应构建 post_id -> 浏览量 映射"""
+    views_map = {}
+    # 从 summary 中提取
+    if "summary" in top_data and "postviews" in top_data["summary"]:
+        for p in top_data["summary"]["postviews"]:
+            views_map[p.get("id")] = p.get("views", 0)
+    # 从 days 中累加
+    if "days" in top_data and isinstance(top_data["days"], dict):
+        for date_str, day_info in top_data["days"].items():
+            if isinstance(day_info, dict) and "postviews" in day_info:
+                for p in day_info["postviews"]:
+                    if isinstance(p, dict):
+                        pid = p.get("id")
+                        views = p.get("views", 0)
+                        if pid:
+                            views_map[pid] = views_map.get(pid, 0) + views
+    return views_map
+
+
 def list_articles_by_topic(
     category: str = None,
     tag: str = None,
@@ -650,7 +1266,7 @@ def list_articles_by_topic(
     资产盘点 - 按条件列出文章
     
     Args:
-        include_views: 是否包含浏览量数据（从 top-posts 获取）
+        include_views: 是否包含浏览量数据（从 top-posts 获取；时间预算不足时跳过并标记 data.partial）
     """
     # 限制返回数量
     number = min(max(1, number), 100)
@@ -685,30 +1301,20 @@ def list_articles_by_topic(
     
     # 获取浏览量数据
     views_map = {}
+    skipped: List[str] = []
     if include_views:
-        top_posts_result = _make_request(
+        top_posts_result = _optional_request(
+            "views", skipped,
             "GET",
             f"/sites/{WP_SITE_ID}/stats/top-posts",
             params={"num": 30, "max": 100}
         )
         
         if top_posts_result["success"]:
-            top_data = top_posts_result["data"]
-            # 从 summary 中提取
-            if "summary" in top_data and "postviews" in top_data["summary"]:
-                for p in top_data["summary"]["postviews"]:
-                    views_map[p.get("id")] = p.get("views", 0)
-            # 从 days 中累加
-            if "days" in top_data and isinstance(top_data["days"], dict):
-                for date_str, day_info in top_data["days"].items():
-                    if isinstance(day_info, dict) and "postviews" in day_info:
-                        for p in day_info["postviews"]:
-                            if isinstance(p, dict):
-                                    pid = p.get("id")
-                                    views = p.get("views", 0)
-                                    if pid:
-                                        views_map[pid] = views_map.get(pid, 0) + views
-                
+            with span("parse.views_map") as trace:
+                views_map = _build_views_map(top_posts_result["data"])
+                trace.set_attribute("posts", len(views_map))
+    
     # 处理文章列表
     articles = []
     status_counts = {"publish": 0, "draft": 0, "private": 0, "future": 0}
@@ -717,6 +1323,7 @@ def list_articles_by_topic(
     total_comments = 0
     
     for post in posts:
+        _remember_status(post)
         post_status = post.get("status", "unknown")
         if post_status in status_counts:
             status_counts[post_status] += 1
@@ -754,7 +1361,7 @@ def list_articles_by_topic(
     # 构建汇总信息
     return {
         "success": True,
-        "data": {
+        "data": mark_partial({
             # 筛选条件
             "filters": {
                 "category": category,
@@ -782,34 +1389,66 @@ def list_articles_by_topic(
             
             # 文章列表
             "articles": articles
-        }
+        }, skipped)
     }
 
 
-def get_site_stats(days: int = 7) -> dict:
+def get_site_stats(days: int = 7, use_warehouse: bool = None, granularity: str = None) -> dict:
     """
     获取站点整体统计数据
     
     Args:
         days: 统计天数
+        use_warehouse: 是否从本地每日浏览量仓库计算热门文章（默认由 CMS_WAREHOUSE 决定）
+        granularity: 浏览量走势的粒度 day / week / month / auto；不传时不返回走势
     
     Returns:
-        站点浏览量、访客数、热门文章等数据
+        站点浏览量、访客数、热门文章等数据；有时间预算时剩余时间不足的子请求被跳过，
+        data.partial / data.skipped 标明缺少的部分
     """
     days = min(max(1, days), 365)
+    if granularity is not None:
+        if granularity not in GRANULARITIES and granularity != "auto":
+            return {"success": False, "error": f"无效的时间粒度: {granularity}"}
+        granularity = resolve_granularity(days, granularity)
+    warehouse = _get_warehouse() if _use_warehouse(use_warehouse) else None
+    
+    skipped: List[str] = []
     
     # 1. 获取站点汇总
-    summary_result = _make_request("GET", f"/sites/{WP_SITE_ID}/stats/summary")
+    summary_result = _optional_request("today", skipped, "GET", f"/sites/{WP_SITE_ID}/stats/summary")
     
-    # 2. 获取热门文章
-    top_posts_result = _make_request(
-        "GET",
-        f"/sites/{WP_SITE_ID}/stats/top-posts",
-        params={"num": days, "max": 10}
-    )
+    # 2. 获取热门文章（开启仓库时增量同步后在本地统计）
+    top_posts_result = {"success": False}
+    if warehouse:
+        failed = _sync_warehouse(warehouse, days, skipped)
+        if failed:
+            return failed
+    else:
+        top_posts_result = _optional_request(
+            "top_posts", skipped,
+            "GET",
+            f"/sites/{WP_SITE_ID}/stats/top-posts",
+            # summary.postviews 只在 summarize=1 时返回
+            params={"num": days, "max": 10, "summarize": 1}
+        )
     
     # 3. 获取站点基本信息
-    site_result = _make_request("GET", f"/sites/{WP_SITE_ID}")
+    site_result = _optional_request("site_info", skipped, "GET", f"/sites/{WP_SITE_ID}")
+    
+    # 4. 浏览量走势（仓库读取周/月汇总表；否则由 stats/visits 按粒度返回）
+    visits_result = {"success": False}
+    if granularity and not warehouse:
+        visits_result = _optional_request(
+            "views_series", skipped,
+            "GET",
+            f"/sites/{WP_SITE_ID}/stats/visits",
+            params={
+                "unit": granularity,
+                "quantity": {"day": days, "week": -(-days // 7), "month": -(-days // 30)}[granularity],
+                "stat_fields": "views,visitors"
+            }
+        )
     
     # 构建返回数据
     data = {
@@ -829,7 +1468,25 @@ def get_site_stats(days: int = 7) -> dict:
             "followers": s.get("followers", 0)
         }
     
-    if top_posts_result["success"]:
+    if warehouse:
+        data["top_posts"] = warehouse.top_posts(days, limit=10)
+        series = warehouse.site_views_series(days, granularity or resolve_granularity(days))
+        data["period_views"] = sum(d["views"] for d in series)
+        if granularity:
+            data["granularity"] = granularity
+            data["views_series"] = series
+    elif visits_result["success"]:
+        v = visits_result["data"]
+        fields = v.get("fields", [])
+        if "period" in fields and "views" in fields:
+            i_period, i_views = fields.index("period"), fields.index("views")
+            data["granularity"] = granularity
+            data["views_series"] = [
+                {"date": row[i_period], "views": row[i_views] or 0}
+                for row in reversed(v.get("data", []))
+            ]
+    
+    if not warehouse and top_posts_result["success"]:
         top_data = top_posts_result["data"]
         if "summary" in top_data and "postviews" in top_data["summary"]:
             for p in top_data["summary"]["postviews"][:10]:
@@ -851,7 +1508,7 @@ def get_site_stats(days: int = 7) -> dict:
     
     return {
         "success": True,
-        "data": data
+        "data": mark_partial(data, skipped)
     }
 
 
@@ -866,8 +1523,15 @@ GET_SITE_STATS_TOOL = {
             "properties": {
                 "days": {
                     "type": "integer",
+                    "minimum": 1,
+                    "maximum": 365,
                     "description": "统计天数（默认 7 天）",
                     "default": 7
+                },
+                "granularity": {
+                    "type": "string",
+                    "enum": ["auto", "day", "week", "month"],
+                    "description": "同时返回浏览量走势，并按此粒度合并（auto：31 天以内按天，180 天以内按周，更长按月）"
                 }
             }
         }
@@ -875,6 +1539,517 @@ GET_SITE_STATS_TOOL = {
 }
 
 
+# 媒体去重索引中的 namespace
+_MEDIA_NAMESPACE = "media"
+# 同一内容同时只允许一个上传，避免并发上传重复文件；key -> [锁, 引用数]，没有线程引用时才删除
+_MEDIA_UPLOAD_LOCKS: Dict[str, list] = {}
+_MEDIA_UPLOAD_LOCKS_LOCK = threading.Lock()
+
+
+def _upload_one(source, name: str = None) -> dict:
+    """上传单个媒体文件（按内容哈希去重）；本地路径须位于 CMS_MEDIA_ROOT 内"""
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            source = resolve_media_path(source)
+        media = MediaFile(source, name=name)
+    except MediaPathError as e:
+        return {"success": False, "error": str(e)}
+    except OSError as e:
+        return {"success": False, "error": f"读取文件失败: {str(e)}"}
+    
+    key = f"{WP_SITE_ID}:{media.sha256}"
+    with _MEDIA_UPLOAD_LOCKS_LOCK:
+        entry = _MEDIA_UPLOAD_LOCKS.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    lock = entry[0]
+    
+    try:
+        lock.acquire()
+        index = get_default_index()
+        with span("cache.lookup", cache="media") as trace:
+            existing = index.get(_MEDIA_NAMESPACE, key)
+            trace.set_attribute("outcome", "hit" if existing else "miss")
+        METRICS.record_cache("media", bool(existing))
+        if existing:
+            return {"success": True, "data": {**existing, "deduplicated": True}}
+        
+        stream = MultipartStream([("media[]", media)])
+        result = _make_request(
+            "POST",
+            f"/sites/{WP_SITE_ID}/media/new",
+            body=stream,
+            content_type=stream.content_type,
+            timeout=CMS_UPLOAD_TIMEOUT
+        )
+        if not result["success"]:
+            return result
+        
+        uploaded = result["data"].get("media", [])
+        if not uploaded:
+            errors = result["data"].get("errors") or [{"message": "未返回媒体信息"}]
+            return {"success": False, "error": errors[0].get("message", str(errors[0]))}
+        
+        item = uploaded[0]
+        data = {
+            "media_id": item["ID"],
+            "url": item.get("URL", ""),
+            "file": item.get("file", media.name),
+            "mime_type": item.get("mime_type", media.mime_type),
+            "size": media.size,
+            "sha256": media.sha256
+        }
+        index.put(_MEDIA_NAMESPACE, key, data)
+        return {"success": True, "data": data}
+    finally:
+        lock.release()
+        with _MEDIA_UPLOAD_LOCKS_LOCK:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _MEDIA_UPLOAD_LOCKS[key]
+        media.close()
+
+
+def upload_media(
+    files: List[Any],
+    concurrency: int = 4
+) -> dict:
+    """
+    上传媒体文件到媒体库（/media/new）
+    
+    文件以流式 multipart 分块发送，不会整体读入内存；已上传过的相同内容
+    （按 sha256 判断）直接返回本地索引中记录的附件，不再上传。
+    返回的 media_id 可直接作为 create_article 的 featured_image。
+    
+    Args:
+        files: 本地文件路径、二进制文件对象或 (文件名, 文件对象) 元组列表；
+            路径相对于 CMS_MEDIA_ROOT，解析符号链接后须在该目录内，未配置时路径一律拒绝
+        concurrency: 并发上传数
+    
+    Returns:
+        {
+            "success": True,
+            "data": {
+                "media": [{"source": "...", "media_id": 123, "url": "...", "deduplicated": False}, ...],
+                "failed": [{"source": "...", "error": "..."}]
+            }
+        }
+    """
+    def upload(item) -> dict:
+        if isinstance(item, tuple):
+            name, fileobj = item
+            return _upload_one(fileobj, name=name)
+        return _upload_one(item)
+    
+    def describe(item) -> str:
+        if isinstance(item, tuple):
+            return item[0]
+        return os.fspath(item) if isinstance(item, (str, os.PathLike)) else getattr(item, "name", repr(item))
+    
+    media = []
+    failed = []
+    concurrency = min(max(1, concurrency), 16)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for item, result in zip(files, executor.map(bind_context(upload), files)):
+            if result["success"]:
+                media.append({"source": describe(item), "deduplicated": False, **result["data"]})
+            else:
+                failed.append({"source": describe(item), "error": result.get("error")})
+    
+    response = {"success": not failed, "data": {"media": media, "failed": failed}}
+    if failed:
+        response["error"] = f"{len(failed)} 个文件上传失败"
+    return response
+
+
+def _iter_posts(
+    category: str = None,
+    tag: str = None,
+    status: str = "any",
+    search: str = None,
+    fields: str = "ID,status,title",
+    page_size: int = 100
+):
+    """
+    按筛选条件逐页遍历文章（生成器，只请求需要的字段）
+    
+    使用 page_handle 游标翻页：批量修改状态时结果集会变化，按页码翻页会漏掉文章。
+    遇到错误时抛出 RuntimeError。
+    """
+    params = {
+        "number": page_size,
+        "status": status or "any",
+        "order_by": "date",
+        "order": "DESC",
+        "fields": fields
+    }
+    if category:
+        params["category"] = category
+    if tag:
+        params["tag"] = tag
+    if search:
+        params["search"] = search
+    
+    page = 1
+    while True:
+        result = _make_request("GET", f"/sites/{WP_SITE_ID}/posts/", params=params)
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+        
+        posts = result["data"].get("posts", [])
+        for post in posts:
+            yield post
+        
+        next_page = result["data"].get("meta", {}).get("next_page")
+        if next_page:
+            params["page_handle"] = next_page
+        elif len(posts) == page_size:
+            page += 1
+            params["page"] = page
+        else:
+            break
+
+
+def bulk_update_status(
+    target_status: str,
+    category: str = None,
+    tag: str = None,
+    status: str = "any",
+    search: str = None,
+    concurrency: int = 8,
+    dry_run: bool = False,
+    limit: int = None,
+    progress_callback=None
+) -> dict:
+    """
+    批量修改文章状态（批量上线/下线/移至回收站）
+    
+    筛选条件与 list_articles_by_topic 相同。匹配的文章边翻页边提交，
+    最多同时进行 concurrency 个修改请求。
+    
+    Args:
+        target_status: 目标状态 (publish/draft/private/trash)
+        concurrency: 并发请求数（1-32）
+        dry_run: 只列出将被修改的文章，不实际修改
+        limit: 最多处理的文章数
+        progress_callback: 进度回调 callback(processed, matched)
+    """
+    concurrency = min(max(1, concurrency), 32)
+    started = time.time()
+    
+    matched = 0
+    processed = 0
+    skipped = 0
+    changed = []
+    failed = []
+    lock = threading.Lock()
+    
+    def apply(post: dict) -> dict:
+        if target_status == "publish":
+            return publish_article(post["ID"])
+        return unpublish_article(post["ID"], target_status=target_status, previous_status=post.get("status"))
+    
+    def on_done(post: dict, result: dict) -> None:
+        nonlocal processed
+        with lock:
+            processed += 1
+            if result["success"]:
+                changed.append({
+                    "post_id": post["ID"],
+                    "previous_status": post.get("status"),
+                    "current_status": result["data"].get("status", result["data"].get("current_status"))
+                })
+            else:
+                failed.append({"post_id": post["ID"], "error": result.get("error")})
+            if progress_callback:
+                progress_callback(processed, matched)
+    
+    list_error = None
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        try:
+            for post in _iter_posts(category=category, tag=tag, status=status, search=search):
+                if limit is not None and matched >= limit:
+                    break
+                _remember_status(post)
+                matched += 1
+                
+                if post.get("status") == target_status:
+                    skipped += 1
+                    continue
+                
+                if dry_run:
+                    changed.append({
+                        "post_id": post["ID"],
+                        "title": post.get("title", ""),
+                        "previous_status": post.get("status"),
+                        "current_status": target_status
+                    })
+                    continue
+                
+                # 控制在途请求数，避免把整个结果集一次性提交到线程池
+                if len(pending) >= concurrency * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        on_done(pending.pop(future), future.result())
+                
+                pending[executor.submit(bind_context(apply), post)] = post
+        except RuntimeError as e:
+            list_error = str(e)
+        
+        # 列表中途出错时已提交的修改仍会完成：等待并计入结果
+        for future in list(pending):
+            on_done(pending.pop(future), future.result())
+    
+    if list_error:
+        return {
+            "success": False,
+            "error": f"获取文章列表失败: {list_error}",
+            "data": {"processed": processed, "changed": len(changed), "failed": failed}
+        }
+    
+    return {
+        "success": len(failed) == 0,
+        "data": {
+            "target_status": target_status,
+            "dry_run": dry_run,
+            "filters": {
+                "category": category,
+                "tag": tag,
+                "status": status,
+                "search": search
+            },
+            "matched": matched,
+            "skipped": skipped,
+            "changed": len(changed),
+            "failed": len(failed),
+            "elapsed_seconds": round(time.time() - started, 2),
+            "posts": changed,
+            "failures": failed
+        },
+        **({"error": f"{len(failed)} 篇文章修改失败"} if failed else {})
+    }
+
+
+# 文章 → 分类/标签 的归属缓存（按分组方式缓存，避免每次分析都遍历全部文章）
+_TOPIC_GROUPS_CACHE: Dict[str, Tuple[float, Dict[str, List[int]]]] = {}
+_TOPIC_GROUPS_CACHE_LOCK = threading.Lock()
+_TOPIC_GROUPS_TTL = 600
+
+
+def _topic_groups(group_by: str) -> Dict[str, List[int]]:
+    """返回 {分类/标签名称: [post_id, ...]}"""
+    key = f"{WP_SITE_ID}:{group_by}"
+    with _TOPIC_GROUPS_CACHE_LOCK:
+        cached = _TOPIC_GROUPS_CACHE.get(key)
+    if cached and time.time() - cached[0] < _TOPIC_GROUPS_TTL:
+        return cached[1]
+
+    field = "categories" if group_by == "category" else "tags"
+    groups: Dict[str, List[int]] = {}
+    for post in _iter_posts(status="publish", fields=f"ID,{field}"):
+        for name in (post.get(field) or {}):
+            groups.setdefault(name, []).append(post["ID"])
+
+    with _TOPIC_GROUPS_CACHE_LOCK:
+        _TOPIC_GROUPS_CACHE[key] = (time.time(), groups)
+    return groups
+
+
+def get_topic_trends(
+    group_by: str = "category",
+    days: int = 30,
+    window: int = 7,
+    top_n: int = 10,
+    use_warehouse: bool = None
+) -> dict:
+    """
+    按分类/标签分析浏览量趋势
+    
+    把每日浏览量装载成 天数 × 文章 的矩阵后做向量化汇总（见 cms_analytics）。
+    
+    Args:
+        group_by: 分组方式 category / tag
+        days: 统计天数（1-365）
+        window: 滚动窗口天数（增长率比较最近窗口与上一窗口）
+        top_n: 返回的分组数和涨跌文章数
+        use_warehouse: 是否从本地每日浏览量仓库读取（默认由 CMS_WAREHOUSE 决定）
+    
+    Returns:
+        各分组的总浏览量/滚动平均/增长率/半衰期、涨跌幅最大的文章、文章浏览量分位数
+    """
+    # numpy 只在需要分析时才导入
+    from cms_analytics import ViewsMatrix, topic_trends
+    
+    if group_by not in ("category", "tag"):
+        return {"success": False, "error": f"无效的分组方式: {group_by}"}
+    days = min(max(1, days), 365)
+    window = min(max(1, window), days)
+    
+    skipped: List[str] = []
+    if _use_warehouse(use_warehouse):
+        warehouse = _get_warehouse()
+        failed = _sync_warehouse(warehouse, days, skipped)
+        if failed:
+            return failed
+        matrix = ViewsMatrix.from_warehouse(warehouse, days)
+        source = "warehouse"
+    else:
+        top_posts_result = _make_request(
+            "GET",
+            f"/sites/{WP_SITE_ID}/stats/top-posts",
+            params={"num": days, "max": 0}
+        )
+        if not top_posts_result["success"]:
+            return {"success": False, "error": f"获取浏览量数据失败: {top_posts_result['error']}"}
+        matrix = ViewsMatrix.from_top_posts(top_posts_result["data"])
+        source = "top_posts"
+    
+    try:
+        groups = _topic_groups(group_by)
+    except RuntimeError as e:
+        return {"success": False, "error": f"获取文章{'分类' if group_by == 'category' else '标签'}失败: {e}"}
+    
+    trends = topic_trends(matrix, groups, window=window, top_n=top_n)
+    return {
+        "success": True,
+        "data": mark_partial({
+            "group_by": group_by,
+            "period": f"最近 {days} 天",
+            "window": window,
+            "views_source": source,
+            "posts_tracked": len(matrix.post_ids),
+            **trends
+        }, skipped)
+    }
+
+
+# 添加 get_topic_trends 的 Tool Schema
+GET_TOPIC_TRENDS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "get_topic_trends",
+        "description": "按分类或标签分析浏览量趋势：总浏览量、滚动平均、增长率（最近窗口 vs 上一窗口）、衰减半衰期，以及涨跌幅最大的文章和浏览量分位数。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "group_by": {
+                    "type": "string",
+                    "enum": ["category", "tag"],
+                    "description": "分组方式：category=按分类，tag=按标签（默认 category）",
+                    "default": "category"
+                },
+                "days": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 365,
+                    "description": "统计天数（默认 30，最多 365）",
+                    "default": 30
+                },
+                "window": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 365,
+                    "description": "滚动窗口天数（默认 7）",
+                    "default": 7
+                },
+                "top_n": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 100,
+                    "description": "返回的分组数和涨跌文章数（默认 10）",
+                    "default": 10
+                }
+            }
+        }
+    }
+}
+
+
+# 添加 upload_media 的 Tool Schema
+UPLOAD_MEDIA_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "upload_media",
+        "description": "上传本地图片等媒体文件到媒体库。相同内容的文件只上传一次。返回的 media_id 可直接作为 create_article 的 featured_image。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "files": {
+                    "type": "array",
+                    "minItems": 1,
+                    "items": {"type": "string"},
+                    "description": "媒体根目录（CMS_MEDIA_ROOT）下的文件路径列表（相对路径相对于根目录）"
+                },
+                "concurrency": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 16,
+                    "description": "并发上传数（默认 4）",
+                    "default": 4
+                }
+            },
+            "required": ["files"]
+        }
+    }
+}
+
+
+# 添加 bulk_update_status 的 Tool Schema
+BULK_UPDATE_STATUS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "bulk_update_status",
+        "description": "批量修改文章状态。按分类/标签/状态/关键词筛选文章，批量发布、转为草稿、私密或移至回收站。建议先用 dry_run=true 预览。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "target_status": {
+                    "type": "string",
+                    "enum": ["publish", "draft", "private", "trash"],
+                    "description": "目标状态：publish=发布，draft=草稿，private=私密，trash=回收站"
+                },
+                "category": {
+                    "type": "string",
+                    "description": "按分类筛选（如 '技术'）"
+                },
+                "tag": {
+                    "type": "string",
+                    "description": "按标签筛选（如 'Python'）"
+                },
+                "status": {
+                    "type": "string",
+                    "enum": ["publish", "draft", "private", "any"],
+                    "description": "按当前状态筛选（默认 any）",
+                    "default": "any"
+                },
+                "search": {
+                    "type": "string",
+                    "description": "搜索关键词（在标题和内容中搜索）"
+                },
+                "concurrency": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 32,
+                    "description": "并发请求数（默认 8，最多 32）",
+                    "default": 8
+                },
+                "dry_run": {
+                    "type": "boolean",
+                    "description": "只预览将被修改的文章，不实际修改（默认 false）",
+                    "default": False
+                },
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "最多处理的文章数（可选）"
+                }
+            },
+            "required": ["target_status"]
+        }
+    }
+}
+
+
 # ============================================================
 # Tool 注册表
 # ============================================================
@@ -887,6 +2062,9 @@ CMS_TOOLS_SCHEMA = [
     GET_ARTICLE_METRICS_TOOL,
     LIST_ARTICLES_BY_TOPIC_TOOL,
     GET_SITE_STATS_TOOL,
+    BULK_UPDATE_STATUS_TOOL,
+    UPLOAD_MEDIA_TOOL,
+    GET_TOPIC_TRENDS_TOOL,
 ]
 
 CMS_TOOLS_FUNCTIONS = {
@@ -897,27 +2075,167 @@ CMS_TOOLS_FUNCTIONS = {
     "get_article_metrics": get_article_metrics,
     "list_articles_by_topic": list_articles_by_topic,
     "get_site_stats": get_site_stats,
+    "bulk_update_status": bulk_update_status,
+    "upload_media": upload_media,
+    "get_topic_trends": get_topic_trends,
 }
 
+# 参数校验函数（由 schema 预先编译，调用前检查）
+CMS_TOOLS_VALIDATORS = compile_validators(CMS_TOOLS_SCHEMA, CMS_TOOLS_FUNCTIONS)
+
+if CMS_METRICS_PORT:
+    start_metrics_server(CMS_METRICS_PORT)
+
 
 # ============================================================
 # 便捷函数
 # ============================================================
 
-def execute_cms_tool(tool_name: str, arguments: dict) -> dict:
+def execute_cms_tool(
+    tool_name: str,
+    arguments: dict,
+    compact: bool = None,
+    max_bytes: int = None,
+    max_tokens: int = None,
+    deadline: float = None
+) -> dict:
     """
     执行 CMS Tool
+    
+    参数先按 CMS_TOOLS_SCHEMA 校验（类型、枚举、必填、范围），不合法时返回
+    {"success": False, "error": ..., "validation_errors": [{"field", "error", "message", ...}]}。
+    
+    Args:
+        compact: 是否压缩结果（删除空字段、表格化、截短文本、汇总超出部分），
+                 默认由 CMS_COMPACT_OBSERVATIONS 决定
+        max_bytes: 压缩后的字节预算（默认 CMS_OBSERVATION_MAX_BYTES）
+        max_tokens: 压缩后的 token 预算（指定时优先于 max_bytes）
+        deadline: 本次调用的总时间预算（秒，默认 CMS_TOOL_DEADLINE），所有子请求共用；
+                  外层已有预算（tool_deadline 上下文、批量执行）时取更早的截止时间
     """
     if tool_name not in CMS_TOOLS_FUNCTIONS:
         return {"success": False, "error": f"Unknown tool: {tool_name}"}
     
+    with span("cms.tool", tool=tool_name, site=WP_SITE_ID) as trace, maybe_profile(tool_name), \
+            tool_deadline(deadline if deadline is not None else CMS_TOOL_DEADLINE):
+        result = _execute_cms_tool(tool_name, arguments, compact, max_bytes, max_tokens)
+        success = isinstance(result, dict) and result.get("success", False)
+        trace.set_attribute("success", success)
+        if success and isinstance(result.get("data"), dict) and result["data"].get("partial"):
+            trace.set_attribute("partial", True)
+        if not success:
+            trace.set_error(str(result.get("error")) if isinstance(result, dict) else "invalid result")
+        return result
+
+
+def _execute_cms_tool(tool_name: str, arguments: dict, compact, max_bytes, max_tokens) -> dict:
+    # 参数不合法时直接返回结构化错误，不发出请求
+    validator = CMS_TOOLS_VALIDATORS.get(tool_name)
+    errors = validator(arguments) if validator else []
+    if errors:
+        return {"success": False, "error": format_errors(errors), "validation_errors": errors}
+    
     try:
         func = CMS_TOOLS_FUNCTIONS[tool_name]
-        return func(**arguments)
+        result = func(**arguments)
     except TypeError as e:
         return {"success": False, "error": f"参数错误: {str(e)}"}
     except Exception as e:
         return {"success": False, "error": f"执行错误: {str(e)}"}
+    
+    if compact if compact is not None else CMS_COMPACT_OBSERVATIONS:
+        with span("compact", max_bytes=max_bytes or CMS_OBSERVATION_MAX_BYTES):
+            result = compact_observation(
+                result,
+                max_bytes=max_bytes or CMS_OBSERVATION_MAX_BYTES,
+                max_tokens=max_tokens or CMS_OBSERVATION_MAX_TOKENS
+            )
+    return result
+
+
+# 只读工具：批量执行时可以并发
+READ_ONLY_TOOLS = {"get_article_metrics", "list_articles_by_topic", "get_site_stats", "get_topic_trends"}
+
+# 影响多篇文章的写操作：批量执行时与其它写操作互相排队
+_SITE_WIDE_WRITE_TOOLS = {"bulk_update_status"}
+
+_BATCH_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_BATCH_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    global _BATCH_EXECUTOR
+    with _BATCH_EXECUTOR_LOCK:
+        if _BATCH_EXECUTOR is None:
+            _BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=CMS_BATCH_WORKERS, thread_name_prefix="cms-batch")
+        return _BATCH_EXECUTOR
+
+
+def execute_cms_tools_batch(
+    calls: List[Union[Tuple[str, dict], dict]],
+    compact: bool = None,
+    max_bytes: int = None,
+    max_tokens: int = None,
+    deadline: float = None
+) -> List[Dict[str, Any]]:
+    """
+    批量执行 CMS Tool（模型在同一轮请求了多个工具时使用）
+    
+    所有调用提交到共享线程池并发执行，但保持以下顺序：
+    - 同一 post_id 的调用按原顺序执行（写操作完成后才读取/再次修改）
+    - bulk_update_status 等影响多篇文章的写操作，等之前的调用全部完成后才执行，之后的调用也等它完成
+    
+    Args:
+        calls: [(tool_name, arguments), ...] 或 [{"name": ..., "arguments": {...}}, ...]
+        compact / max_bytes / max_tokens: 同 execute_cms_tool
+        deadline: 整批调用的总时间预算（秒），所有调用共用同一个截止时间
+    
+    Returns:
+        与 calls 顺序一致的 [{"tool_name", "result", "elapsed_ms"}, ...]
+    """
+    executor = _get_batch_executor()
+    futures = []
+    last_by_post: Dict[Any, Any] = {}   # post_id -> 最后一个涉及该文章的调用
+    last_site_wide = None               # 最后一个全站写操作
+    
+    def run(tool_name: str, arguments: dict, depends_on: List[Any]) -> Dict[str, Any]:
+        for dep in depends_on:
+            dep.result()
+        started = time.perf_counter()
+        result = execute_cms_tool(tool_name, arguments, compact=compact, max_bytes=max_bytes, max_tokens=max_tokens)
+        return {
+            "tool_name": tool_name,
+            "result": result,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    with span("cms.batch", calls=len(calls)), tool_deadline(deadline):
+        for call in calls:
+            if isinstance(call, dict):
+                tool_name, arguments = call.get("name"), call.get("arguments") or {}
+            else:
+                tool_name, arguments = call
+                arguments = arguments or {}
+            post_id = arguments.get("post_id") if isinstance(arguments, dict) else None
+            is_write = tool_name in CMS_TOOLS_FUNCTIONS and tool_name not in READ_ONLY_TOOLS
+        
+            depends_on = []
+            if post_id is not None and post_id in last_by_post:
+                depends_on.append(last_by_post[post_id])
+            if is_write and tool_name in _SITE_WIDE_WRITE_TOOLS:
+                depends_on = list(futures)
+            elif last_site_wide is not None:
+                depends_on.append(last_site_wide)
+        
+            # 依赖的调用都已先提交，线程池按提交顺序调度，不会因互相等待而卡死
+            future = executor.submit(bind_context(run), tool_name, arguments, depends_on)
+            futures.append(future)
+            if post_id is not None:
+                last_by_post[post_id] = future
+            if is_write and tool_name in _SITE_WIDE_WRITE_TOOLS:
+                last_site_wide = future
+    
+        return [future.result() for future in futures]
 
 
 def get_cms_tool_names() -> List[str]:
@@ -0,0 +1,216 @@
+"""
+CMS Tracing - 工具调用的结构化追踪
+一次 execute_cms_tool 调用对应一个根 span，其下是每个 HTTP 请求、缓存查找和解析步骤的子 span：
+
+    cms.tool get_article_metrics          tool, site, success
+    ├── http GET /sites/{site}/posts/{id} endpoint, status, bytes_in, bytes_out
+    │   └── parse.json
+    ├── http GET /sites/{site}/stats/post/{id}
+    └── parse.views
+
+结束的 span 交给已注册的导出器（SpanExporter）；内置 JsonlSpanExporter 每个 span 写一行 JSON，
+便于离线分析。没有注册导出器时 span() 直接返回空操作对象，几乎没有开销。
+
+用法:
+    export CMS_TRACE_FILE=/tmp/cms_traces.jsonl     # 导入时自动注册 JSONL 导出器
+
+    from cms_tracing import add_exporter, JsonlSpanExporter
+    add_exporter(JsonlSpanExporter("/tmp/cms_traces.jsonl"))
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import contextvars
+from typing import Optional, List, Dict, Any, Callable
+
+CMS_TRACE_FILE = os.getenv("CMS_TRACE_FILE", "")
+
+_CURRENT_SPAN: contextvars.ContextVar = contextvars.ContextVar("cms_current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """一个计时区间；作为上下文管理器使用，退出时结束并导出"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start_time", "_started", "duration_ms", "status", "error", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Dict[str, Any] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else _new_id(128)
+        self.span_id = _new_id(64)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_error(self, error: str) -> None:
+        self.status = "error"
+        self.error = error
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    def __enter__(self) -> "Span":
+        self._token = _CURRENT_SPAN.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        if exc is not None:
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        _CURRENT_SPAN.reset(self._token)
+        for exporter in _EXPORTERS:
+            try:
+                exporter.export(self)
+            except Exception:
+                # 导出失败不影响工具调用
+                pass
+        return False
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空 span"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_error(self, error: str) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# ============================================================
+# 导出器
+# ============================================================
+
+class SpanExporter:
+    """导出器接口：export() 在 span 结束时调用（可能来自多个线程），shutdown() 释放资源"""
+
+    def export(self, span: Span) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonlSpanExporter(SpanExporter):
+    """每个 span 追加一行 JSON 到文件"""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_EXPORTERS: List[SpanExporter] = []
+_EXPORTERS_LOCK = threading.Lock()
+
+
+def add_exporter(exporter: SpanExporter) -> SpanExporter:
+    """注册导出器（注册后追踪即开启）"""
+    global _EXPORTERS
+    with _EXPORTERS_LOCK:
+        # 整体替换列表，导出时遍历的列表不会被并发修改
+        _EXPORTERS = _EXPORTERS + [exporter]
+    return exporter
+
+
+def remove_exporter(exporter: SpanExporter) -> None:
+    """移除导出器并调用其 shutdown()"""
+    global _EXPORTERS
+    with _EXPORTERS_LOCK:
+        _EXPORTERS = [e for e in _EXPORTERS if e is not exporter]
+    exporter.shutdown()
+
+
+def tracing_enabled() -> bool:
+    return bool(_EXPORTERS)
+
+
+# ============================================================
+# 创建 span
+# ============================================================
+
+def span(name: str, **attributes):
+    """
+    创建当前 span 的子 span（没有当前 span 时为根 span）
+
+    with span("http", method="GET") as s:
+        ...
+        s.set_attribute("status", 200)
+    """
+    if not _EXPORTERS:
+        return _NOOP_SPAN
+    return Span(name, _CURRENT_SPAN.get(), attributes)
+
+
+def current_span():
+    """当前 span（没有时返回空 span，可以直接调用 set_attribute）"""
+    return _CURRENT_SPAN.get() or _NOOP_SPAN
+
+
+def bind_context(fn: Callable) -> Callable:
+    """
+    把当前上下文绑定到函数上：提交到线程池后子 span 仍挂在当前 span 下，
+    时间预算（cms_deadline）也随之生效
+    """
+    context = contextvars.copy_context()
+    # 每次调用使用副本：同一个 Context 不能同时在多个线程中进入
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+if CMS_TRACE_FILE:
+    add_exporter(JsonlSpanExporter(CMS_TRACE_FILE))
@@ -0,0 +1,171 @@
+"""
+CMS Validation - 工具参数校验
+把 CMS_TOOLS_SCHEMA 中的 JSON Schema 预先编译成校验函数，在调用工具之前检查参数，
+错误参数在本地立即返回结构化错误，不会发出网络请求
+
+支持的约束：type（可为列表）、enum、required、minimum/maximum、minLength/maxLength、
+数组的 items/minItems/maxItems，以及未知参数检查
+"""
+
+import inspect
+from typing import Optional, List, Dict, Any, Callable
+
+# JSON Schema 类型 -> 检查函数（bool 不算 integer/number）
+_TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+}
+
+_TYPE_NAMES = {
+    str: "string", bool: "boolean", int: "integer", float: "number",
+    list: "array", tuple: "array", dict: "object", type(None): "null"
+}
+
+Validator = Callable[[Dict[str, Any]], List[Dict[str, Any]]]
+_Check = Callable[[str, Any], Optional[Dict[str, Any]]]
+
+
+def _type_name(value: Any) -> str:
+    return _TYPE_NAMES.get(type(value), type(value).__name__)
+
+
+def _error(field: str, code: str, message: str, **extra) -> Dict[str, Any]:
+    return {"field": field, "error": code, "message": message, **extra}
+
+
+def _compile_property(prop: Dict[str, Any]) -> List[_Check]:
+    """把单个属性的 schema 编译成检查函数列表（按顺序执行，遇到第一个错误即停止）"""
+    checks: List[_Check] = []
+
+    types = prop.get("type")
+    if types:
+        types = [types] if isinstance(types, str) else list(types)
+        type_checks = [_TYPE_CHECKS[t] for t in types if t in _TYPE_CHECKS]
+        expected = " | ".join(types)
+
+        def check_type(field, value, type_checks=type_checks, expected=expected):
+            if not any(check(value) for check in type_checks):
+                return _error(field, "type", f"{field} 应为 {expected}，实际为 {_type_name(value)}",
+                              expected=expected, received=_type_name(value))
+        checks.append(check_type)
+
+    if "enum" in prop:
+        allowed = list(prop["enum"])
+        allowed_set = set(allowed)
+
+        def check_enum(field, value):
+            if value not in allowed_set:
+                return _error(field, "enum", f"{field} 必须是 {allowed} 之一，实际为 {value!r}",
+                              allowed=allowed, received=value)
+        checks.append(check_enum)
+
+    minimum, maximum = prop.get("minimum"), prop.get("maximum")
+    if minimum is not None or maximum is not None:
+        def check_range(field, value):
+            if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+                bounds = f"[{'-∞' if minimum is None else minimum}, {'∞' if maximum is None else maximum}]"
+                return _error(field, "range", f"{field} 应在 {bounds} 范围内，实际为 {value}",
+                              minimum=minimum, maximum=maximum, received=value)
+        checks.append(check_range)
+
+    min_len, max_len = prop.get("minLength"), prop.get("maxLength")
+    if min_len is not None or max_len is not None:
+        def check_length(field, value):
+            if isinstance(value, str) and (
+                (min_len is not None and len(value) < min_len) or (max_len is not None and len(value) > max_len)
+            ):
+                return _error(field, "length", f"{field} 长度应在 {min_len or 0}-{max_len or '∞'} 之间，实际为 {len(value)}",
+                              min_length=min_len, max_length=max_len, received_length=len(value))
+        checks.append(check_length)
+
+    min_items, max_items = prop.get("minItems"), prop.get("maxItems")
+    if min_items is not None or max_items is not None:
+        def check_items_count(field, value):
+            if (min_items is not None and len(value) < min_items) or (max_items is not None and len(value) > max_items):
+                return _error(field, "items", f"{field} 元素数量应在 {min_items or 0}-{max_items or '∞'} 之间，实际为 {len(value)}",
+                              min_items=min_items, max_items=max_items, received_items=len(value))
+        checks.append(check_items_count)
+
+    if isinstance(prop.get("items"), dict):
+        item_checks = _compile_property(prop["items"])
+
+        def check_items(field, value):
+            for i, item in enumerate(value):
+                for check in item_checks:
+                    error = check(f"{field}[{i}]", item)
+                    if error:
+                        return error
+        checks.append(check_items)
+
+    return checks
+
+
+def compile_validator(tool_schema: Dict[str, Any], func: Callable = None) -> Validator:
+    """
+    编译单个工具的参数校验函数
+
+    Args:
+        tool_schema: {"type": "function", "function": {...}} 格式的 Tool Schema
+        func: 工具函数；提供时，schema 中没有但函数签名中有的参数也允许传入
+
+    Returns:
+        validate(arguments) -> 错误列表（为空表示通过）
+    """
+    parameters = tool_schema["function"].get("parameters", {})
+    properties = parameters.get("properties", {})
+    required = list(parameters.get("required", []))
+    compiled = {name: _compile_property(prop) for name, prop in properties.items()}
+
+    allowed = set(properties)
+    accepts_any = False
+    if func is not None:
+        signature = inspect.signature(func)
+        allowed |= set(signature.parameters)
+        accepts_any = any(p.kind == p.VAR_KEYWORD for p in signature.parameters.values())
+
+    def validate(arguments: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not isinstance(arguments, dict):
+            return [_error("", "type", f"参数应为 object，实际为 {_type_name(arguments)}",
+                           expected="object", received=_type_name(arguments))]
+        errors = []
+        for name in required:
+            if arguments.get(name) is None:
+                errors.append(_error(name, "required", f"缺少必填参数 {name}"))
+        for name, value in arguments.items():
+            checks = compiled.get(name)
+            if checks is None:
+                if name not in allowed and not accepts_any:
+                    errors.append(_error(name, "unknown", f"未知参数 {name}", allowed=sorted(properties)))
+                continue
+            if value is None:
+                # None 等同于未传（可选参数）
+                continue
+            for check in checks:
+                error = check(name, value)
+                if error:
+                    errors.append(error)
+                    break
+        return errors
+
+    return validate
+
+
+def compile_validators(
+    schemas: List[Dict[str, Any]],
+    functions: Dict[str, Callable] = None
+) -> Dict[str, Validator]:
+    """编译全部工具的校验函数：{tool_name: validate}"""
+    functions = functions or {}
+    return {
+        schema["function"]["name"]: compile_validator(schema, functions.get(schema["function"]["name"]))
+        for schema in schemas
+    }
+
+
+def format_errors(errors: List[Dict[str, Any]]) -> str:
+    """把错误列表合并成一句话（放进 result["error"]）"""
+    return "参数校验失败: " + "；".join(e["message"] for e in errors)
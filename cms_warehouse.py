@@ -0,0 +1,402 @@
+"""
+CMS Warehouse - 本地每日浏览量仓库
+按 (站点, 文章, 日期) 保存每日浏览量，增量同步，30/90/365 天的查询直接在本地完成
+
+- 数据来自 /stats/top-posts（period=day），只请求本地还没有的日期
+- 已结束的日期同步后不再请求；尚未结束的日期（当天）数据仍在变化，按 sync_interval 定期刷新
+- "当天"按站点时区（utc_offset，即站点的 gmt_offset）计算；时区未知时，日期在所有时区都结束后
+  （UTC 次日 12:00）才视为已结束，不会因本机时区与站点不同而把仍在变化的日期标记为已同步
+- 只追加/覆盖，不删除历史数据
+- 写入每日数据时同步维护按周/按月的汇总表，长周期查询直接读汇总表
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, List, Dict, Any, Callable, Tuple, Iterable
+
+from cms_index import CMS_STATE_DIR
+
+CMS_WAREHOUSE_PATH = os.getenv("CMS_WAREHOUSE_PATH", os.path.join(CMS_STATE_DIR, "warehouse.sqlite3"))
+
+# 最多回溯的天数（与 get_article_metrics 的上限一致）
+MAX_DAYS = 365
+# top-posts 的 max=0 表示返回全部文章
+_TOP_POSTS_ALL = 0
+# 最晚的时区（UTC-12）中一天在 UTC 次日 12:00 结束
+_LATEST_UTC_OFFSET_HOURS = -12
+
+# 时间粒度：day / week（周一开始）/ month
+GRANULARITIES = ("day", "week", "month")
+# 汇总表，period 为周期第一天
+_ROLLUP_TABLES = {"week": "weekly_views", "month": "monthly_views"}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS daily_views ("
+    " site TEXT NOT NULL, post_id INTEGER NOT NULL, day TEXT NOT NULL, views INTEGER NOT NULL,"
+    " PRIMARY KEY (site, post_id, day)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS daily_views_by_day ON daily_views (site, day)",
+    "CREATE TABLE IF NOT EXISTS synced_days ("
+    " site TEXT NOT NULL, day TEXT NOT NULL, synced_at REAL NOT NULL,"
+    " PRIMARY KEY (site, day)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS posts ("
+    " site TEXT NOT NULL, post_id INTEGER NOT NULL, title TEXT, url TEXT,"
+    " PRIMARY KEY (site, post_id)) WITHOUT ROWID",
+) + tuple(
+    f"CREATE TABLE IF NOT EXISTS {table} ("
+    " site TEXT NOT NULL, post_id INTEGER NOT NULL, period TEXT NOT NULL, views INTEGER NOT NULL,"
+    f" PRIMARY KEY (site, post_id, period)) WITHOUT ROWID"
+    for table in _ROLLUP_TABLES.values()
+) + tuple(
+    f"CREATE INDEX IF NOT EXISTS {table}_by_period ON {table} (site, period)"
+    for table in _ROLLUP_TABLES.values()
+)
+
+
+def resolve_granularity(days: int, granularity: str = "auto") -> str:
+    """auto 按周期长度选择粒度：31 天以内按天，180 天以内按周，更长按月"""
+    if granularity in GRANULARITIES:
+        return granularity
+    if days <= 31:
+        return "day"
+    if days <= 180:
+        return "week"
+    return "month"
+
+
+def period_start(day: date, granularity: str) -> date:
+    """日期所在周期的第一天"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def period_end(start: date, granularity: str) -> date:
+    """周期的最后一天"""
+    if granularity == "week":
+        return start + timedelta(days=6)
+    if granularity == "month":
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return next_month - timedelta(days=1)
+    return start
+
+
+def downsample(daily: List[Dict[str, Any]], granularity: str) -> List[Dict[str, Any]]:
+    """把 [{"date", "views"}] 每日数据按周期合并（按周期倒序，date 为周期第一天）"""
+    if granularity == "day":
+        return sorted(daily, key=lambda x: x["date"], reverse=True)
+    buckets: Dict[str, int] = {}
+    for item in daily:
+        key = period_start(date.fromisoformat(item["date"][:10]), granularity).isoformat()
+        buckets[key] = buckets.get(key, 0) + item["views"]
+    return [{"date": key, "views": buckets[key]} for key in sorted(buckets, reverse=True)]
+
+
+class StatsWarehouse:
+    """
+    每日浏览量仓库
+
+    Args:
+        site_id: 站点 ID
+        request: 请求函数，签名同 cms_tools._make_request
+        path: SQLite 文件路径
+        sync_interval: 当天数据的刷新间隔（秒）
+        utc_offset: 站点时区相对 UTC 的小时数（站点的 gmt_offset），None 表示未知
+    """
+
+    def __init__(
+        self,
+        site_id: str,
+        request: Callable[..., dict],
+        path: str = None,
+        sync_interval: int = 300,
+        utc_offset: Optional[float] = None
+    ):
+        self.site_id = str(site_id)
+        self.path = path or CMS_WAREHOUSE_PATH
+        self.sync_interval = sync_interval
+        self.utc_offset = utc_offset
+        self._request = request
+        self._lock = threading.Lock()
+        # 尚未结束的日期：day -> 最近一次同步时间
+        self._recent_syncs: Dict[str, float] = {}
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._backfill_rollups()
+
+    # ---------- 日期 ----------
+
+    def today(self) -> date:
+        """站点时区的当前日期（时区未知时按 UTC）"""
+        return (datetime.now(timezone.utc) + timedelta(hours=self.utc_offset or 0)).date()
+
+    def _is_final(self, day: str) -> bool:
+        """该日期在站点时区（未知时在所有时区）是否已经结束，结束后数据不再变化"""
+        offset = _LATEST_UTC_OFFSET_HOURS if self.utc_offset is None else self.utc_offset
+        day_end = datetime.fromisoformat(day).replace(tzinfo=timezone.utc) + timedelta(days=1, hours=-offset)
+        return datetime.now(timezone.utc) >= day_end
+
+    # ---------- 同步 ----------
+
+    def _missing_ranges(self, days: int, today: date) -> List[Tuple[date, int]]:
+        """返回需要请求的日期区间 [(结束日期, 天数)]；未结束的日期受刷新间隔限制"""
+        start = today - timedelta(days=days - 1)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day FROM synced_days WHERE site = ? AND day >= ? AND day <= ?",
+                (self.site_id, start.isoformat(), today.isoformat())
+            ).fetchall()
+            recent = dict(self._recent_syncs)
+        synced = {row[0] for row in rows}
+        now = time.time()
+
+        ranges = []
+        run_end, run_len = None, 0
+        for offset in range(days):
+            day = today - timedelta(days=offset)
+            key = day.isoformat()
+            missing = key not in synced and now - recent.get(key, 0.0) >= self.sync_interval
+            if missing:
+                if run_end is None:
+                    run_end = day
+                run_len += 1
+            elif run_end is not None:
+                ranges.append((run_end, run_len))
+                run_end, run_len = None, 0
+        if run_end is not None:
+            ranges.append((run_end, run_len))
+        return ranges
+
+    def sync(self, days: int = 30, today: date = None) -> Dict[str, Any]:
+        """
+        增量同步最近 days 天的数据
+
+        Returns:
+            {"requests": 请求次数, "days_synced": 写入的天数, "errors": [...]}
+        """
+        days = min(max(1, days), MAX_DAYS)
+        today = today or self.today()
+        ranges = self._missing_ranges(days, today)
+        report = {"requests": 0, "days_synced": 0, "errors": []}
+
+        for end, num in ranges:
+            result = self._request(
+                "GET",
+                f"/sites/{self.site_id}/stats/top-posts",
+                params={"period": "day", "date": end.isoformat(), "num": num, "max": _TOP_POSTS_ALL}
+            )
+            report["requests"] += 1
+            if not result["success"]:
+                report["errors"].append(result.get("error"))
+                continue
+            report["days_synced"] += self._store(result["data"].get("days") or {})
+        return report
+
+    def synced_day_count(self, days: int = 30, today: date = None) -> int:
+        """最近 days 天中已有同步数据的天数（包括尚未结束、已同步过的日期）"""
+        today = today or self.today()
+        start = self._start(days, today)
+        with self._lock:
+            final = {row[0] for row in self._conn.execute(
+                "SELECT day FROM synced_days WHERE site = ? AND day BETWEEN ? AND ?",
+                (self.site_id, start, today.isoformat())
+            )}
+            recent = {day for day in self._recent_syncs if start <= day <= today.isoformat()}
+        return len(final | recent)
+
+    def _store(self, days_data: Dict[str, Any]) -> int:
+        daily_rows = []
+        post_rows = {}
+        synced_rows = []
+        recent = []
+        now = time.time()
+        for day, info in days_data.items():
+            if not isinstance(info, dict):
+                continue
+            for p in info.get("postviews", []):
+                if isinstance(p, dict) and p.get("id"):
+                    daily_rows.append((self.site_id, p["id"], day, p.get("views", 0)))
+                    post_rows[p["id"]] = (self.site_id, p["id"], p.get("title", ""), p.get("href", ""))
+            if self._is_final(day):
+                synced_rows.append((self.site_id, day, now))
+            else:
+                recent.append(day)
+
+        with self._lock:
+            # 尚未结束的日期整体替换（文章可能跌出榜单）
+            for day in recent:
+                self._conn.execute("DELETE FROM daily_views WHERE site = ? AND day = ?", (self.site_id, day))
+                self._recent_syncs[day] = now
+            self._conn.executemany("INSERT OR REPLACE INTO daily_views VALUES (?, ?, ?, ?)", daily_rows)
+            self._conn.executemany("INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?)", post_rows.values())
+            self._conn.executemany("INSERT OR REPLACE INTO synced_days VALUES (?, ?, ?)", synced_rows)
+            self._refresh_rollups(days_data.keys())
+            self._conn.commit()
+        return len(days_data)
+
+    # ---------- 周/月汇总 ----------
+
+    def _refresh_rollups(self, days: Iterable[str]) -> None:
+        """重新计算这些日期所在的周/月汇总（调用方持有锁，由调用方提交）"""
+        for granularity, table in _ROLLUP_TABLES.items():
+            starts = {period_start(date.fromisoformat(day), granularity) for day in days}
+            for start in starts:
+                end = period_end(start, granularity)
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE site = ? AND period = ?", (self.site_id, start.isoformat())
+                )
+                self._conn.execute(
+                    f"INSERT INTO {table} SELECT site, post_id, ?, SUM(views) FROM daily_views"
+                    " WHERE site = ? AND day BETWEEN ? AND ? GROUP BY post_id",
+                    (start.isoformat(), self.site_id, start.isoformat(), end.isoformat())
+                )
+
+    def _backfill_rollups(self) -> None:
+        """旧版本创建的仓库没有汇总表数据，首次打开时补算一次"""
+        with self._lock:
+            has_daily = self._conn.execute(
+                "SELECT 1 FROM daily_views WHERE site = ? LIMIT 1", (self.site_id,)
+            ).fetchone()
+            has_rollup = self._conn.execute(
+                "SELECT 1 FROM monthly_views WHERE site = ? LIMIT 1", (self.site_id,)
+            ).fetchone()
+            if not has_daily or has_rollup:
+                return
+            days = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT day FROM daily_views WHERE site = ?", (self.site_id,)
+            )]
+            self._refresh_rollups(days)
+            self._conn.commit()
+
+    def _segments(self, days: int, today: date, granularity: str) -> List[Tuple[str, str, str, str]]:
+        """
+        把查询周期拆成可直接读取的数据段 [(表, 日期列, 开始, 结束)]
+
+        按周/按月时，完整的周期读汇总表；周期开头不完整的那一段从每日数据中累加。
+        """
+        start = date.fromisoformat(self._start(days, today))
+        if granularity == "day":
+            return [("daily_views", "day", start.isoformat(), today.isoformat())]
+        first = period_start(start, granularity)
+        segments = []
+        if first < start:
+            head_end = min(period_end(first, granularity), today)
+            segments.append(("daily_views", "day", start.isoformat(), head_end.isoformat()))
+            first = head_end + timedelta(days=1)
+        if first <= today:
+            segments.append((_ROLLUP_TABLES[granularity], "period", first.isoformat(), today.isoformat()))
+        return segments
+
+    def _union(self, days: int, today: date, granularity: str, post_id: int = None) -> Tuple[str, list]:
+        """生成各数据段的 UNION ALL 子查询，列为 (post_id, period, views)"""
+        parts, params = [], []
+        for table, column, start, end in self._segments(days, today, granularity):
+            if table == "daily_views" and granularity != "day":
+                # 开头不完整的周期：period 取该周期第一天
+                label = period_start(date.fromisoformat(start), granularity).isoformat()
+                parts.append(f"SELECT post_id, ? AS period, views FROM daily_views"
+                             f" WHERE site = ? AND day BETWEEN ? AND ?")
+                params.extend([label, self.site_id, start, end])
+            else:
+                parts.append(f"SELECT post_id, {column} AS period, views FROM {table}"
+                             f" WHERE site = ? AND {column} BETWEEN ? AND ?")
+                params.extend([self.site_id, start, end])
+            if post_id is not None:
+                parts[-1] += " AND post_id = ?"
+                params.append(post_id)
+        return " UNION ALL ".join(parts), params
+
+    # ---------- 查询 ----------
+
+    def _start(self, days: int, today: date = None) -> str:
+        today = today or self.today()
+        return (today - timedelta(days=min(max(1, days), MAX_DAYS) - 1)).isoformat()
+
+    def post_views_series(
+        self,
+        post_id: int,
+        days: int = 30,
+        granularity: str = "day",
+        today: date = None
+    ) -> List[Dict[str, Any]]:
+        """单篇文章按天/周/月的浏览量（只包含有浏览的周期，按周期倒序，date 为周期第一天）"""
+        today = today or self.today()
+        union, params = self._union(days, today, granularity, post_id)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT period, SUM(views) FROM ({union}) GROUP BY period ORDER BY period DESC", params
+            ).fetchall()
+        return [{"date": period, "views": views} for period, views in rows]
+
+    def post_daily_views(self, post_id: int, days: int = 30, today: date = None) -> List[Dict[str, Any]]:
+        """单篇文章的每日浏览量（只包含有浏览的日期，按日期倒序）"""
+        return self.post_views_series(post_id, days, "day", today)
+
+    def post_total_views(self, post_id: int, days: int = 30, today: date = None) -> int:
+        today = today or self.today()
+        union, params = self._union(days, today, resolve_granularity(days), post_id)
+        with self._lock:
+            row = self._conn.execute(f"SELECT COALESCE(SUM(views), 0) FROM ({union})", params).fetchone()
+        return row[0]
+
+    def top_posts(self, days: int = 7, limit: int = 10, today: date = None) -> List[Dict[str, Any]]:
+        """统计周期内浏览量最高的文章"""
+        today = today or self.today()
+        union, params = self._union(days, today, resolve_granularity(days))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.post_id, COALESCE(p.title, ''), COALESCE(p.url, ''), SUM(d.views) AS total"
+                f" FROM ({union}) d LEFT JOIN posts p ON p.site = ? AND p.post_id = d.post_id"
+                " GROUP BY d.post_id ORDER BY total DESC LIMIT ?",
+                params + [self.site_id, limit]
+            ).fetchall()
+        return [{"id": pid, "title": title, "views": views, "url": url} for pid, title, url, views in rows]
+
+    def site_views_series(self, days: int = 7, granularity: str = "day", today: date = None) -> List[Dict[str, Any]]:
+        """站点文章浏览量按天/周/月合计（按周期倒序，date 为周期第一天）"""
+        today = today or self.today()
+        union, params = self._union(days, today, granularity)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT period, SUM(views) FROM ({union}) GROUP BY period ORDER BY period DESC", params
+            ).fetchall()
+        return [{"date": period, "views": views} for period, views in rows]
+
+    def site_daily_views(self, days: int = 7, today: date = None) -> List[Dict[str, Any]]:
+        """站点每日文章浏览量合计（按日期倒序）"""
+        return self.site_views_series(days, "day", today)
+
+    def export_rows(self, days: int = 30, today: date = None) -> Tuple[List[Tuple[str, int, int]], Dict[int, str], List[str]]:
+        """
+        导出周期内的全部记录（用于构建分析矩阵）
+
+        Returns:
+            ([(日期, post_id, 浏览量)], {post_id: 标题}, 周期内的全部日期（升序）)
+        """
+        today = today or self.today()
+        start = self._start(days, today)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, post_id, views FROM daily_views WHERE site = ? AND day >= ?",
+                (self.site_id, start)
+            ).fetchall()
+            titles = dict(self._conn.execute(
+                "SELECT post_id, title FROM posts WHERE site = ?", (self.site_id,)
+            ).fetchall())
+        first = date.fromisoformat(start)
+        dates = [(first + timedelta(days=i)).isoformat() for i in range((today - first).days + 1)]
+        return rows, titles, dates
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
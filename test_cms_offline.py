@@ -0,0 +1,854 @@
+#!/usr/bin/env python3
+"""
+CMS Tools 离线回归测试
+针对本地 API 替身（cms_stub_server）运行，不需要 Token，不访问网络，不需要交互。
+
+使用方法：
+    python -m unittest -v test_cms_offline
+"""
+
+import os
+import sys
+import gzip
+import io
+import json
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+import urllib.request
+from datetime import date, timedelta
+
+# 本地索引（幂等、分类/标签缓存、仓库等）写到临时目录；须在导入 cms_* 模块前设置
+_STATE_DIR = tempfile.mkdtemp(prefix="cms_offline_")
+os.environ["CMS_STATE_DIR"] = _STATE_DIR
+os.environ["WP_ACCESS_TOKEN"] = "stub-token"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cms_stub_server import StubServer
+import cms_tools
+import cms_import
+import cms_export
+import cms_profiling
+from cms_profiling import ToolProfiler, set_profiler
+from cms_tracing import SpanExporter, add_exporter, remove_exporter
+from cms_metrics import METRICS, endpoint_template, start_metrics_server
+from cms_cassette import Cassette, set_cassette
+from cms_session import ToolSession
+from cms_media import MediaPathError, resolve_media_path
+from cms_analytics import ViewsMatrix
+from cms_taxonomy import TermCache
+from cms_deadline import tool_deadline
+from cms_warehouse import StatsWarehouse
+from cms_observation import compact_observation, format_observation, estimate_tokens
+from cms_content import compact_html
+
+_SERVER = None
+
+
+def setUpModule():
+    global _SERVER
+    _SERVER = StubServer(posts=120, site_id=cms_tools.WP_SITE_ID).start()
+    cms_tools.WP_API_BASE = _SERVER.api_base
+
+
+def tearDownModule():
+    _SERVER.stop()
+    shutil.rmtree(_STATE_DIR, ignore_errors=True)
+
+
+def _changed_endpoints(before: dict, after: dict) -> dict:
+    return {k: v - before.get(k, 0) for k, v in after.items() if v != before.get(k, 0)}
+
+
+# ============================================================
+# 幂等创建
+# ============================================================
+
+class IdempotencyTest(unittest.TestCase):
+
+    def test_same_key_returns_existing_post_without_writes(self):
+        first = cms_tools.create_article("幂等测试", "<p>x</p>", tags=["幂等-a"], idempotency_key="dedup-1")
+        self.assertTrue(first["success"], first.get("error"))
+
+        before = _SERVER.stats()["endpoints"]
+        second = cms_tools.create_article("幂等测试", "<p>x</p>", tags=["幂等-b"], idempotency_key="dedup-1")
+        changed = _changed_endpoints(before, _SERVER.stats()["endpoints"])
+
+        self.assertTrue(second["data"]["deduplicated"])
+        self.assertEqual(second["data"]["post_id"], first["data"]["post_id"])
+        # 命中时只做一次存在性检查，不创建标签、不新建文章
+        self.assertEqual(changed, {"GET /sites/{site}/posts/{id}": 1})
+
+    def test_no_key_does_not_dedup_by_default(self):
+        a = cms_tools.create_article("相同内容", "<p>same</p>")
+        b = cms_tools.create_article("相同内容", "<p>same</p>")
+        self.assertNotEqual(a["data"]["post_id"], b["data"]["post_id"])
+        self.assertNotIn("deduplicated", b["data"])
+
+    def test_trashed_post_is_recreated(self):
+        first = cms_tools.create_article("回收站", "<p>x</p>", idempotency_key="dedup-trash")
+        post_id = first["data"]["post_id"]
+        cms_tools._make_request("POST", f"/sites/{cms_tools.WP_SITE_ID}/posts/{post_id}/delete")
+
+        again = cms_tools.create_article("回收站", "<p>x</p>", idempotency_key="dedup-trash")
+        self.assertTrue(again["success"], again.get("error"))
+        self.assertNotEqual(again["data"]["post_id"], post_id)
+        self.assertNotIn("deduplicated", again["data"])
+
+
+# ============================================================
+# 站点统计
+# ============================================================
+
+class SiteStatsTest(unittest.TestCase):
+
+    def test_top_posts_with_and_without_granularity(self):
+        for granularity, points in ((None, 0), ("day", 14), ("week", 2)):
+            with self.subTest(granularity=granularity):
+                result = cms_tools.get_site_stats(days=14, granularity=granularity, use_warehouse=False)
+                self.assertTrue(result["success"], result.get("error"))
+                self.assertTrue(result["data"]["top_posts"])
+                self.assertEqual(len(result["data"].get("views_series", [])), points)
+
+
+# ============================================================
+# 导出断点续传
+# ============================================================
+
+class _Interrupted(Exception):
+    pass
+
+
+class ExportResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _interrupt(self, path: str, **kwargs) -> None:
+        def interrupt(exported):
+            if exported >= 60:
+                raise _Interrupted()
+
+        with self.assertRaises(_Interrupted):
+            cms_export.export_posts(path, progress_callback=interrupt, **kwargs)
+
+    @staticmethod
+    def _read(path: str) -> list:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def _export_interrupted_then_resume(self, name: str, partial_page: bytes) -> list:
+        path = os.path.join(self.workdir, name)
+        self._interrupt(path, include_content=False)
+        # 中断时下一页只写了一半
+        with open(path, "ab") as f:
+            f.write(partial_page)
+
+        result = cms_export.export_posts(path, include_content=False)
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertTrue(result["data"]["resumed"])
+        return [record["id"] for record in self._read(path)]
+
+    def test_resume_plain(self):
+        ids = self._export_interrupted_then_resume("posts.ndjson", b'{"id": 99999, "tit')
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertNotIn(99999, ids)
+        self.assertGreaterEqual(len(ids), 120)
+
+    def test_resume_gzip(self):
+        broken = gzip.compress(b'{"id": 99999}\n' * 50)[:40]
+        ids = self._export_interrupted_then_resume("posts.ndjson.gz", broken)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertGreaterEqual(len(ids), 120)
+
+    def test_changed_options_restart(self):
+        path = os.path.join(self.workdir, "posts.ndjson")
+        self._interrupt(path, include_content=False)
+
+        result = cms_export.export_posts(path, include_content=True)
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertFalse(result["data"]["resumed"])
+        records = self._read(path)
+        self.assertEqual(len(records), result["data"]["exported"])
+        self.assertTrue(all("content" in record for record in records))
+
+
+# ============================================================
+# HTML 压缩
+# ============================================================
+
+class CompactHtmlTest(unittest.TestCase):
+
+    FIXTURES = [
+        # (输入, 期望输出)
+        ("<p> </p><p>a</p>", "<p>a</p>"),
+        ("<p>a<i class=\"fa fa-x\"></i></p>", "<p>a<i class=\"fa fa-x\"></i></p>"),
+        ("<span data-id=\"1\"></span><b role=\"img\"></b><em></em>", "<span data-id=\"1\"></span><b role=\"img\"></b>"),
+        (
+            "<!-- wp:spacer -->\n<div style=\"height:100px\" aria-hidden=\"true\" class=\"wp-block-spacer\"></div>\n<!-- /wp:spacer -->",
+            "<!-- wp:spacer --><div style=\"height:100px\" aria-hidden=\"true\" class=\"wp-block-spacer\"></div><!-- /wp:spacer -->",
+        ),
+        ("<p style=\"color:red\">x</p><!-- note -->", "<p>x</p>"),
+        ("a<![CDATA[x<y]]>b", "a<![CDATA[x<y]]>b"),
+        ("<p>x<?php echo 1; ?>y</p>", "<p>x<?php echo 1; ?>y</p>"),
+    ]
+
+    # 未闭合标签按浏览器规则隐式闭合
+    UNCLOSED = [
+        ("<p>a<p>b", "<p>a</p><p>b</p>"),
+        ("<ul><li>a<li>b</ul>", "<ul><li>a</li><li>b</li></ul>"),
+        ("<ul><li>a<ul><li>b</ul><li>c</ul>", "<ul><li>a<ul><li>b</li></ul></li><li>c</li></ul>"),
+        ("<dl><dt>a<dd>b<dt>c</dl>", "<dl><dt>a</dt><dd>b</dd><dt>c</dt></dl>"),
+        ("<table><tr><td>a<td>b<tr><td>c</table>", "<table><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr></table>"),
+        ("<select><option>a<option>b</select>", "<select><option>a</option><option>b</option></select>"),
+        ("<p>a<div>b</div>", "<p>a</p><div>b</div>"),
+    ]
+
+    def test_fixtures(self):
+        for source, expected in self.FIXTURES + self.UNCLOSED:
+            with self.subTest(source=source):
+                self.assertEqual(compact_html(source)[0], expected)
+
+
+# ============================================================
+# 批量导入
+# ============================================================
+
+class ImportWriterFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for i in range(6):
+            with open(os.path.join(self.root, f"post-{i}.md"), "w", encoding="utf-8") as f:
+                f.write(f"---\ntitle: 导入 {i}\ntags: [导入-{i}]\n---\n正文 {i}\n")
+        self._create_article = cms_tools.create_article
+
+    def tearDown(self):
+        cms_tools.create_article = self._create_article
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_writer_exception_is_recorded_per_file(self):
+        original = self._create_article
+
+        def flaky_create(**kwargs):
+            if kwargs["title"] == "导入 3":
+                raise RuntimeError("写入中断")
+            return original(**kwargs)
+
+        cms_tools.create_article = flaky_create
+        result = cms_import.import_directory(self.root, concurrency=3)
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["data"]["created"], 5)
+        self.assertEqual(result["data"]["failed"], 1)
+        self.assertEqual(result["data"]["failures"][0]["path"], "post-3.md")
+        self.assertIn("写入中断", result["data"]["failures"][0]["error"])
+
+        # 再次导入只重试失败的文件
+        cms_tools.create_article = original
+        again = cms_import.import_directory(self.root, concurrency=3)
+        self.assertTrue(again["success"], again.get("error"))
+        self.assertEqual((again["data"]["created"], again["data"]["unchanged"]), (1, 5))
+
+
+# ============================================================
+# 紧凑输出
+# ============================================================
+
+class ObservationTest(unittest.TestCase):
+
+    def _metrics_result(self) -> dict:
+        return {"success": True, "data": {
+            "post_id": 7,
+            "url": "https://example.com/" + "very-long-slug-" * 30,
+            "excerpt": "很长的摘要 " * 200,
+            "empty": "",
+            "daily_breakdown": [{"date": f"2026-03-{i % 28 + 1:02d}", "views": i} for i in range(300)]
+        }}
+
+    def test_fits_budget_and_keeps_dates_and_urls(self):
+        result = self._metrics_result()
+        compacted = compact_observation(result, max_bytes=1500)
+
+        self.assertLessEqual(len(format_observation(result, max_bytes=1500).encode("utf-8")), 1500)
+        data = compacted["data"]
+        self.assertNotIn("empty", data)
+        self.assertEqual(data["url"], result["data"]["url"])
+        self.assertTrue(data["excerpt"].endswith("…"))
+
+        table = data["daily_breakdown"]
+        self.assertEqual(table["columns"], ["date", "views"])
+        kept, overflow = table["rows"], table["_overflow"]
+        self.assertEqual(len(kept) + overflow["rows_omitted"], 300)
+        self.assertEqual(sum(row[1] for row in kept) + overflow["sums"]["views"], sum(range(300)))
+
+    def test_reduces_to_key_columns(self):
+        posts = [{"id": i, "title": f"文章 {i}", "date": "2026-03-01", "excerpt": "摘要 " * 40, "views": i}
+                 for i in range(40)]
+        compacted = compact_observation({"success": True, "data": {"posts": posts}}, max_bytes=2500)
+        self.assertEqual(compacted["data"]["posts"]["columns"], ["id", "title", "date", "views"])
+
+    def test_token_budget(self):
+        text = format_observation(self._metrics_result(), max_tokens=300)
+        self.assertLessEqual(estimate_tokens(text), 300)
+
+
+# ============================================================
+# 本地浏览量仓库
+# ============================================================
+
+class WarehouseRollupTest(unittest.TestCase):
+    """周/月汇总与每日数据一致，已结束的日期只同步一次"""
+
+    TODAY = date(2026, 3, 18)
+
+    def setUp(self):
+        self.requests = []
+        self.warehouse = StatsWarehouse("1", self._fake_request, path=":memory:", utc_offset=0)
+
+    def tearDown(self):
+        self.warehouse.close()
+
+    def _fake_request(self, method, endpoint, params=None, **kwargs):
+        self.requests.append(params)
+        end = date.fromisoformat(params["date"])
+        days = {}
+        for i in range(params["num"]):
+            day = end - timedelta(days=i)
+            days[day.isoformat()] = {"postviews": [
+                {"id": post_id, "title": f"文章 {post_id}", "href": f"https://example.com/{post_id}",
+                 "views": day.day * post_id}
+                for post_id in (1, 2, 3)
+            ]}
+        return {"success": True, "data": {"days": days}}
+
+    def test_rollups_match_daily_views(self):
+        report = self.warehouse.sync(90, today=self.TODAY)
+        self.assertEqual((report["requests"], report["days_synced"], report["errors"]), (1, 90, []))
+
+        daily = self.warehouse.site_views_series(90, "day", today=self.TODAY)
+        total = sum(d["views"] for d in daily)
+        for granularity in ("week", "month"):
+            with self.subTest(granularity=granularity):
+                series = self.warehouse.site_views_series(90, granularity, today=self.TODAY)
+                self.assertEqual(sum(d["views"] for d in series), total)
+                self.assertEqual([d["date"] for d in series], sorted((d["date"] for d in series), reverse=True))
+
+        top = self.warehouse.top_posts(90, limit=2, today=self.TODAY)
+        self.assertEqual([p["id"] for p in top], [3, 2])
+        self.assertEqual(self.warehouse.post_total_views(3, 90, today=self.TODAY), total // 2)
+
+    def test_final_days_are_not_requested_again(self):
+        self.warehouse.sync(30, today=self.TODAY)
+        self.assertEqual(self.warehouse.synced_day_count(30, today=self.TODAY), 30)
+        self.assertEqual(self.warehouse.sync(30, today=self.TODAY)["requests"], 0)
+
+
+class WarehouseSyncFailureTest(unittest.TestCase):
+    """同步失败不能被当作零浏览量返回"""
+
+    def setUp(self):
+        self.warehouse = StatsWarehouse(cms_tools.WP_SITE_ID, cms_tools._make_request, path=":memory:")
+        self._previous = cms_tools._WAREHOUSES.get(cms_tools.WP_SITE_ID)
+        cms_tools._WAREHOUSES[cms_tools.WP_SITE_ID] = self.warehouse
+
+    def tearDown(self):
+        _SERVER.set_faults(latency_ms=0, error_rate=0)
+        cms_tools._WAREHOUSES.pop(cms_tools.WP_SITE_ID, None)
+        if self._previous is not None:
+            cms_tools._WAREHOUSES[cms_tools.WP_SITE_ID] = self._previous
+        self.warehouse.close()
+
+    def test_deadline_before_any_sync_is_an_error(self):
+        _SERVER.set_faults(latency_ms=400)
+        with tool_deadline(0.3):
+            result = cms_tools.get_site_stats(days=30, use_warehouse=True)
+        self.assertFalse(result["success"])
+        self.assertIn("浏览量仓库同步失败", result["error"])
+
+    def test_failed_refresh_is_partial(self):
+        first = cms_tools.get_site_stats(days=30, use_warehouse=True)
+        self.assertTrue(first["success"], first.get("error"))
+        self.assertNotIn("partial", first["data"])
+
+        self.warehouse.sync_interval = 0
+        _SERVER.set_faults(error_rate=1.0)
+        again = cms_tools.get_site_stats(days=30, use_warehouse=True)
+        self.assertTrue(again["data"]["partial"])
+        self.assertIn("warehouse_sync", again["data"]["skipped"])
+        self.assertEqual(again["data"]["top_posts"], first["data"]["top_posts"])
+
+
+# ============================================================
+# 批量修改状态与状态缓存
+# ============================================================
+
+class BulkStatusTest(unittest.TestCase):
+
+    def setUp(self):
+        self._iter_posts = cms_tools._iter_posts
+
+    def tearDown(self):
+        cms_tools._iter_posts = self._iter_posts
+
+    def test_listing_error_still_counts_submitted_writes(self):
+        original = self._iter_posts
+
+        def failing_iter_posts(**kwargs):
+            for i, post in enumerate(original(**kwargs)):
+                if i == 25:
+                    raise RuntimeError("翻页失败")
+                yield post
+
+        cms_tools._iter_posts = failing_iter_posts
+        result = cms_tools.bulk_update_status("private", status="publish", concurrency=4)
+
+        self.assertFalse(result["success"])
+        self.assertIn("翻页失败", result["error"])
+        self.assertEqual(result["data"]["processed"], 25)
+        self.assertEqual(result["data"]["changed"], 25)
+
+        cms_tools._iter_posts = original
+        private = list(cms_tools._iter_posts(status="private"))
+        self.assertGreaterEqual(len(private), 25)
+
+    def test_status_cache_is_per_site_and_bounded(self):
+        post = {"ID": 424242, "status": "publish"}
+        cms_tools._remember_status(post)
+        previous_site, cms_tools.WP_SITE_ID = cms_tools.WP_SITE_ID, "other-site"
+        try:
+            self.assertNotIn(("other-site", 424242), cms_tools._POST_STATUS_CACHE)
+        finally:
+            cms_tools.WP_SITE_ID = previous_site
+        self.assertEqual(cms_tools._POST_STATUS_CACHE[(cms_tools.WP_SITE_ID, 424242)], "publish")
+
+        size = cms_tools.CMS_POST_STATUS_CACHE_SIZE
+        cms_tools.CMS_POST_STATUS_CACHE_SIZE = 3
+        try:
+            for post_id in range(1, 6):
+                cms_tools._remember_status({"ID": post_id, "status": "draft"})
+            self.assertEqual(list(cms_tools._POST_STATUS_CACHE), [(cms_tools.WP_SITE_ID, i) for i in (3, 4, 5)])
+        finally:
+            cms_tools.CMS_POST_STATUS_CACHE_SIZE = size
+
+    def test_failed_status_write_drops_cached_status(self):
+        cms_tools._remember_status({"ID": 999999, "status": "publish"})
+        result = cms_tools.unpublish_article(999999)
+        self.assertFalse(result["success"])
+        self.assertNotIn((cms_tools.WP_SITE_ID, 999999), cms_tools._POST_STATUS_CACHE)
+
+
+# ============================================================
+# 分类/标签解析
+# ============================================================
+
+class TermResolutionTest(unittest.TestCase):
+
+    def setUp(self):
+        # 冷缓存：不使用本地索引中已持久化的全量缓存
+        with cms_tools._TERM_CACHES_LOCK:
+            cms_tools._TERM_CACHES[cms_tools.WP_SITE_ID] = TermCache(cms_tools.WP_SITE_ID, cms_tools._make_request)
+
+    def tearDown(self):
+        with cms_tools._TERM_CACHES_LOCK:
+            cms_tools._TERM_CACHES.pop(cms_tools.WP_SITE_ID, None)
+
+    def test_cold_cache_looks_up_only_missing_names(self):
+        before = _SERVER.stats()["endpoints"]
+        ids, missing = cms_tools._resolve_terms("tags", ["API", "api ", "解析-新标签"])
+        # 不全量拉取 /sites/{site}/tags，只用一次 /batch 查找缺少的名称
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {"GET /batch": 1})
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(missing, ["解析-新标签"])
+
+        # 已查到的名称留在部分缓存中，再次解析不发请求
+        before = _SERVER.stats()["endpoints"]
+        self.assertEqual(cms_tools._resolve_terms("tags", ["Api"]), (ids, []))
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {})
+
+    def test_create_sends_ids_and_creates_unknown_names(self):
+        payloads = []
+        original = cms_tools._make_request
+
+        def recording_request(method, endpoint, **kwargs):
+            if endpoint.endswith("/posts/new"):
+                payloads.append(kwargs.get("data"))
+            return original(method, endpoint, **kwargs)
+
+        cms_tools._make_request = recording_request
+        try:
+            result = cms_tools.create_article("词条解析", "<p>x</p>", categories=["AI"], tags=["api", "解析-新建"])
+        finally:
+            cms_tools._make_request = original
+        self.assertTrue(result["success"], result.get("error"))
+
+        payload = payloads[0]
+        self.assertIn("categories_by_id", payload)
+        self.assertNotIn("categories", payload)
+        self.assertIn("tags_by_id", payload)
+        self.assertEqual(payload["tags"], "解析-新建")
+
+        self.assertEqual(set(result["data"]["categories"]), {"AI"})
+        self.assertEqual(set(result["data"]["tags"]), {"API", "解析-新建"})
+
+
+# ============================================================
+# 浏览量矩阵
+# ============================================================
+
+class ViewsMatrixTest(unittest.TestCase):
+
+    def test_from_records_maps_dates_and_ids(self):
+        days = ["2026-03-02", "2026-03-01", "2026-03-02", "2026-02-28"]
+        ids = [7, 3, 3, 7]
+        views = [5, 1, 2, 9]
+        matrix = ViewsMatrix.from_records(days, ids, views, dates=["2026-03-01", "2026-03-02"])
+        self.assertEqual(matrix.post_ids.tolist(), [3, 7])
+        # 不在 dates 中的日期被忽略
+        self.assertEqual(matrix.views.tolist(), [[1, 0], [2, 5]])
+
+        inferred = ViewsMatrix.from_records(days, ids, views)
+        self.assertEqual(inferred.dates, ["2026-02-28", "2026-03-01", "2026-03-02"])
+        self.assertEqual(inferred.views[:, 1].tolist(), [9, 0, 5])
+
+    def test_sparse_ids(self):
+        matrix = ViewsMatrix.from_records(["2026-03-01"] * 2, [10 ** 12, 5], [1, 2])
+        self.assertEqual(matrix.post_ids.tolist(), [5, 10 ** 12])
+        self.assertEqual(matrix.views.tolist(), [[2, 1]])
+        self.assertEqual(ViewsMatrix.from_records([], [], [], dates=["2026-03-01"]).views.shape, (1, 0))
+
+
+# ============================================================
+# 批量执行
+# ============================================================
+
+class BatchOrderingTest(unittest.TestCase):
+
+    def test_results_in_call_order_and_same_post_serialized(self):
+        created = cms_tools.create_article("批量顺序", "<p>x</p>", status="draft")
+        self.assertTrue(created["success"], created.get("error"))
+        post_id = created["data"]["post_id"]
+
+        # 有延迟时并发执行的调用会乱序完成；同一篇文章的写操作仍按原顺序执行
+        _SERVER.set_faults(latency_ms=10, jitter_ms=80)
+        try:
+            results = cms_tools.execute_cms_tools_batch([
+                ("publish_article", {"post_id": post_id}),
+                ("get_site_stats", {"days": 7, "use_warehouse": False}),
+                {"name": "no_such_tool", "arguments": {}},
+                ("unpublish_article", {"post_id": post_id}),
+                ("publish_article", {"post_id": post_id}),
+            ])
+        finally:
+            _SERVER.set_faults(latency_ms=0, jitter_ms=0)
+
+        self.assertEqual(
+            [r["tool_name"] for r in results],
+            ["publish_article", "get_site_stats", "no_such_tool", "unpublish_article", "publish_article"]
+        )
+        self.assertFalse(results[2]["result"]["success"])
+        for i in (0, 1, 3, 4):
+            self.assertTrue(results[i]["result"]["success"], results[i]["result"].get("error"))
+
+        # 下线时看到的是第一次发布后的状态，最终状态来自最后一次发布
+        self.assertEqual(results[3]["result"]["data"]["previous_status"], "publish")
+        post = cms_tools._make_request("GET", f"/sites/{cms_tools.WP_SITE_ID}/posts/{post_id}")
+        self.assertEqual(post["data"]["status"], "publish")
+
+
+# ============================================================
+# 媒体上传
+# ============================================================
+
+class MediaUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="media_", dir=_STATE_DIR)
+        self.outside = tempfile.mkdtemp(prefix="outside_", dir=_STATE_DIR)
+        with open(os.path.join(self.root, "a.png"), "wb") as f:
+            f.write(b"\x89PNG media-test")
+        with open(os.path.join(self.outside, "secret.txt"), "wb") as f:
+            f.write(b"secret")
+        os.symlink(os.path.join(self.outside, "secret.txt"), os.path.join(self.root, "link.txt"))
+
+    def test_paths_outside_root_rejected(self):
+        self.assertEqual(resolve_media_path("a.png", root=self.root), os.path.realpath(os.path.join(self.root, "a.png")))
+        for path in ("../" + os.path.basename(self.outside) + "/secret.txt", "link.txt", os.path.join(self.outside, "secret.txt")):
+            with self.assertRaises(MediaPathError):
+                resolve_media_path(path, root=self.root)
+        with self.assertRaises(MediaPathError):
+            resolve_media_path("a.png", root="")
+
+        # 未配置媒体根目录时不读取文件、不上传
+        before = _SERVER.stats()["endpoints"]
+        result = cms_tools.upload_media([os.path.join(self.root, "a.png")])
+        self.assertEqual(result["data"]["media"], [])
+        self.assertEqual(len(result["data"]["failed"]), 1)
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {})
+
+    def test_same_content_uploaded_once(self):
+        before = _SERVER.stats()["endpoints"]
+        result = cms_tools.upload_media([("one.png", io.BytesIO(b"same-bytes")), ("two.png", io.BytesIO(b"same-bytes"))], concurrency=1)
+        self.assertTrue(result["success"], result.get("error"))
+        media = result["data"]["media"]
+        self.assertEqual(len(media), 2)
+        self.assertEqual(media[0]["media_id"], media[1]["media_id"])
+        self.assertEqual([m["deduplicated"] for m in media], [False, True])
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {"POST /sites/{site}/media/new": 1})
+
+
+# ============================================================
+# 时间预算
+# ============================================================
+
+class DeadlineTest(unittest.TestCase):
+
+    def setUp(self):
+        created = cms_tools.create_article("时间预算", "<p>x</p>", status="publish")
+        self.assertTrue(created["success"], created.get("error"))
+        self.post_id = created["data"]["post_id"]
+
+    def tearDown(self):
+        _SERVER.set_faults(latency_ms=0)
+
+    def test_optional_requests_skipped_when_budget_low(self):
+        _SERVER.set_faults(latency_ms=300)
+        before = _SERVER.stats()["endpoints"]
+        started = time.monotonic()
+        with tool_deadline(1.2):
+            result = cms_tools.get_article_metrics(self.post_id, use_warehouse=False)
+        self.assertLess(time.monotonic() - started, 1.2)
+
+        # 文章本身取到后剩余时间不足 CMS_DEADLINE_RESERVE，统计子请求全部跳过
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertTrue(result["data"]["partial"])
+        self.assertEqual(result["data"]["skipped"], ["top_posts", "post_stats", "site_summary"])
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {"GET /sites/{site}/posts/{id}": 1})
+
+    def test_request_timeout_capped_by_budget(self):
+        _SERVER.set_faults(latency_ms=1000)
+        started = time.monotonic()
+        with tool_deadline(0.3):
+            result = cms_tools.get_article_metrics(self.post_id, use_warehouse=False)
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertFalse(result["success"])
+        self.assertTrue(result.get("deadline_exceeded"))
+
+
+# ============================================================
+# 会话缓存
+# ============================================================
+
+class ToolSessionTest(unittest.TestCase):
+
+    def test_read_only_results_reused_until_write(self):
+        session = ToolSession()
+        args = {"days": 7, "use_warehouse": False}
+        first = session.execute("get_site_stats", args)
+        self.assertTrue(first["success"], first.get("error"))
+
+        # 省略默认值的等价参数命中同一条缓存，不发请求
+        before = _SERVER.stats()["endpoints"]
+        self.assertEqual(session.execute("get_site_stats", {"use_warehouse": False}), first)
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {})
+        self.assertEqual(session.stats["hits"], 1)
+
+        # 写操作后缓存失效
+        created = session.execute("create_article", {"title": "会话缓存", "content": "<p>x</p>"})
+        self.assertTrue(created["success"], created.get("error"))
+        before = _SERVER.stats()["endpoints"]
+        session.execute("get_site_stats", args)
+        self.assertIn("GET /sites/{site}/stats/summary", _changed_endpoints(before, _SERVER.stats()["endpoints"]))
+        self.assertEqual(session.stats["hits"], 1)
+
+
+# ============================================================
+# 参数校验
+# ============================================================
+
+class ValidationTest(unittest.TestCase):
+
+    def _errors(self, tool_name, arguments):
+        before = _SERVER.stats()["endpoints"]
+        result = cms_tools.execute_cms_tool(tool_name, arguments)
+        # 参数不合法时不发出任何请求
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {})
+        self.assertFalse(result["success"])
+        return {(e["field"], e["error"]) for e in result["validation_errors"]}
+
+    def test_invalid_arguments_rejected_locally(self):
+        self.assertEqual(self._errors("get_article_metrics", {"post_id": "12"}), {("post_id", "type")})
+        self.assertEqual(self._errors("get_article_metrics", {"post_id": True}), {("post_id", "type")})
+        self.assertEqual(self._errors("get_article_metrics", {"post_id": 1, "days": 400}), {("days", "range")})
+        self.assertEqual(self._errors("get_article_metrics", {"post_id": 1, "granularity": "year"}), {("granularity", "enum")})
+        self.assertEqual(self._errors("get_article_metrics", {"days": 7, "foo": 1}), {("post_id", "required"), ("foo", "unknown")})
+        self.assertEqual(self._errors("unpublish_article", {"post_id": 1, "target_status": "publish"}), {("target_status", "enum")})
+
+
+# ============================================================
+# 录制/回放
+# ============================================================
+
+class CassetteTest(unittest.TestCase):
+
+    def tearDown(self):
+        set_cassette(None)
+
+    def test_replay_matches_recording_without_network(self):
+        path = os.path.join(_STATE_DIR, "offline.cassette.jsonl.gz")
+        calls = [
+            ("get_site_stats", {"days": 7, "use_warehouse": False}),
+            ("list_articles_by_topic", {"tag": "API", "number": 5}),
+        ]
+
+        set_cassette(Cassette(path, mode="record", secrets=["stub-token"]))
+        recorded = [cms_tools.execute_cms_tool(name, args) for name, args in calls]
+        set_cassette(None)
+        for result in recorded:
+            self.assertTrue(result["success"], result.get("error"))
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            self.assertNotIn("stub-token", f.read())
+
+        set_cassette(Cassette(path, mode="replay", latency_scale=0))
+        before = _SERVER.stats()["endpoints"]
+        replayed = [cms_tools.execute_cms_tool(name, args) for name, args in calls]
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {})
+        self.assertEqual(replayed, recorded)
+
+        # 没有录制过的请求返回错误，同样不访问网络
+        missed = cms_tools.execute_cms_tool("get_article_metrics", {"post_id": 424242, "use_warehouse": False})
+        self.assertFalse(missed["success"])
+        self.assertEqual(_changed_endpoints(before, _SERVER.stats()["endpoints"]), {})
+
+
+# ============================================================
+# 请求指标
+# ============================================================
+
+class MetricsTest(unittest.TestCase):
+
+    def test_requests_counted_by_endpoint_template(self):
+        self.assertEqual(endpoint_template("/sites/251193948/posts/42/?fields=ID"), "/sites/{site}/posts/{id}")
+        self.assertEqual(endpoint_template("/sites/example.com/posts/slug:hello-world"), "/sites/{site}/posts/slug:{slug}")
+
+        METRICS.reset()
+        for post_id in (1, 2, 3):
+            cms_tools._make_request("GET", f"/sites/{cms_tools.WP_SITE_ID}/posts/{post_id}")
+        entries = {(e["client"], e["method"], e["endpoint"]): e for e in METRICS.snapshot()["endpoints"]}
+        entry = entries[("cms_tools", "GET", "/sites/{site}/posts/{id}")]
+        self.assertEqual(entry["requests"], 3)
+        self.assertEqual(entry["latency"]["count"], 3)
+        self.assertGreater(entry["bytes_in"], 0)
+
+    def test_metrics_server_started_once(self):
+        server = start_metrics_server(port=0)
+        try:
+            self.assertIs(start_metrics_server(port=0), server)
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                text = response.read().decode("utf-8")
+            self.assertIn("# TYPE cms_http_requests_total counter", text)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+# ============================================================
+# 追踪
+# ============================================================
+
+class _CollectingExporter(SpanExporter):
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span.to_dict())
+
+
+class TracingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = add_exporter(_CollectingExporter())
+
+    def tearDown(self):
+        remove_exporter(self.exporter)
+
+    def test_tool_call_is_one_trace(self):
+        cms_tools.execute_cms_tool("get_article_metrics", {"post_id": 1, "use_warehouse": False})
+        spans = self.exporter.spans
+        roots = [s for s in spans if s["parent_id"] is None]
+        self.assertEqual(len(roots), 1)
+        root = roots[0]
+        self.assertEqual((root["name"], root["attributes"]["tool"]), ("cms.tool", "get_article_metrics"))
+        self.assertEqual({s["trace_id"] for s in spans}, {root["trace_id"]})
+
+        http = [s for s in spans if s["name"] == "http"]
+        self.assertIn("/sites/{site}/posts/{id}", {s["attributes"]["endpoint"] for s in http})
+        for s in http:
+            self.assertEqual(s["parent_id"], root["span_id"])
+
+    def test_batch_calls_share_trace_across_threads(self):
+        cms_tools.execute_cms_tools_batch([
+            ("get_site_stats", {"days": 7, "use_warehouse": False}),
+            ("list_articles_by_topic", {"tag": "API", "number": 5}),
+        ])
+        spans = self.exporter.spans
+        batch = [s for s in spans if s["name"] == "cms.batch"]
+        self.assertEqual(len(batch), 1)
+        tools = [s for s in spans if s["name"] == "cms.tool"]
+        self.assertEqual(len(tools), 2)
+        for s in tools:
+            self.assertEqual(s["parent_id"], batch[0]["span_id"])
+        self.assertEqual({s["trace_id"] for s in spans}, {batch[0]["trace_id"]})
+
+
+# ============================================================
+# 性能剖析
+# ============================================================
+
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="profiles_", dir=_STATE_DIR)
+
+    def tearDown(self):
+        set_profiler(None)
+
+    def test_sampled_call_writes_profiles(self):
+        profiler = ToolProfiler(rate=1, directory=self.directory, mode="cprofile")
+        set_profiler(profiler)
+        result = cms_tools.execute_cms_tool("get_site_stats", {"days": 7, "use_warehouse": False})
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertEqual(profiler.counters["sampled"], 1)
+        stats = pstats.Stats(os.path.join(self.directory, "get_site_stats.pstats"))
+        self.assertTrue(any(func[2] == "get_site_stats" for func in stats.stats))
+
+    def test_disk_limit_and_invalid_mode(self):
+        profiler = ToolProfiler(rate=1, directory=self.directory, mode="sample", max_bytes=1)
+        set_profiler(profiler)
+        cms_tools.execute_cms_tool("get_site_stats", {"days": 7, "use_warehouse": False})
+        self.assertEqual(profiler.counters["skipped_disk"], 1)
+        self.assertEqual(os.listdir(self.directory), [])
+
+        with self.assertRaises(ValueError):
+            ToolProfiler(mode="bogus")
+        # 环境变量中的无效模式只警告并回退到 cprofile
+        set_profiler(None)
+        original = cms_profiling.CMS_PROFILE_MODE
+        cms_profiling.CMS_PROFILE_MODE = "bogus"
+        try:
+            with self.assertWarns(RuntimeWarning):
+                self.assertEqual(cms_profiling.get_profiler().mode, "cprofile")
+        finally:
+            cms_profiling.CMS_PROFILE_MODE = original
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,9 @@ CMS Tools 测试脚本
 使用方法：
     export WP_ACCESS_TOKEN="your-token"
     python test_cms_tools.py
+
+    # 离线模式：启动本地 API 替身（cms_stub_server），不需要 Token，不访问线上站点
+    python test_cms_tools.py --stub
 """
 
 import os
@@ -20,20 +23,44 @@ import sys
 WP_ACCESS_TOKEN = os.getenv("WP_ACCESS_TOKEN", "your-wordpress-access-token")
 WP_SITE_ID = os.getenv("WP_SITE_ID", "251193948")
 
+# 方式3: 离线模式（--stub 或 CMS_TEST_STUB=1）
+STUB_MODE = "--stub" in sys.argv or os.getenv("CMS_TEST_STUB") == "1"
+STUB_SERVER = None
+if STUB_MODE:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from cms_stub_server import StubServer
+    STUB_SERVER = StubServer(posts=50, site_id=WP_SITE_ID).start()
+    WP_ACCESS_TOKEN = "stub-token"
+    os.environ["WP_API_BASE"] = STUB_SERVER.api_base
+    # 本地索引（幂等、分类/标签缓存等）写到临时目录，不与线上站点的缓存混用
+    import tempfile
+    os.environ["CMS_STATE_DIR"] = tempfile.mkdtemp(prefix="cms_stub_")
+
 # 设置环境变量供 cms_tools 使用
 os.environ["WP_ACCESS_TOKEN"] = WP_ACCESS_TOKEN
 os.environ["WP_SITE_ID"] = WP_SITE_ID
 
-# 导入 Tools
-from tools.cms_tools import (
-    create_article,
-    update_article,
-    publish_article,
-    unpublish_article,
-    get_article_metrics,
-    list_articles_by_topic,
-    get_site_stats,
-)
+# 导入 Tools（离线模式直接导入同目录的 cms_tools）
+if STUB_MODE:
+    from cms_tools import (
+        create_article,
+        update_article,
+        publish_article,
+        unpublish_article,
+        get_article_metrics,
+        list_articles_by_topic,
+        get_site_stats,
+    )
+else:
+    from tools.cms_tools import (
+        create_article,
+        update_article,
+        publish_article,
+        unpublish_article,
+        get_article_metrics,
+        list_articles_by_topic,
+        get_site_stats,
+    )
 
 
 def print_result(name: str, result: dict):
@@ -199,6 +226,8 @@ def main():
     print("="*60)
     print(f"站点 ID: {WP_SITE_ID}")
     print(f"Token: {WP_ACCESS_TOKEN[:20]}..." if len(WP_ACCESS_TOKEN) > 20 else f"Token: {WP_ACCESS_TOKEN}")
+    if STUB_MODE:
+        print(f"离线模式: {STUB_SERVER.api_base}")
     
     if WP_ACCESS_TOKEN == "your-wordpress-access-token":
         print("\n⚠️  警告: 请先配置 WP_ACCESS_TOKEN!")
@@ -223,7 +252,8 @@ def main():
     print("测试 4 将创建一篇测试文章，是否继续？")
     print("⚠️"*20)
     
-    user_input = input("输入 'y' 继续，其他键跳过: ").strip().lower()
+    # 离线模式写入的是本地替身，直接执行
+    user_input = "y" if STUB_MODE else input("输入 'y' 继续，其他键跳过: ").strip().lower()
     if user_input == 'y':
         test_create_and_manage_article()
     else:
@@ -235,6 +265,10 @@ def main():
     print("\n" + "="*60)
     print("🎉 测试完成!")
     print("="*60)
+    
+    if STUB_SERVER:
+        print(f"本地替身请求统计: {json.dumps(STUB_SERVER.stats(), ensure_ascii=False)}")
+        STUB_SERVER.stop()
 
 
 if __name__ == "__main__":
@@ -5,10 +5,12 @@ WordPress 发布 Tool
 
 import requests
 import json
-from typing import Optional
+import time
 import sys
 sys.path.append('..')
 from config import WP_ACCESS_TOKEN, WP_SITE_ID, WP_API_BASE
+from cms_content import compact_html
+from cms_metrics import METRICS
 
 
 # ============== Tool Schema (OpenAI Function Calling 格式) ==============
@@ -51,6 +53,11 @@ WORDPRESS_PUBLISH_TOOL = {
                 "featured_image": {
                     "type": "string",
                     "description": "特色图片 URL（可选）"
+                },
+                "compact_content": {
+                    "type": "boolean",
+                    "description": "是否在发布前压缩 HTML（去除多余空白、空标签、inline style）",
+                    "default": False
                 }
             },
             "required": ["title", "content"]
@@ -138,6 +145,31 @@ WORDPRESS_DELETE_POST_TOOL = {
 
 # ============== Tool 实现函数 ==============
 
+def _request(method: str, url: str, **kwargs) -> requests.Response:
+    """发送请求并记录接口指标（见 cms_metrics）"""
+    started = time.perf_counter()
+    status = "error"
+    response = None
+    try:
+        response = requests.request(method, url, **kwargs)
+        status = response.status_code
+        return response
+    except requests.exceptions.Timeout:
+        status = "timeout"
+        raise
+    finally:
+        payload = kwargs.get("json")
+        METRICS.observe_request(
+            method,
+            url[len(WP_API_BASE):] if url.startswith(WP_API_BASE) else url,
+            status,
+            time.perf_counter() - started,
+            bytes_out=len(json.dumps(payload).encode("utf-8")) if payload is not None else 0,
+            bytes_in=len(response.content) if response is not None else 0,
+            client="wordpress_tool"
+        )
+
+
 def wordpress_publish(
     title: str,
     content: str,
@@ -145,7 +177,8 @@ def wordpress_publish(
     tags: list = None,
     categories: list = None,
     excerpt: str = None,
-    featured_image: str = None
+    featured_image: str = None,
+    compact_content: bool = False
 ) -> dict:
     """
     发布文章到 WordPress.com
@@ -153,6 +186,10 @@ def wordpress_publish(
     Returns:
         dict: {"success": bool, "data": {...} or "error": "..."}
     """
+    content_stats = None
+    if compact_content:
+        content, content_stats = compact_html(content)
+    
     url = f"{WP_API_BASE}/sites/{WP_SITE_ID}/posts/new"
     
     headers = {
@@ -176,7 +213,7 @@ def wordpress_publish(
         payload["featured_image"] = featured_image
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = _request("POST", url, headers=headers, json=payload, timeout=30)
         
         if response.status_code in [200, 201]:
             result = response.json()
@@ -189,7 +226,8 @@ def wordpress_publish(
                     "short_url": result.get("short_URL", ""),
                     "status": result["status"],
                     "date": result["date"],
-                    "author": result.get("author", {}).get("name", "")
+                    "author": result.get("author", {}).get("name", ""),
+                    **({"content_stats": content_stats} if content_stats else {})
                 }
             }
         else:
@@ -228,7 +266,7 @@ def wordpress_get_posts(
         params["search"] = search
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response = _request("GET", url, headers=headers, params=params, timeout=30)
         
         if response.status_code == 200:
             result = response.json()
@@ -286,7 +324,7 @@ def wordpress_update_post(
         payload["status"] = status
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        response = _request("POST", url, headers=headers, json=payload, timeout=30)
         
         if response.status_code == 200:
             result = response.json()
@@ -322,7 +360,7 @@ def wordpress_delete_post(post_id: int) -> dict:
     }
     
     try:
-        response = requests.post(url, headers=headers, timeout=30)
+        response = _request("POST", url, headers=headers, timeout=30)
         
         if response.status_code == 200:
             return {